@@ -8,28 +8,41 @@ folder=$1
 volume_name=$2
 volume_folder=$3
 
-helper_container="simces_file_copy_container"
+source "$(dirname "${BASH_SOURCE[0]}")/platform_manager_utility.sh"
 
 echo "Copying the contents of '$folder' to Docker volume '$volume_name' to folder '$volume_folder'"
-docker volume create $volume_name > /dev/null
 
-# remove earlier helper container
-for old_helper in $(docker ps --all --quiet | grep $helper_container)
-do
+# the volume upload utility from the platform manager image sends the whole folder as a single archive
+# and skips the files that already have the same contents in the volume
+run_platform_manager_utility platform_manager.volume_upload \
+    --volume /var/run/docker.sock:/var/run/docker.sock \
+    --volume "$(realpath $folder)":/upload_source:ro \
+    -- /upload_source $volume_name $volume_folder
+
+if [ $? -eq $utility_missing_code ]
+then
+    # an older platform manager image, copy the files one by one using a helper container
+    echo "The volume upload utility is not available in '$platform_manager_image', copying the files one by one"
+    echo "Update the image to use the faster upload: source pull_docker_images.sh docker_images_core.txt"
+
+    helper_container="simces_file_copy_container"
+    docker volume create $volume_name > /dev/null
+
+    # remove earlier helper container
     docker stop $helper_container > /dev/null 2>&1
     docker rm $helper_container > /dev/null 2>&1
-done
 
-# start the helper container
-docker run -d --name $helper_container --volume $volume_name:$volume_folder:rw ubuntu:18.04 sleep 10m > /dev/null
+    # start the helper container
+    docker run -d --name $helper_container --volume $volume_name:$volume_folder:rw ubuntu:18.04 sleep 10m > /dev/null
 
-for filename in $(find $folder -type f | sed "s/$(echo "$folder/" | sed 's/\//\\\//g')//")
-do
-    echo "Copying file $folder/$filename"
-    docker exec -t $helper_container mkdir -p $folder/$(dirname ${filename})
-    docker cp $folder/$filename $helper_container:$volume_folder/$filename > /dev/null
-done
+    for filename in $(find $folder -type f | sed "s/$(echo "$folder/" | sed 's/\//\\\//g')//")
+    do
+        echo "Copying file $folder/$filename"
+        docker exec -t $helper_container mkdir -p $volume_folder/$(dirname ${filename})
+        docker cp $folder/$filename $helper_container:$volume_folder/$filename > /dev/null
+    done
 
-# remove the helper container
-docker stop $helper_container > /dev/null
-docker rm $helper_container > /dev/null
+    # remove the helper container
+    docker stop $helper_container > /dev/null
+    docker rm $helper_container > /dev/null
+fi
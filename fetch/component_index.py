@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a local index from the component type names to the repositories containing
+the component manifests and the functionality for finding the component types used in simulations.
+"""
+
+from json import dump as json_dump, load as json_load, JSONDecodeError
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+from yaml import safe_load, YAMLError
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+# the attribute for the component types in the simulation configuration files
+SIMULATION_COMPONENTS = "Components"
+# the attribute for the component type name in the component manifest files
+MANIFEST_COMPONENT_NAME = "Name"
+# the manifest files in the root manifest folder and in this subfolder are not fetched from the repositories
+LOCAL_MANIFEST_FOLDER = "local"
+MANIFEST_FILE_EXTENSIONS = (".yml", ".yaml")
+
+
+def get_simulation_component_types(configuration_filenames: Iterable[str]) -> Optional[Set[str]]:
+    """
+    Returns the component types used in the given simulation configuration files.
+    Returns None, if any of the files cannot be read.
+    """
+    component_types = set()  # type: Set[str]
+    for configuration_filename in configuration_filenames:
+        try:
+            with open(configuration_filename, mode="r", encoding="UTF-8") as configuration_file:
+                configuration = safe_load(configuration_file)
+            components = configuration.get(SIMULATION_COMPONENTS, None) if isinstance(configuration, dict) else None
+            if not isinstance(components, dict):
+                LOGGER.error("No components found in simulation configuration '{}'".format(configuration_filename))
+                return None
+            component_types.update(str(component_type) for component_type in components)
+
+        except (OSError, YAMLError) as configuration_error:
+            LOGGER.error("Received '{}' when reading simulation configuration '{}': {}".format(
+                type(configuration_error).__name__, configuration_filename, configuration_error))
+            return None
+
+    return component_types
+
+
+def get_manifest_component_type(manifest_filename: Path) -> Optional[str]:
+    """Returns the component type name from the given component manifest file or None, if it cannot be read."""
+    try:
+        with open(manifest_filename, mode="r", encoding="UTF-8") as manifest_file:
+            manifest = safe_load(manifest_file)
+        if isinstance(manifest, dict) and manifest.get(MANIFEST_COMPONENT_NAME, None) is not None:
+            return str(manifest[MANIFEST_COMPONENT_NAME])
+
+    except (OSError, YAMLError) as manifest_error:
+        LOGGER.debug("Received '{}' when reading manifest '{}': {}".format(
+            type(manifest_error).__name__, manifest_filename, manifest_error))
+    return None
+
+
+def get_local_component_types(manifest_folder: Path) -> Set[str]:
+    """
+    Returns the component types defined by the local manifest files, i.e. the manifest files directly in
+    the given manifest folder and the manifest files under its local subfolder.
+    """
+    manifest_filenames = []  # type: List[Path]
+    try:
+        if manifest_folder.is_dir():
+            manifest_filenames.extend(
+                manifest_filename for manifest_filename in manifest_folder.iterdir()
+                if manifest_filename.is_file())
+        local_folder = manifest_folder / LOCAL_MANIFEST_FOLDER
+        if local_folder.is_dir():
+            manifest_filenames.extend(
+                manifest_filename for manifest_filename in local_folder.rglob("*")
+                if manifest_filename.is_file())
+
+    except OSError as folder_error:
+        LOGGER.warning("Received '{}' when reading the local manifests from '{}': {}".format(
+            type(folder_error).__name__, manifest_folder, folder_error))
+
+    return {
+        component_type
+        for component_type in (
+            get_manifest_component_type(manifest_filename)
+            for manifest_filename in manifest_filenames
+            if manifest_filename.suffix in MANIFEST_FILE_EXTENSIONS
+        )
+        if component_type is not None
+    }
+
+
+class ComponentIndex:
+    """
+    Class for holding the repository for each known component type. The repositories are identified with
+    the same keys that are used in the fetch cache. The index is stored as a JSON file.
+    """
+    def __init__(self, index_filename: Path):
+        """Loads the index from the given file. A missing or an invalid index file results in an empty index."""
+        self.__index_filename = index_filename
+        self.__repositories = {}  # type: Dict[str, str]
+        self.__is_modified = False
+
+        try:
+            if index_filename.is_file():
+                with open(index_filename, mode="r", encoding="UTF-8") as index_file:
+                    index_content = json_load(index_file)
+                if isinstance(index_content, dict):
+                    self.__repositories = {
+                        component_type: repository_key
+                        for component_type, repository_key in index_content.items()
+                        if isinstance(repository_key, str)
+                    }
+
+        except (OSError, JSONDecodeError) as index_error:
+            LOGGER.warning("Ignoring the component index '{}' due to '{}': {}".format(
+                index_filename, type(index_error).__name__, index_error))
+
+    @property
+    def indexed_repositories(self) -> Set[str]:
+        """The keys for the repositories that contain at least one known component type."""
+        return set(self.__repositories.values())
+
+    def get_repository(self, component_type: str) -> Optional[str]:
+        """Returns the key for the repository containing the given component type or None, if it is not known."""
+        return self.__repositories.get(component_type, None)
+
+    def update(self, repository_key: str, component_type: Optional[str]):
+        """
+        Sets the component type found in the given repository. Any previous component type for the repository
+        is removed from the index. A None value only removes the previous component type.
+        """
+        for previous_type in [
+                indexed_type for indexed_type, indexed_key in self.__repositories.items()
+                if indexed_key == repository_key and indexed_type != component_type]:
+            del self.__repositories[previous_type]
+            self.__is_modified = True
+
+        if component_type is not None and self.__repositories.get(component_type, None) != repository_key:
+            if component_type in self.__repositories:
+                LOGGER.warning("Component type '{}' found from both '{}' and '{}'".format(
+                    component_type, self.__repositories[component_type], repository_key))
+            self.__repositories[component_type] = repository_key
+            self.__is_modified = True
+
+    def retain(self, repository_keys: Iterable[str]):
+        """Removes the component types for the repositories that are not in the given list."""
+        retained_keys = set(repository_keys)
+        removed_types = [
+            component_type for component_type, repository_key in self.__repositories.items()
+            if repository_key not in retained_keys
+        ]  # type: List[str]
+        for component_type in removed_types:
+            del self.__repositories[component_type]
+            self.__is_modified = True
+
+    def save(self) -> bool:
+        """Writes the index to the index file if it has been modified. Returns True, if the index is up to date."""
+        if not self.__is_modified:
+            return True
+
+        try:
+            self.__index_filename.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.__index_filename, mode="w", encoding="UTF-8") as index_file:
+                json_dump(self.__repositories, index_file, indent=4, sort_keys=True)
+            self.__is_modified = False
+            return True
+
+        except OSError as index_error:
+            LOGGER.warning("Received '{}' when writing the component index '{}': {}".format(
+                type(index_error).__name__, self.__index_filename, index_error))
+            return False
@@ -8,22 +8,40 @@
 This module fetches files from GitLab or GitHub repositories.
 """
 
-from asyncio import run as asyncio_run, TimeoutError as AsyncioTimeoutError
-from dataclasses import dataclass, field
+from asyncio import gather, run as asyncio_run, Semaphore, sleep, TimeoutError as AsyncioTimeoutError
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from hashlib import sha256
+from json import dumps as json_dumps, loads as json_loads, JSONDecodeError
+from os import fsync, replace as os_replace
 from pathlib import Path
 from re import compile as re_compile
-from urllib.parse import quote
-from typing import Any, cast, Dict, List, Optional, Tuple, Union
+from tempfile import NamedTemporaryFile
+from time import perf_counter
+from urllib.parse import quote, urlsplit
+from typing import Any, cast, Dict, List, Mapping, Optional, Set, Tuple, Union
 from yaml import safe_load, YAMLError
 
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 from aiohttp.client_exceptions import ClientError
 
 from tools.tools import EnvironmentVariable, FullLogger, async_wrap
 
+from fetch.component_index import (
+    ComponentIndex, get_local_component_types, get_manifest_component_type, get_simulation_component_types)
+from fetch.fetch_cache import FetchCache, get_cache_key, HEADER_ETAG, HEADER_LAST_MODIFIED
+from fetch.gitlab_graphql import get_batches, get_blob_contents, get_blob_ids, get_graphql_request_params
+from fetch.retry import (
+    FetchCounters, RetryPolicy, HEADER_RETRY_AFTER, RETRY_STATUS_CODES,
+    DEFAULT_MAX_RETRIES, DEFAULT_BASE_DELAY, DEFAULT_MAX_DELAY)
+
 LOGGER = FullLogger(__name__)
 
 HTTP_TIMEOUT = 10.0
+# the time in seconds an idle connection is kept open for reuse
+KEEPALIVE_TIMEOUT = 30.0
+# the time in seconds the resolved host addresses are cached
+DNS_CACHE_TIME = 300
 
 GITHUB = "GitHub"
 GITLAB = "GitLab"
@@ -46,6 +64,47 @@ ENV_VARIABLE_PATTERN = re_compile(r"\${.*}")
 
 MANIFEST_FOLDER = "MANIFEST_FOLDER"
 SERVER_CONFIG_FOLDER = "SERVER_CONFIG_FOLDER"
+# the maximum number of concurrent requests in total and to a single host
+FETCH_CONCURRENCY = "FETCH_CONCURRENCY"
+FETCH_HOST_CONCURRENCY = "FETCH_HOST_CONCURRENCY"
+DEFAULT_FETCH_CONCURRENCY = 16
+DEFAULT_FETCH_HOST_CONCURRENCY = 4
+# the file for the HTTP validators of the fetched files, relative paths are relative to the manifest folder,
+# empty value disables the conditional requests
+FETCH_CACHE_FILE = "FETCH_CACHE_FILE"
+DEFAULT_FETCH_CACHE_FILE = ".fetch_cache.json"
+# the retry policy for transient failures, i.e. connection errors, timeouts and HTTP status codes 429 and 5xx
+FETCH_MAX_RETRIES = "FETCH_MAX_RETRIES"
+FETCH_RETRY_BASE_DELAY = "FETCH_RETRY_BASE_DELAY"
+FETCH_RETRY_MAX_DELAY = "FETCH_RETRY_MAX_DELAY"
+# the file listing the changed, unchanged and failed files after the fetch, relative paths are relative to
+# the manifest folder, empty value disables the listing
+FETCH_CHANGES_FILE = "FETCH_CHANGES_FILE"
+DEFAULT_FETCH_CHANGES_FILE = "fetch_changes.json"
+# the number of GitLab projects from which the files are fetched with a single GraphQL request,
+# zero disables the GraphQL requests and all files are fetched separately using the REST API
+FETCH_GRAPHQL_BATCH_SIZE = "FETCH_GRAPHQL_BATCH_SIZE"
+DEFAULT_FETCH_GRAPHQL_BATCH_SIZE = 50
+# comma separated list of simulation configuration files, if given, only the manifests for the component types
+# used in these simulations are fetched
+SIMULATION_CONFIGURATION_FILES = "SIMULATION_CONFIGURATION_FILES"
+# the file for the index from the component types to the repositories, relative paths are relative to
+# the manifest folder
+FETCH_COMPONENT_INDEX_FILE = "FETCH_COMPONENT_INDEX_FILE"
+DEFAULT_FETCH_COMPONENT_INDEX_FILE = ".component_index.json"
+
+FETCH_STATUS_OK = "ok"
+FETCH_STATUS_NOT_MODIFIED = "not modified"
+FETCH_STATUS_HTTP_ERROR = "http error"
+FETCH_STATUS_CLIENT_ERROR = "client error"
+FETCH_STATUS_WRITE_ERROR = "write error"
+
+WRITE_STATUS_CHANGED = "changed"
+WRITE_STATUS_UNCHANGED = "unchanged"
+WRITE_STATUS_FAILED = "failed"
+
+# the size of the blocks used when calculating the hash for an existing file
+HASH_BLOCK_SIZE = 65536
 
 
 @dataclass
@@ -79,6 +138,46 @@ class RepositoryServerConfiguration:
     access_token: Optional[str] = None
 
 
+@dataclass
+class FetchResult:
+    """
+    Data class for holding the outcome of fetching one file from a repository.
+    - repository_type: the server type, either GitHub or GitLab
+    - repository_name: the full name of the repository
+    - filename: the name of the fetched file
+    - status: the fetch status, "ok", "not modified", "http error", "client error" or "write error"
+    - duration: the time in seconds spent fetching the file, including the time waiting for a free request slot
+    - http_status: the HTTP status code of the latest response, None if no response was received
+    - retries: the number of retried requests
+    - output_filename: the local file for the fetched contents
+    - changed: True, if the contents of the local file were changed
+    - repository_key: the key identifying the fetched file in the fetch cache and in the component index
+    """
+    repository_type: str
+    repository_name: str
+    filename: str
+    status: str
+    duration: float
+    http_status: Optional[int] = None
+    retries: int = 0
+    output_filename: Optional[Path] = None
+    changed: bool = False
+    repository_key: str = ""
+
+
+@dataclass
+class RequestResponse:
+    """
+    Data class for holding the relevant parts of a received HTTP response.
+    - status: the HTTP status code
+    - text: the response body as text
+    - headers: the response headers
+    """
+    status: int
+    text: str
+    headers: Mapping[str, str]
+
+
 def evaluate_environment_variable(string_value: str) -> str:
     """
     If the given string is in format "${ENV_VARIABLE_NAME}", evaluates and returns
@@ -238,18 +337,51 @@ def create_folder(target_folder: Path):
         ))
 
 
-def write_file(contents: str, filename: Path):
-    """Writes the given text to a file with the given filename. Overwrites any previous file."""
+def get_file_hash(filename: Path) -> Optional[str]:
+    """Returns the SHA-256 hash for the contents of the given file or None, if the file cannot be read."""
+    try:
+        file_hash = sha256()
+        with open(filename, mode="rb") as source_file:
+            for block in iter(lambda: source_file.read(HASH_BLOCK_SIZE), b""):
+                file_hash.update(block)
+        return file_hash.hexdigest()
+
+    except OSError:
+        return None
+
+
+def write_file(contents: str, filename: Path) -> str:
+    """
+    Writes the given text to a file with the given filename unless the file already has the same contents.
+    The contents are first written to a temporary file in the same folder which then replaces any previous file,
+    so that the readers never see a partially written file.
+    Returns "changed", "unchanged" or "failed".
+    """
+    file_contents = contents.encode("UTF-8")
+    if filename.is_file() and get_file_hash(filename) == sha256(file_contents).hexdigest():
+        LOGGER.debug("File '{}' is unchanged".format(filename))
+        return WRITE_STATUS_UNCHANGED
+
+    temporary_filename = None  # type: Optional[str]
     try:
         create_folder(filename.parent)
-        with open(filename, mode="w", encoding="UTF-8") as target_file:
-            target_file.write(contents)
+        with NamedTemporaryFile(mode="wb", dir=filename.parent, prefix=".{}.".format(filename.name),
+                                suffix=".tmp", delete=False) as temporary_file:
+            temporary_filename = temporary_file.name
+            temporary_file.write(file_contents)
+            temporary_file.flush()
+            fsync(temporary_file.fileno())
         # change the permission to allow read-write access to the file for all users
-        filename.chmod(0o666)
+        Path(temporary_filename).chmod(0o666)
+        os_replace(temporary_filename, filename)
+        return WRITE_STATUS_CHANGED
 
     except OSError as file_error:
         LOGGER.error("Received '{}' when writing file '{}: {}".format(
             type(file_error).__name__, filename, file_error))
+        if temporary_filename is not None and Path(temporary_filename).exists():
+            Path(temporary_filename).unlink()
+        return WRITE_STATUS_FAILED
 
 
 def get_github_request_params(
@@ -386,6 +518,474 @@ def load_repository_parameters_form_folder(config_folder: Union[str, Path]) \
     return None
 
 
+def get_repository_key(server_configuration: RepositoryServerConfiguration,
+                       repository: RepositoryFileConfiguration) -> str:
+    """Returns the key identifying the file fetched from the given repository in the fetch cache."""
+    return get_cache_key(
+        server_configuration.repository_type,
+        repository.repository_name,
+        repository.branch if repository.branch is not None else DEFAULT_BRANCH,
+        repository.filename if repository.filename is not None else DEFAULT_FILENAME
+    )
+
+
+def select_repositories(server_configurations: List[RepositoryServerConfiguration],
+                        repository_keys: Set[str]) -> List[RepositoryServerConfiguration]:
+    """Returns the server configurations containing only the repositories with the given keys."""
+    selected_configurations = [
+        replace(
+            server_configuration,
+            repositories=[
+                repository for repository in server_configuration.repositories
+                if get_repository_key(server_configuration, repository) in repository_keys
+            ]
+        )
+        for server_configuration in server_configurations
+    ]
+    return [
+        server_configuration for server_configuration in selected_configurations
+        if server_configuration.repositories
+    ]
+
+
+def get_missing_component_types(component_index: ComponentIndex, component_types: Set[str],
+                                repository_keys: Set[str]) -> Set[str]:
+    """Returns the component types that are not found in any of the given repositories according to the index."""
+    return {
+        component_type for component_type in component_types
+        if component_index.get_repository(component_type) not in repository_keys
+    }
+
+
+def update_component_index(component_index: ComponentIndex, fetch_results: List[FetchResult]):
+    """Updates the component types for the repositories from which the manifest is available locally."""
+    for result in fetch_results:
+        if result.status in (FETCH_STATUS_OK, FETCH_STATUS_NOT_MODIFIED) and result.output_filename is not None:
+            component_index.update(result.repository_key, get_manifest_component_type(result.output_filename))
+
+
+def get_request_host(request_params: Dict[str, Any]) -> str:
+    """Returns the host name for the given request parameters without any credentials."""
+    return urlsplit(request_params["url"]).hostname or ""
+
+
+def log_fetch_summary(fetch_results: List[FetchResult], total_duration: float, fetch_counters: FetchCounters):
+    """Logs the status and the timing for each fetched file, the slowest first."""
+    successful_fetches = len([
+        result for result in fetch_results
+        if result.status in (FETCH_STATUS_OK, FETCH_STATUS_NOT_MODIFIED)
+    ])
+    unchanged_files = len([result for result in fetch_results if result.status == FETCH_STATUS_NOT_MODIFIED])
+    LOGGER.info("Fetched {}/{} files ({} not modified) in {:.2f} seconds".format(
+        successful_fetches, len(fetch_results), unchanged_files, total_duration))
+    LOGGER.info("Made {} requests with {} retries, {} files could not be fetched".format(
+        fetch_counters.requests, fetch_counters.retries, fetch_counters.failures))
+    for result in sorted(fetch_results, key=lambda fetch_result: fetch_result.duration, reverse=True):
+        LOGGER.info("  {:>7.3f} s  {:<12}  {} {} ({}){}{}".format(
+            result.duration, result.status, result.repository_type, result.repository_name, result.filename,
+            "" if result.http_status is None else ", HTTP {}".format(result.http_status),
+            "" if result.retries == 0 else ", {} retries".format(result.retries)))
+
+
+def write_changes_file(fetch_results: List[FetchResult], output_folder: str, changes_filename: str):
+    """
+    Writes a JSON file listing the local files that were changed, the files that were unchanged and
+    the files that could not be fetched. The files are given relative to the output folder.
+    """
+    changes = {
+        "Changed": [],
+        "Unchanged": [],
+        "Failed": []
+    }  # type: Dict[str, List[str]]
+    for result in fetch_results:
+        if result.output_filename is None:
+            continue
+        if result.status not in (FETCH_STATUS_OK, FETCH_STATUS_NOT_MODIFIED):
+            change_type = "Failed"
+        elif result.changed:
+            change_type = "Changed"
+        else:
+            change_type = "Unchanged"
+        changes[change_type].append(result.output_filename.relative_to(output_folder).as_posix())
+
+    LOGGER.info("{} changed, {} unchanged and {} failed files".format(
+        len(changes["Changed"]), len(changes["Unchanged"]), len(changes["Failed"])))
+    write_file(
+        json_dumps({change_type: sorted(files) for change_type, files in changes.items()}, indent=4),
+        Path(output_folder) / changes_filename)
+
+
+async def send_request(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                       request_params: Dict[str, Any], retry_policy: RetryPolicy, fetch_counters: FetchCounters,
+                       description: str, method: str = "GET") -> Tuple[Optional[RequestResponse], int]:
+    """
+    Sends a request with the given parameters and retries the transient failures according to the retry policy.
+    The number of concurrent requests is limited by the semaphore for the host and the given global semaphore.
+    Returns a 2-tuple containing the last received response, None if no response was received,
+    and the number of retries.
+    """
+    for attempt in range(retry_policy.max_retries + 1):
+        is_last_attempt = attempt == retry_policy.max_retries
+        retry_delay = None  # type: Optional[float]
+        response_content = None  # type: Optional[RequestResponse]
+        # the host slot is acquired first, so that the requests waiting for a busy host do not hold global slots
+        async with host_semaphores[get_request_host(request_params)], semaphore:
+            fetch_counters.requests += 1
+            try:
+                async with session.request(method, **request_params) as response:
+                    response_content = RequestResponse(
+                        status=response.status,
+                        text=await response.text(),
+                        headers=response.headers.copy()
+                    )
+                if response_content.status in RETRY_STATUS_CODES and not is_last_attempt:
+                    retry_delay = retry_policy.get_delay(
+                        attempt, response_content.headers.get(HEADER_RETRY_AFTER, None))
+
+            except (ClientError, AsyncioTimeoutError) as client_error:
+                if is_last_attempt:
+                    LOGGER.error("Received '{}' when trying to fetch {}: {}".format(
+                        type(client_error).__name__, description, client_error
+                    ))
+                else:
+                    retry_delay = retry_policy.get_delay(attempt)
+
+        if retry_delay is None:
+            return response_content, attempt
+
+        # the request slots are released while waiting, so that the other requests can proceed
+        LOGGER.info("Retrying to fetch {} in {:.2f} seconds".format(description, retry_delay))
+        fetch_counters.retries += 1
+        await sleep(retry_delay)
+
+    return None, retry_policy.max_retries
+
+
+async def fetch_repository_file(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                                server_configuration: RepositoryServerConfiguration,
+                                repository: RepositoryFileConfiguration, output_folder: str,
+                                fetch_cache: Optional[FetchCache] = None, retry_policy: Optional[RetryPolicy] = None,
+                                fetch_counters: Optional[FetchCounters] = None) -> Optional[FetchResult]:
+    """
+    Fetches a file from the given repository and writes it to the output folder.
+    The number of concurrent requests is limited by the semaphore for the host and the given global semaphore.
+    If a fetch cache is given, a conditional request is made and the file is not written if it has not been modified.
+    Transient failures are retried according to the retry policy and the requests are counted in the counters.
+    Returns None, if the request parameters could not be created for the repository.
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy(max_retries=0)
+    if fetch_counters is None:
+        fetch_counters = FetchCounters()
+
+    request_params, filename = get_repository_request_params(
+        repository_name=repository.repository_name,
+        repository_type=server_configuration.repository_type,
+        filename=repository.filename,
+        branch=repository.branch,
+        check_certificate=server_configuration.certificate,
+        host_name=server_configuration.host,
+        access_token=server_configuration.access_token
+    )
+    if request_params is None or filename is None:
+        return None
+
+    target_filename = get_output_filename(
+        output_folder=output_folder,
+        repository_type=server_configuration.repository_type,
+        repository_name=repository.repository_name,
+        filename=filename
+    )
+    cache_key = get_repository_key(server_configuration, repository)
+    if fetch_cache is not None:
+        request_params["headers"] = {
+            **request_params.get("headers", {}),
+            **fetch_cache.get_request_headers(cache_key, target_filename)
+        }
+
+    fetch_result = FetchResult(
+        repository_type=server_configuration.repository_type,
+        repository_name=repository.repository_name,
+        filename=filename,
+        status=FETCH_STATUS_CLIENT_ERROR,
+        duration=0.0,
+        output_filename=target_filename,
+        repository_key=cache_key
+    )
+    start_time = perf_counter()
+    LOGGER.info("Fetching file '{}' from {} repository {}".format(
+        filename, server_configuration.repository_type, repository.repository_name))
+    response, fetch_result.retries = await send_request(
+        session, semaphore, host_semaphores, request_params, retry_policy, fetch_counters,
+        description="file '{}' from repository {}".format(filename, repository.repository_name))
+
+    if response is not None:
+        fetch_result.http_status = response.status
+        if response.status == 200:
+            write_status = await async_wrap(write_file)(response.text, target_filename)
+            if write_status == WRITE_STATUS_FAILED:
+                fetch_result.status = FETCH_STATUS_WRITE_ERROR
+            else:
+                fetch_result.status = FETCH_STATUS_OK
+                fetch_result.changed = write_status == WRITE_STATUS_CHANGED
+                if fetch_cache is not None:
+                    fetch_cache.update(
+                        cache_key, target_filename,
+                        response.headers.get(HEADER_ETAG, None),
+                        response.headers.get(HEADER_LAST_MODIFIED, None))
+
+        elif response.status == 304:
+            # the local file is up to date, so there is no need to write it again
+            fetch_result.status = FETCH_STATUS_NOT_MODIFIED
+
+        else:
+            fetch_result.status = FETCH_STATUS_HTTP_ERROR
+            LOGGER.warning("Repository: {}: received status '{}' when fetching file '{}': {}".format(
+                repository, response.status, filename, response.text))
+
+    if fetch_result.status not in (FETCH_STATUS_OK, FETCH_STATUS_NOT_MODIFIED):
+        fetch_counters.failures += 1
+    fetch_result.duration = perf_counter() - start_time
+    return fetch_result
+
+
+async def send_graphql_request(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                               server_configuration: RepositoryServerConfiguration,
+                               repositories: List[RepositoryFileConfiguration], branch: str, filename: str,
+                               retry_policy: RetryPolicy, fetch_counters: FetchCounters, include_contents: bool) \
+        -> Tuple[Optional[RequestResponse], Any, int]:
+    """
+    Sends a GraphQL request for the given file in the given branch of all the given GitLab repositories.
+    Returns a 3-tuple containing the last received response, the parsed response content, None if no successful
+    response was received, and the number of retries.
+    """
+    request_params = get_graphql_request_params(
+        host_name=server_configuration.host if server_configuration.host is not None else DEFAULT_GITLAB_HOST,
+        project_paths=[repository.repository_name for repository in repositories],
+        branch=branch,
+        filename=filename,
+        check_certificate=server_configuration.certificate is not False,
+        access_token=server_configuration.access_token,
+        include_contents=include_contents
+    )
+    response, retries = await send_request(
+        session, semaphore, host_semaphores, request_params, retry_policy, fetch_counters,
+        description="{} '{}' from {} GitLab repositories".format(
+            "file" if include_contents else "blob ids for file", filename, len(repositories)),
+        method="POST")
+
+    response_content = None
+    if response is not None:
+        if response.status == 200:
+            try:
+                response_content = json_loads(response.text)
+            except JSONDecodeError as json_error:
+                LOGGER.warning("Could not parse the GraphQL response: {}".format(json_error))
+        else:
+            LOGGER.warning("Received status '{}' from the GraphQL API: {}".format(response.status, response.text))
+
+    return response, response_content, retries
+
+
+async def fetch_gitlab_file_batch(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                                  server_configuration: RepositoryServerConfiguration,
+                                  repositories: List[RepositoryFileConfiguration], branch: str, filename: str,
+                                  output_folder: str, fetch_cache: Optional[FetchCache], retry_policy: RetryPolicy,
+                                  fetch_counters: FetchCounters) \
+        -> Tuple[List[FetchResult], List[RepositoryFileConfiguration]]:
+    """
+    Fetches the given file from the given branch of all the given GitLab repositories with a single GraphQL request
+    and writes the files to the output folder.
+    If a fetch cache is given and it contains the blob ids for some of the files, the current blob ids of those files
+    are first fetched with a separate request and only the files with a changed blob id are downloaded.
+    Returns a 2-tuple containing the results for the fetched files and the repositories for which the file
+    could not be fetched.
+    """
+    start_time = perf_counter()
+    target_filenames = {
+        repository.repository_name: get_output_filename(
+            output_folder=output_folder,
+            repository_type=server_configuration.repository_type,
+            repository_name=repository.repository_name,
+            filename=filename
+        )
+        for repository in repositories
+    }
+    cached_blob_ids = {}  # type: Dict[str, str]
+    if fetch_cache is not None:
+        for repository in repositories:
+            blob_id = fetch_cache.get_blob_id(
+                get_repository_key(server_configuration, repository), target_filenames[repository.repository_name])
+            if blob_id is not None:
+                cached_blob_ids[repository.repository_name] = blob_id
+
+    fetch_results = []  # type: List[FetchResult]
+    fetched_repositories = repositories
+    if cached_blob_ids:
+        LOGGER.info("Checking file '{}' from {} GitLab repositories using GraphQL".format(
+            filename, len(cached_blob_ids)))
+        response, response_content, retries = await send_graphql_request(
+            session, semaphore, host_semaphores, server_configuration,
+            [repository for repository in repositories if repository.repository_name in cached_blob_ids],
+            branch, filename, retry_policy, fetch_counters, include_contents=False)
+        blob_ids = get_blob_ids(response_content, filename)
+
+        fetched_repositories = []
+        for repository in repositories:
+            cached_blob_id = cached_blob_ids.get(repository.repository_name, None)
+            if cached_blob_id is None or blob_ids.get(repository.repository_name.lower(), None) != cached_blob_id:
+                fetched_repositories.append(repository)
+                continue
+
+            # the local file is up to date, so there is no need to download it again
+            fetch_results.append(FetchResult(
+                repository_type=server_configuration.repository_type,
+                repository_name=repository.repository_name,
+                filename=filename,
+                status=FETCH_STATUS_NOT_MODIFIED,
+                duration=perf_counter() - start_time,
+                http_status=response.status if response is not None else None,
+                retries=retries,
+                output_filename=target_filenames[repository.repository_name],
+                repository_key=get_repository_key(server_configuration, repository)
+            ))
+
+    if not fetched_repositories:
+        return fetch_results, []
+
+    LOGGER.info("Fetching file '{}' from {} GitLab repositories using GraphQL".format(
+        filename, len(fetched_repositories)))
+    response, response_content, retries = await send_graphql_request(
+        session, semaphore, host_semaphores, server_configuration, fetched_repositories,
+        branch, filename, retry_policy, fetch_counters, include_contents=True)
+    blob_contents = get_blob_contents(response_content, filename)
+    blob_ids = get_blob_ids(response_content, filename)
+
+    remaining_repositories = []  # type: List[RepositoryFileConfiguration]
+    for repository in fetched_repositories:
+        file_contents = blob_contents.get(repository.repository_name.lower(), None)
+        if file_contents is None:
+            remaining_repositories.append(repository)
+            continue
+
+        target_filename = target_filenames[repository.repository_name]
+        write_status = await async_wrap(write_file)(file_contents, target_filename)
+        fetch_results.append(FetchResult(
+            repository_type=server_configuration.repository_type,
+            repository_name=repository.repository_name,
+            filename=filename,
+            status=FETCH_STATUS_WRITE_ERROR if write_status == WRITE_STATUS_FAILED else FETCH_STATUS_OK,
+            duration=perf_counter() - start_time,
+            http_status=response.status if response is not None else None,
+            retries=retries,
+            output_filename=target_filename,
+            changed=write_status == WRITE_STATUS_CHANGED,
+            repository_key=get_repository_key(server_configuration, repository)
+        ))
+        if write_status == WRITE_STATUS_FAILED:
+            fetch_counters.failures += 1
+            if fetch_cache is not None:
+                fetch_cache.remove(fetch_results[-1].repository_key)
+        elif fetch_cache is not None:
+            fetch_cache.update_blob_id(
+                fetch_results[-1].repository_key, target_filename, blob_ids.get(repository.repository_name.lower(), None))
+
+    if remaining_repositories:
+        LOGGER.info("Fetching file '{}' from {} GitLab repositories using the REST API instead".format(
+            filename, len(remaining_repositories)))
+    return fetch_results, remaining_repositories
+
+
+async def fetch_server_files(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                             server_configuration: RepositoryServerConfiguration, output_folder: str,
+                             fetch_cache: Optional[FetchCache], retry_policy: RetryPolicy,
+                             fetch_counters: FetchCounters, graphql_batch_size: int) -> List[Optional[FetchResult]]:
+    """
+    Fetches the files from all the repositories in the given server configuration.
+    For GitLab servers, the files are first fetched in batches using the GraphQL API, if the batch size is positive,
+    and the files that could not be fetched that way are fetched one by one using the REST API.
+    """
+    fetch_results = []  # type: List[Optional[FetchResult]]
+    remaining_repositories = server_configuration.repositories
+
+    if server_configuration.repository_type == GITLAB and graphql_batch_size > 0:
+        # the repositories are grouped by the fetched file since one query can only contain a single file path
+        repository_groups = {}  # type: Dict[Tuple[str, str], List[RepositoryFileConfiguration]]
+        for repository in server_configuration.repositories:
+            repository_groups.setdefault(
+                (
+                    repository.branch if repository.branch is not None else DEFAULT_BRANCH,
+                    repository.filename if repository.filename is not None else DEFAULT_FILENAME
+                ),
+                []
+            ).append(repository)
+
+        batch_results = await gather(*(
+            fetch_gitlab_file_batch(
+                session=session,
+                semaphore=semaphore,
+                host_semaphores=host_semaphores,
+                server_configuration=server_configuration,
+                repositories=repository_batch,
+                branch=branch,
+                filename=filename,
+                output_folder=output_folder,
+                fetch_cache=fetch_cache,
+                retry_policy=retry_policy,
+                fetch_counters=fetch_counters
+            )
+            for (branch, filename), repositories in repository_groups.items()
+            for repository_batch in get_batches(repositories, graphql_batch_size)
+        ))
+        remaining_repositories = []
+        for batch_fetch_results, batch_remaining_repositories in batch_results:
+            fetch_results.extend(batch_fetch_results)
+            remaining_repositories.extend(batch_remaining_repositories)
+
+    fetch_results.extend(await gather(*(
+        fetch_repository_file(
+            session=session,
+            semaphore=semaphore,
+            host_semaphores=host_semaphores,
+            server_configuration=server_configuration,
+            repository=repository,
+            output_folder=output_folder,
+            fetch_cache=fetch_cache,
+            retry_policy=retry_policy,
+            fetch_counters=fetch_counters
+        )
+        for repository in remaining_repositories
+    )))
+    return fetch_results
+
+
+async def fetch_all_files(session: ClientSession, semaphore: Semaphore, host_semaphores: Dict[str, Semaphore],
+                          server_configurations: List[RepositoryServerConfiguration], output_folder: str,
+                          fetch_cache: Optional[FetchCache], retry_policy: RetryPolicy,
+                          fetch_counters: FetchCounters, graphql_batch_size: int) -> List[FetchResult]:
+    """Fetches the files from all the repositories in all the given server configurations concurrently."""
+    server_fetch_results = await gather(*(
+        fetch_server_files(
+            session=session,
+            semaphore=semaphore,
+            host_semaphores=host_semaphores,
+            server_configuration=server_configuration,
+            output_folder=output_folder,
+            fetch_cache=fetch_cache,
+            retry_policy=retry_policy,
+            fetch_counters=fetch_counters,
+            graphql_batch_size=graphql_batch_size
+        )
+        for server_configuration in server_configurations
+    ))
+    return [
+        fetch_result
+        for fetch_results in server_fetch_results
+        for fetch_result in fetch_results
+        if fetch_result is not None
+    ]
+
+
 async def start_fetch():
     """Fetches files from remote repositories."""
     configuration_folder = EnvironmentVariable(SERVER_CONFIG_FOLDER, str, None).value
@@ -405,44 +1005,116 @@ async def start_fetch():
         LOGGER.warning("No repository configurations found in the configuration folder")
         return
 
-    async with ClientSession(timeout=ClientTimeout(total=HTTP_TIMEOUT)) as session:  # type: ignore
-        for server_configuration in server_configurations:
-            for repository in server_configuration.repositories:
-                request_params, filename = get_repository_request_params(
-                    repository_name=repository.repository_name,
-                    repository_type=server_configuration.repository_type,
-                    filename=repository.filename,
-                    branch=repository.branch,
-                    check_certificate=server_configuration.certificate,
-                    host_name=server_configuration.host,
-                    access_token=server_configuration.access_token
-                )
-                if request_params is None or filename is None:
-                    continue
-
-                LOGGER.info("Fetching file '{}' from {} repository {}".format(
-                    filename, server_configuration.repository_type, repository.repository_name))
-                try:
-                    async with session.get(**request_params) as response:
-                        html_contents = await response.text()
-
-                        if response.status == 200:
-                            target_filename = get_output_filename(
-                                output_folder=output_folder,
-                                repository_type=server_configuration.repository_type,
-                                repository_name=repository.repository_name,
-                                filename=filename
-                            )
-                            await async_wrap(write_file)(html_contents, target_filename)
-
-                        else:
-                            LOGGER.warning("Repository: {}: received status '{}' when fetching file '{}': {}".format(
-                                repository, response.status, filename, html_contents))
-
-                except (ClientError, AsyncioTimeoutError) as client_error:
-                    LOGGER.error("Received '{}' when trying to fetch file from '{}': {}".format(
-                        type(client_error).__name__, repository.repository_name, client_error
-                    ))
+    fetch_concurrency = max(1, cast(int, EnvironmentVariable(FETCH_CONCURRENCY, int, DEFAULT_FETCH_CONCURRENCY).value))
+    host_concurrency = max(1, cast(int, EnvironmentVariable(
+        FETCH_HOST_CONCURRENCY, int, DEFAULT_FETCH_HOST_CONCURRENCY).value))
+    semaphore = Semaphore(fetch_concurrency)
+    host_semaphores = defaultdict(lambda: Semaphore(host_concurrency))  # type: Dict[str, Semaphore]
+
+    cache_filename = cast(str, EnvironmentVariable(FETCH_CACHE_FILE, str, DEFAULT_FETCH_CACHE_FILE).value)
+    fetch_cache = FetchCache(Path(output_folder) / cache_filename) if cache_filename else None
+
+    retry_policy = RetryPolicy(
+        max_retries=max(0, cast(int, EnvironmentVariable(FETCH_MAX_RETRIES, int, DEFAULT_MAX_RETRIES).value)),
+        base_delay=cast(float, EnvironmentVariable(FETCH_RETRY_BASE_DELAY, float, DEFAULT_BASE_DELAY).value),
+        max_delay=cast(float, EnvironmentVariable(FETCH_RETRY_MAX_DELAY, float, DEFAULT_MAX_DELAY).value)
+    )
+    fetch_counters = FetchCounters()
+    graphql_batch_size = cast(int, EnvironmentVariable(
+        FETCH_GRAPHQL_BATCH_SIZE, int, DEFAULT_FETCH_GRAPHQL_BATCH_SIZE).value)
+
+    # the connections are kept alive and reused for the following requests to the same host
+    connector = TCPConnector(
+        limit=fetch_concurrency,
+        limit_per_host=host_concurrency,
+        keepalive_timeout=KEEPALIVE_TIMEOUT,
+        ttl_dns_cache=DNS_CACHE_TIME
+    )
+
+    index_filename = cast(str, EnvironmentVariable(
+        FETCH_COMPONENT_INDEX_FILE, str, DEFAULT_FETCH_COMPONENT_INDEX_FILE).value)
+    component_index = ComponentIndex(Path(output_folder) / (index_filename or DEFAULT_FETCH_COMPONENT_INDEX_FILE))
+    repository_keys = {
+        get_repository_key(server_configuration, repository)
+        for server_configuration in server_configurations
+        for repository in server_configuration.repositories
+    }
+    component_index.retain(repository_keys)
+
+    simulation_files = [
+        simulation_file.strip()
+        for simulation_file in cast(str, EnvironmentVariable(SIMULATION_CONFIGURATION_FILES, str, "").value).split(",")
+        if simulation_file.strip()
+    ]
+    required_types = get_simulation_component_types(simulation_files) if simulation_files else None
+    if simulation_files and required_types is None:
+        LOGGER.warning("Fetching the files from all the repositories since the simulations could not be read")
+    elif required_types is not None:
+        # the local manifests are not in the index and they take priority over the fetched manifests
+        local_types = get_local_component_types(Path(output_folder))
+        LOGGER.info("{} of the {} required component types have local manifests".format(
+            len(required_types & local_types), len(required_types)))
+        required_types -= local_types
+
+    fetch_parameters = {
+        "semaphore": semaphore,
+        "host_semaphores": host_semaphores,
+        "output_folder": output_folder,
+        "fetch_cache": fetch_cache,
+        "retry_policy": retry_policy,
+        "fetch_counters": fetch_counters,
+        "graphql_batch_size": graphql_batch_size
+    }  # type: Dict[str, Any]
+
+    start_time = perf_counter()
+    async with ClientSession(connector=connector, timeout=ClientTimeout(total=HTTP_TIMEOUT)) as session:
+        if required_types is None:
+            completed_results = await fetch_all_files(
+                session=session, server_configurations=server_configurations, **fetch_parameters)
+            update_component_index(component_index, completed_results)
+
+        else:
+            # The first round fetches the repositories of the known component types and, if some component types
+            # are not in the index, all the repositories that are not in the index. If some component types are
+            # still not found, e.g. because they were moved to other repositories, the second round fetches
+            # all the remaining repositories.
+            completed_results = []
+            fetched_keys = set()  # type: Set[str]
+            missing_types = get_missing_component_types(component_index, required_types, repository_keys)
+            selected_keys = {
+                cast(str, component_index.get_repository(component_type))
+                for component_type in required_types - missing_types
+            }
+            if missing_types:
+                selected_keys |= repository_keys - component_index.indexed_repositories
+
+            for _ in range(2):
+                if not selected_keys:
+                    break
+                LOGGER.info("Fetching the files for {} component types from {}/{} repositories".format(
+                    len(required_types), len(selected_keys), len(repository_keys)))
+                round_results = await fetch_all_files(
+                    session=session,
+                    server_configurations=select_repositories(server_configurations, selected_keys),
+                    **fetch_parameters)
+                update_component_index(component_index, round_results)
+                completed_results.extend(round_results)
+                fetched_keys |= selected_keys
+
+                missing_types = get_missing_component_types(component_index, required_types, repository_keys)
+                selected_keys = repository_keys - fetched_keys if missing_types else set()
+
+            if missing_types:
+                LOGGER.warning("No manifest found for component types: {}".format(", ".join(sorted(missing_types))))
+
+    if fetch_cache is not None:
+        await async_wrap(fetch_cache.save)()
+    await async_wrap(component_index.save)()
+    log_fetch_summary(completed_results, perf_counter() - start_time, fetch_counters)
+
+    changes_filename = cast(str, EnvironmentVariable(FETCH_CHANGES_FILE, str, DEFAULT_FETCH_CHANGES_FILE).value)
+    if changes_filename:
+        await async_wrap(write_changes_file)(completed_results, output_folder, changes_filename)
 
 
 if __name__ == "__main__":
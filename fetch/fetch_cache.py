@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a local cache for the HTTP validators of the fetched files
+that is used to make conditional requests when the files are fetched again.
+"""
+
+from json import dump as json_dump, load as json_load, JSONDecodeError
+from pathlib import Path
+from typing import Dict, Optional
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+HEADER_ETAG = "ETag"
+HEADER_LAST_MODIFIED = "Last-Modified"
+HEADER_IF_NONE_MATCH = "If-None-Match"
+HEADER_IF_MODIFIED_SINCE = "If-Modified-Since"
+
+CACHE_ENTRY_TARGET = "Target"
+# the GitLab blob id for the files fetched using the GraphQL API
+CACHE_ENTRY_BLOB_ID = "BlobId"
+
+
+def get_cache_key(repository_type: str, repository_name: str, branch: str, filename: str) -> str:
+    """Returns the cache key for the given file in the given repository."""
+    return "/".join([repository_type, repository_name, branch, filename])
+
+
+class FetchCache:
+    """
+    Class for holding the ETag and Last-Modified validators, or the blob id for the files fetched using
+    the GitLab GraphQL API, for each fetched file together with the name of the local file where the contents
+    were written. The cache is stored as a JSON file.
+    """
+    def __init__(self, cache_filename: Path):
+        """Loads the cache from the given file. A missing or an invalid cache file results in an empty cache."""
+        self.__cache_filename = cache_filename
+        self.__entries = {}  # type: Dict[str, Dict[str, str]]
+        self.__is_modified = False
+
+        try:
+            if cache_filename.is_file():
+                with open(cache_filename, mode="r", encoding="UTF-8") as cache_file:
+                    cache_content = json_load(cache_file)
+                if isinstance(cache_content, dict):
+                    self.__entries = {
+                        cache_key: cache_entry
+                        for cache_key, cache_entry in cache_content.items()
+                        if isinstance(cache_entry, dict)
+                    }
+
+        except (OSError, JSONDecodeError) as cache_error:
+            LOGGER.warning("Ignoring the fetch cache '{}' due to '{}': {}".format(
+                cache_filename, type(cache_error).__name__, cache_error))
+
+    def get_request_headers(self, cache_key: str, target_filename: Path) -> Dict[str, str]:
+        """
+        Returns the conditional request headers for the given file.
+        No headers are returned if the previously fetched file is no longer available locally.
+        """
+        cache_entry = self.__entries.get(cache_key, None)
+        if cache_entry is None or cache_entry.get(CACHE_ENTRY_TARGET, None) != str(target_filename):
+            return {}
+        if not target_filename.is_file():
+            return {}
+
+        request_headers = {}
+        if HEADER_ETAG in cache_entry:
+            request_headers[HEADER_IF_NONE_MATCH] = cache_entry[HEADER_ETAG]
+        if HEADER_LAST_MODIFIED in cache_entry:
+            request_headers[HEADER_IF_MODIFIED_SINCE] = cache_entry[HEADER_LAST_MODIFIED]
+        return request_headers
+
+    def get_blob_id(self, cache_key: str, target_filename: Path) -> Optional[str]:
+        """
+        Returns the stored blob id for the given file.
+        None is returned if the previously fetched file is no longer available locally.
+        """
+        cache_entry = self.__entries.get(cache_key, None)
+        if cache_entry is None or cache_entry.get(CACHE_ENTRY_TARGET, None) != str(target_filename):
+            return None
+        if not target_filename.is_file():
+            return None
+        return cache_entry.get(CACHE_ENTRY_BLOB_ID, None)
+
+    def update_blob_id(self, cache_key: str, target_filename: Path, blob_id: Optional[str]):
+        """Stores the blob id for a file fetched using the GraphQL API. A missing blob id removes the cache entry."""
+        if blob_id is None:
+            self.remove(cache_key)
+            return
+
+        cache_entry = {CACHE_ENTRY_TARGET: str(target_filename), CACHE_ENTRY_BLOB_ID: blob_id}
+        if self.__entries.get(cache_key, None) != cache_entry:
+            self.__entries[cache_key] = cache_entry
+            self.__is_modified = True
+
+    def update(self, cache_key: str, target_filename: Path, etag: Optional[str], last_modified: Optional[str]):
+        """Stores the validators from a successful response. Responses without validators remove the cache entry."""
+        if etag is None and last_modified is None:
+            self.remove(cache_key)
+            return
+
+        cache_entry = {CACHE_ENTRY_TARGET: str(target_filename)}
+        if etag is not None:
+            cache_entry[HEADER_ETAG] = etag
+        if last_modified is not None:
+            cache_entry[HEADER_LAST_MODIFIED] = last_modified
+        if self.__entries.get(cache_key, None) != cache_entry:
+            self.__entries[cache_key] = cache_entry
+            self.__is_modified = True
+
+    def remove(self, cache_key: str):
+        """Removes the cache entry for the given file."""
+        if self.__entries.pop(cache_key, None) is not None:
+            self.__is_modified = True
+
+    def save(self) -> bool:
+        """Writes the cache to the cache file if it has been modified. Returns True, if the cache is up to date."""
+        if not self.__is_modified:
+            return True
+
+        try:
+            self.__cache_filename.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.__cache_filename, mode="w", encoding="UTF-8") as cache_file:
+                json_dump(self.__entries, cache_file, indent=4, sort_keys=True)
+            self.__is_modified = False
+            return True
+
+        except OSError as cache_error:
+            LOGGER.warning("Received '{}' when writing the fetch cache '{}': {}".format(
+                type(cache_error).__name__, self.__cache_filename, cache_error))
+            return False
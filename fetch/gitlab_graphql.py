@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the request parameters and the response parsing for fetching files from several
+GitLab projects with a single request to the GitLab GraphQL API.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, TypeVar
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+GRAPHQL_PATH = "api/graphql"
+
+# the maximum number of projects in a single request, GitLab returns at most 100 nodes per page
+MAX_GRAPHQL_BATCH_SIZE = 100
+
+# the query for fetching the same file from the same branch of several projects,
+# the blob ids (oid) are used to skip downloading the files that have not changed
+BLOBS_QUERY = """
+query ($fullPaths: [String!], $first: Int, $ref: String!, $paths: [String!]!) {
+  projects(fullPaths: $fullPaths, first: $first) {
+    nodes {
+      fullPath
+      repository {
+        blobs(ref: $ref, paths: $paths) {
+          nodes {
+            path
+            oid
+            rawTextBlob
+          }
+        }
+      }
+    }
+  }
+}
+""".strip()
+# the query for fetching only the blob ids of the same file from the same branch of several projects
+BLOB_IDS_QUERY = """
+query ($fullPaths: [String!], $first: Int, $ref: String!, $paths: [String!]!) {
+  projects(fullPaths: $fullPaths, first: $first) {
+    nodes {
+      fullPath
+      repository {
+        blobs(ref: $ref, paths: $paths) {
+          nodes {
+            path
+            oid
+          }
+        }
+      }
+    }
+  }
+}
+""".strip()
+
+BatchItem = TypeVar("BatchItem")
+
+
+def get_batches(items: List[BatchItem], batch_size: int) -> Iterator[List[BatchItem]]:
+    """Returns the given items in consecutive batches of at most the given size."""
+    batch_size = max(1, min(batch_size, MAX_GRAPHQL_BATCH_SIZE))
+    for batch_start in range(0, len(items), batch_size):
+        yield items[batch_start:batch_start + batch_size]
+
+
+def get_graphql_request_params(host_name: str, project_paths: List[str], branch: str, filename: str,
+                               check_certificate: bool = True, access_token: Optional[str] = None,
+                               include_contents: bool = True) -> Dict[str, Any]:
+    """
+    Returns a dictionary containing the required parameters for a aiohttp POST request
+    to fetch the given file from the given branch of all the given GitLab projects.
+    If include_contents is False, only the blob ids of the files are fetched.
+    """
+    request_params = {
+        "url": "/".join([host_name.rstrip("/"), GRAPHQL_PATH]),
+        "json": {
+            "query": BLOBS_QUERY if include_contents else BLOB_IDS_QUERY,
+            "variables": {
+                "fullPaths": project_paths,
+                "first": len(project_paths),
+                "ref": branch,
+                "paths": [filename]
+            }
+        },
+        "ssl": check_certificate
+    }  # type: Dict[str, Any]
+    if access_token is not None:
+        request_params["headers"] = {
+            "Authorization": "Bearer {}".format(access_token)
+        }
+
+    return request_params
+
+
+def get_blob_nodes(response_content: Any, filename: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Returns the blob node for the given file for each project found in the given GraphQL response
+    using the lower case project paths as keys. Projects without the file are not included.
+    """
+    if not isinstance(response_content, dict):
+        return {}
+    for error in response_content.get("errors", None) or []:
+        LOGGER.warning("GraphQL error: {}".format(error.get("message", error) if isinstance(error, dict) else error))
+
+    try:
+        project_nodes = response_content["data"]["projects"]["nodes"]
+    except (KeyError, TypeError):
+        return {}
+
+    blob_nodes = {}
+    for project_node in project_nodes or []:
+        try:
+            project_blob_nodes = project_node["repository"]["blobs"]["nodes"]
+            project_path = str(project_node["fullPath"]).lower()
+        except (KeyError, TypeError):
+            continue
+
+        for blob_node in project_blob_nodes or []:
+            if isinstance(blob_node, dict) and blob_node.get("path", None) == filename:
+                blob_nodes[project_path] = blob_node
+
+    return blob_nodes
+
+
+def get_blob_contents(response_content: Any, filename: str) -> Dict[str, str]:
+    """
+    Returns the contents of the given file for each project found in the given GraphQL response
+    using the lower case project paths as keys. Projects without the file are not included.
+    """
+    return {
+        project_path: blob_node["rawTextBlob"]
+        for project_path, blob_node in get_blob_nodes(response_content, filename).items()
+        if isinstance(blob_node.get("rawTextBlob", None), str)
+    }
+
+
+def get_blob_ids(response_content: Any, filename: str) -> Dict[str, str]:
+    """
+    Returns the blob id of the given file for each project found in the given GraphQL response
+    using the lower case project paths as keys. Projects without the file are not included.
+    """
+    return {
+        project_path: blob_node["oid"]
+        for project_path, blob_node in get_blob_nodes(response_content, filename).items()
+        if isinstance(blob_node.get("oid", None), str)
+    }
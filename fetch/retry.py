@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the retry policy for the requests made by the fetcher.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from random import uniform
+from typing import Optional
+
+HEADER_RETRY_AFTER = "Retry-After"
+
+# the HTTP status codes for the responses that are considered transient failures
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 30.0
+
+
+def parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+    """
+    Returns the delay in seconds from the given Retry-After header value that can be either
+    the number of seconds or an HTTP date. Returns None for a missing or an invalid value.
+    """
+    if retry_after is None:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+
+    try:
+        retry_time = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+    if retry_time.tzinfo is None:
+        retry_time = retry_time.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Data class for holding the parameters for retrying failed requests with exponential backoff.
+    - max_retries: the maximum number of retries after the first attempt
+    - base_delay: the maximum delay in seconds before the first retry, doubled for each following retry
+    - max_delay: the upper limit in seconds for any delay, including the delays given by the Retry-After header
+    """
+    max_retries: int = DEFAULT_MAX_RETRIES
+    base_delay: float = DEFAULT_BASE_DELAY
+    max_delay: float = DEFAULT_MAX_DELAY
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Returns the delay in seconds before the next attempt after the given failed attempt (starting from 0).
+        The delay given by the server in the Retry-After header is used when available.
+        Otherwise, a random delay up to the exponentially growing backoff limit is used (full jitter).
+        """
+        server_delay = parse_retry_after(retry_after)
+        if server_delay is not None:
+            return min(server_delay, self.max_delay)
+        return uniform(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+@dataclass
+class FetchCounters:
+    """
+    Data class for counting the requests made by the fetcher.
+    - requests: the number of requests made, including the retries
+    - retries: the number of retried requests
+    - failures: the number of files that could not be fetched after all the retries
+    """
+    requests: int = 0
+    retries: int = 0
+    failures: int = 0
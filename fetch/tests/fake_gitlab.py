@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains an in-process fake GitLab server that can be used for testing the manifest fetcher
+without a real GitLab instance. Only the raw file REST endpoint and the blobs query of the GraphQL API
+are implemented.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, List, Optional, Set
+
+from aiohttp import web
+
+# the request types that are counted by the server
+REQUEST_REST = "rest"
+REQUEST_GRAPHQL = "graphql"
+
+
+class FakeGitlabServer:
+    """
+    In-process fake GitLab server that serves the files of the configured projects.
+    The server listens to a local TCP port and the address can be used as the host in the server configuration.
+    """
+    def __init__(self, files: Dict[str, Dict[str, str]], latency: float = 0.0, graphql_enabled: bool = True,
+                 graphql_hidden_projects: Optional[List[str]] = None):
+        """
+        Sets up the fake GitLab server.
+        - files: the file contents for each project using the full project path and the file path as keys,
+                 the same contents are served for all branches
+        - latency: the time in seconds that answering each request takes
+        - graphql_enabled: if False, the GraphQL endpoint responds with status 404 like an old GitLab server
+        - graphql_hidden_projects: the projects that are not included in the GraphQL responses
+        """
+        self.__files = files
+        self.__latency = latency
+        self.__graphql_enabled = graphql_enabled
+        self.__graphql_hidden_projects = set(graphql_hidden_projects or [])  # type: Set[str]
+
+        # the HTTP status codes to respond with for the next requests of each request type
+        self.__failures = {}  # type: Dict[str, List[int]]
+        self.__request_counts = {REQUEST_REST: 0, REQUEST_GRAPHQL: 0}
+        self.__active_requests = 0
+        self.__max_active_requests = 0
+
+        self.__runner = None  # type: Optional[web.AppRunner]
+        self.__url = None  # type: Optional[str]
+
+    @property
+    def url(self) -> str:
+        """The address of the fake GitLab server."""
+        if self.__url is None:
+            raise RuntimeError("The fake GitLab server has not been started")
+        return self.__url
+
+    @property
+    def request_counts(self) -> Dict[str, int]:
+        """The number of handled requests for each request type."""
+        return self.__request_counts
+
+    @property
+    def max_active_requests(self) -> int:
+        """The highest number of requests that were handled concurrently."""
+        return self.__max_active_requests
+
+    def add_failures(self, request_type: str, status_codes: List[int]):
+        """Makes the server respond to the next requests of the given type with the given HTTP status codes."""
+        self.__failures.setdefault(request_type, []).extend(status_codes)
+
+    async def start(self):
+        """Starts the fake GitLab server to a free local port."""
+        application = web.Application()
+        application.add_routes([
+            web.get("/api/v4/projects/{project}/repository/files/{filename}/raw", self.__handle_raw_file),
+            web.post("/api/graphql", self.__handle_graphql)
+        ])
+        self.__runner = web.AppRunner(application)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host="127.0.0.1", port=0)
+        await site.start()
+        port = self.__runner.addresses[0][1]
+        self.__url = "http://127.0.0.1:{}".format(port)
+
+    async def stop(self):
+        """Stops the fake GitLab server."""
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    @staticmethod
+    def __get_etag(contents: str) -> str:
+        return '"{}"'.format(hashlib.sha256(contents.encode("UTF-8")).hexdigest())
+
+    @staticmethod
+    def __get_blob_id(contents: str) -> str:
+        """Returns the Git blob id for the given file contents."""
+        file_bytes = contents.encode("UTF-8")
+        return hashlib.sha1(b"blob " + str(len(file_bytes)).encode("UTF-8") + b"\0" + file_bytes).hexdigest()
+
+    async def __start_request(self, request_type: str) -> Optional[web.Response]:
+        """Counts the request and returns the failure response, if one has been configured for the request type."""
+        self.__request_counts[request_type] += 1
+        self.__active_requests += 1
+        self.__max_active_requests = max(self.__max_active_requests, self.__active_requests)
+        try:
+            if self.__latency > 0:
+                await asyncio.sleep(self.__latency)
+        finally:
+            self.__active_requests -= 1
+
+        failures = self.__failures.get(request_type, [])
+        if failures:
+            return web.Response(status=failures.pop(0), text="Simulated failure", headers={"Retry-After": "0"})
+        return None
+
+    async def __handle_raw_file(self, request: web.Request) -> web.Response:
+        failure_response = await self.__start_request(REQUEST_REST)
+        if failure_response is not None:
+            return failure_response
+
+        contents = self.__files.get(request.match_info["project"], {}).get(request.match_info["filename"], None)
+        if contents is None:
+            return web.json_response({"message": "404 File Not Found"}, status=404)
+
+        etag = self.__get_etag(contents)
+        if request.headers.get("If-None-Match", None) == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=contents, headers={"ETag": etag})
+
+    async def __handle_graphql(self, request: web.Request) -> web.Response:
+        failure_response = await self.__start_request(REQUEST_GRAPHQL)
+        if failure_response is not None:
+            return failure_response
+        if not self.__graphql_enabled:
+            return web.json_response({"message": "404 Not Found"}, status=404)
+
+        request_content = await request.json()
+        variables = request_content.get("variables", {})  # type: Dict[str, Any]
+        # the file contents are only included if they are requested in the query
+        include_contents = "rawTextBlob" in request_content.get("query", "")
+        project_nodes = []
+        for project_path in variables.get("fullPaths", None) or []:
+            if project_path not in self.__files or project_path in self.__graphql_hidden_projects:
+                continue
+            project_files = self.__files[project_path]
+            project_nodes.append({
+                "fullPath": project_path,
+                "repository": {
+                    "blobs": {
+                        "nodes": [
+                            {
+                                "path": file_path,
+                                "oid": self.__get_blob_id(project_files[file_path]),
+                                **({"rawTextBlob": project_files[file_path]} if include_contents else {})
+                            }
+                            for file_path in variables.get("paths", [])
+                            if file_path in project_files
+                        ]
+                    }
+                }
+            })
+
+        return web.json_response({"data": {"projects": {"nodes": project_nodes}}})
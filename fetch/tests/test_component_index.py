@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for the component index and for finding the component types used in simulations."""
+
+import pathlib
+from typing import cast
+
+from fetch.component_index import (
+    ComponentIndex, get_local_component_types, get_manifest_component_type, get_simulation_component_types)
+from fetch.fetch import (
+    get_missing_component_types, get_repository_key, GITHUB, GITLAB, RepositoryFileConfiguration,
+    RepositoryServerConfiguration, select_repositories)
+
+
+def test_get_simulation_component_types(tmp_path: pathlib.Path):
+    """Tests that the component types are collected from all the simulation configuration files."""
+    first_file = tmp_path / "first.yml"
+    first_file.write_text("Components:\n    Grid:\n        grid: {}\n    Storage: {}\n", encoding="UTF-8")
+    second_file = tmp_path / "second.yml"
+    second_file.write_text("Components:\n    Grid: {}\n    Weather: {}\n", encoding="UTF-8")
+    assert get_simulation_component_types([str(first_file), str(second_file)]) == {"Grid", "Storage", "Weather"}
+
+    invalid_file = tmp_path / "invalid.yml"
+    invalid_file.write_text("Simulation: {}\n", encoding="UTF-8")
+    assert get_simulation_component_types([str(first_file), str(invalid_file)]) is None
+    assert get_simulation_component_types([str(tmp_path / "missing.yml")]) is None
+
+
+def test_get_manifest_component_type(tmp_path: pathlib.Path):
+    """Tests reading the component type name from a manifest file."""
+    manifest_file = tmp_path / "component_manifest.yml"
+    manifest_file.write_text("Name: Storage\nType: platform\n", encoding="UTF-8")
+    assert get_manifest_component_type(manifest_file) == "Storage"
+    assert get_manifest_component_type(tmp_path / "missing.yml") is None
+
+
+def test_get_local_component_types(tmp_path: pathlib.Path):
+    """Tests that only the manifests in the root manifest folder and under the local folder are local."""
+    (tmp_path / "root_manifest.yml").write_text("Name: Grid\n", encoding="UTF-8")
+    (tmp_path / "notes.txt").write_text("Name: Notes\n", encoding="UTF-8")
+    (tmp_path / "local" / "storage").mkdir(parents=True)
+    (tmp_path / "local" / "storage" / "component_manifest.yaml").write_text("Name: Storage\n", encoding="UTF-8")
+    (tmp_path / "gitlab" / "group").mkdir(parents=True)
+    (tmp_path / "gitlab" / "group" / "component_manifest.yml").write_text("Name: Weather\n", encoding="UTF-8")
+    assert get_local_component_types(tmp_path) == {"Grid", "Storage"}
+    assert get_local_component_types(tmp_path / "missing") == set()
+
+
+def test_component_index(tmp_path: pathlib.Path):
+    """Tests updating, retaining and storing the component index."""
+    index_filename = tmp_path / "index.json"
+    component_index = ComponentIndex(index_filename)
+    component_index.update("repository_1", "Grid")
+    component_index.update("repository_2", "Storage")
+    # a repository now contains a different component type
+    component_index.update("repository_2", "Battery")
+    assert component_index.get_repository("Storage") is None
+    assert component_index.get_repository("Battery") == "repository_2"
+
+    component_index.update("repository_3", "Weather")
+    component_index.retain(["repository_1", "repository_2"])
+    assert component_index.indexed_repositories == {"repository_1", "repository_2"}
+    assert component_index.save()
+
+    stored_index = ComponentIndex(index_filename)
+    assert stored_index.get_repository("Grid") == "repository_1"
+    assert stored_index.get_repository("Weather") is None
+
+    # a repository without a readable manifest no longer provides any component type
+    stored_index.update("repository_1", None)
+    assert stored_index.indexed_repositories == {"repository_2"}
+
+
+def test_select_repositories(tmp_path: pathlib.Path):
+    """Tests selecting the repositories for the required component types using the index."""
+    server_configurations = [
+        RepositoryServerConfiguration(
+            repository_type=GITLAB,
+            repositories=[RepositoryFileConfiguration("group/grid"), RepositoryFileConfiguration("group/storage")]),
+        RepositoryServerConfiguration(
+            repository_type=GITHUB,
+            repositories=[RepositoryFileConfiguration("user/weather")])
+    ]
+    repository_keys = {
+        get_repository_key(server_configuration, repository): repository.repository_name
+        for server_configuration in server_configurations
+        for repository in server_configuration.repositories
+    }
+    component_index = ComponentIndex(tmp_path / "index.json")
+    for repository_key, repository_name in repository_keys.items():
+        if repository_name != "user/weather":
+            component_index.update(repository_key, repository_name.split("/")[1].capitalize())
+
+    assert get_missing_component_types(component_index, {"Grid", "Weather"}, set(repository_keys)) == {"Weather"}
+
+    selected_configurations = select_repositories(server_configurations, {
+        cast(str, component_index.get_repository("Grid"))})
+    assert len(selected_configurations) == 1
+    assert [repository.repository_name for repository in selected_configurations[0].repositories] == ["group/grid"]
+    # the original configurations are not modified
+    assert len(server_configurations[0].repositories) == 2
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for fetching the manifest files from a fake GitLab server."""
+
+import asyncio
+import pathlib
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pytest
+from aiohttp import ClientSession
+
+from fetch.fetch import (
+    fetch_all_files, FETCH_CACHE_FILE, FETCH_GRAPHQL_BATCH_SIZE, FetchResult, FETCH_STATUS_HTTP_ERROR,
+    FETCH_STATUS_NOT_MODIFIED, FETCH_STATUS_OK, GITLAB, MANIFEST_FOLDER, RepositoryFileConfiguration,
+    RepositoryServerConfiguration, SERVER_CONFIG_FOLDER, SIMULATION_CONFIGURATION_FILES, start_fetch, write_file,
+    WRITE_STATUS_CHANGED, WRITE_STATUS_FAILED, WRITE_STATUS_UNCHANGED)
+from fetch.fetch_cache import FetchCache
+from fetch.retry import FetchCounters, RetryPolicy
+from fetch.tests.fake_gitlab import FakeGitlabServer, REQUEST_GRAPHQL, REQUEST_REST
+
+MANIFEST_FILENAME = "component_manifest.yml"
+
+
+def get_project_files(prefix: str, count: int) -> Dict[str, Dict[str, str]]:
+    """Returns the manifest files for the given number of projects."""
+    return {
+        "group/{}_{}".format(prefix, index): {MANIFEST_FILENAME: "Name: {}_{}\n".format(prefix, index)}
+        for index in range(count)
+    }
+
+
+def get_server_configuration(host: str, projects: List[str]) -> RepositoryServerConfiguration:
+    """Returns the server configuration for the given GitLab projects."""
+    return RepositoryServerConfiguration(
+        repository_type=GITLAB,
+        repositories=[RepositoryFileConfiguration(repository_name=project) for project in projects],
+        host=host
+    )
+
+
+async def fetch_files(server_configurations: List[RepositoryServerConfiguration], output_folder: pathlib.Path,
+                      concurrency: int = 16, host_concurrency: int = 4, graphql_batch_size: int = 0,
+                      fetch_cache: Optional[FetchCache] = None) -> List[FetchResult]:
+    """Fetches the files from the given servers using the given limits."""
+    async with ClientSession() as session:
+        return await fetch_all_files(
+            session=session,
+            semaphore=asyncio.Semaphore(concurrency),
+            host_semaphores=defaultdict(lambda: asyncio.Semaphore(host_concurrency)),
+            server_configurations=server_configurations,
+            output_folder=str(output_folder),
+            fetch_cache=fetch_cache,
+            retry_policy=RetryPolicy(max_retries=2, base_delay=0.0, max_delay=0.0),
+            fetch_counters=FetchCounters(),
+            graphql_batch_size=graphql_batch_size
+        )
+
+
+def test_slow_host_does_not_block_fast_host(tmp_path: pathlib.Path):
+    """Tests that the requests waiting for a slow host do not hold the global request slots."""
+    slow_latency = 0.3
+    slow_files = get_project_files("slow", 6)
+    fast_files = get_project_files("fast", 2)
+
+    async def run_test() -> List[FetchResult]:
+        slow_server = FakeGitlabServer(slow_files, latency=slow_latency)
+        fast_server = FakeGitlabServer(fast_files)
+        await slow_server.start()
+        await fast_server.start()
+        try:
+            return await fetch_files(
+                [
+                    get_server_configuration(slow_server.url, list(slow_files)),
+                    # a different host name for the same address, so that the hosts have separate limits
+                    get_server_configuration(fast_server.url.replace("127.0.0.1", "localhost"), list(fast_files))
+                ],
+                tmp_path, concurrency=3, host_concurrency=2)
+        finally:
+            await slow_server.stop()
+            await fast_server.stop()
+
+    fetch_results = asyncio.run(run_test())
+    assert len(fetch_results) == 8
+    assert all(fetch_result.status == FETCH_STATUS_OK for fetch_result in fetch_results)
+    fast_durations = [
+        fetch_result.duration for fetch_result in fetch_results if fetch_result.repository_name in fast_files
+    ]
+    assert max(fast_durations) < slow_latency
+
+
+def test_conditional_requests(tmp_path: pathlib.Path):
+    """Tests that the second fetch uses the cached validators and the unchanged files are not written again."""
+    project_files = get_project_files("project", 3)
+
+    async def run_test() -> List[List[FetchResult]]:
+        server = FakeGitlabServer(project_files)
+        await server.start()
+        try:
+            fetch_rounds = []
+            for _ in range(2):
+                fetch_cache = FetchCache(tmp_path / "cache.json")
+                fetch_rounds.append(await fetch_files(
+                    [get_server_configuration(server.url, list(project_files))], tmp_path, fetch_cache=fetch_cache))
+                assert fetch_cache.save()
+            return fetch_rounds
+        finally:
+            await server.stop()
+
+    first_results, second_results = asyncio.run(run_test())
+    assert all(fetch_result.status == FETCH_STATUS_OK and fetch_result.changed for fetch_result in first_results)
+    assert all(fetch_result.status == FETCH_STATUS_NOT_MODIFIED for fetch_result in second_results)
+    assert all(fetch_result.http_status == 304 for fetch_result in second_results)
+
+
+def test_retry_transient_failures(tmp_path: pathlib.Path):
+    """Tests that the transient failures are retried and the permanent failures are not."""
+    project_files = get_project_files("project", 1)
+
+    async def run_test() -> List[FetchResult]:
+        server = FakeGitlabServer(project_files)
+        server.add_failures(REQUEST_REST, [503, 429])
+        await server.start()
+        try:
+            fetch_results = await fetch_files([get_server_configuration(server.url, list(project_files))], tmp_path)
+            assert server.request_counts[REQUEST_REST] == 3
+
+            server.add_failures(REQUEST_REST, [404])
+            fetch_results += await fetch_files([get_server_configuration(server.url, list(project_files))], tmp_path)
+            assert server.request_counts[REQUEST_REST] == 4
+            return fetch_results
+        finally:
+            await server.stop()
+
+    retried_result, failed_result = asyncio.run(run_test())
+    assert retried_result.status == FETCH_STATUS_OK
+    assert retried_result.retries == 2
+    assert failed_result.status == FETCH_STATUS_HTTP_ERROR
+    assert failed_result.retries == 0
+
+
+def test_write_file(tmp_path: pathlib.Path):
+    """Tests that the file is written only when the contents change and no temporary files are left behind."""
+    filename = tmp_path / "server" / "project" / MANIFEST_FILENAME
+    assert write_file("Name: first\n", filename) == WRITE_STATUS_CHANGED
+    modification_time = filename.stat().st_mtime_ns
+    assert write_file("Name: first\n", filename) == WRITE_STATUS_UNCHANGED
+    assert filename.stat().st_mtime_ns == modification_time
+
+    assert write_file("Name: second\n", filename) == WRITE_STATUS_CHANGED
+    assert filename.read_text(encoding="UTF-8") == "Name: second\n"
+    assert [path.name for path in filename.parent.iterdir()] == [MANIFEST_FILENAME]
+
+
+def test_write_file_failure(tmp_path: pathlib.Path):
+    """Tests that a failed write keeps the previous file and removes the temporary file."""
+    filename = tmp_path / MANIFEST_FILENAME
+    assert write_file("Name: first\n", filename) == WRITE_STATUS_CHANGED
+
+    # a directory cannot be replaced with a file
+    directory_target = tmp_path / "directory"
+    (directory_target / "inner").mkdir(parents=True)
+    assert write_file("Name: second\n", directory_target) == WRITE_STATUS_FAILED
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([MANIFEST_FILENAME, "directory"])
+    assert filename.read_text(encoding="UTF-8") == "Name: first\n"
+
+
+def test_graphql_batch_skips_unchanged_files(tmp_path: pathlib.Path):
+    """Tests that only the files with a changed blob id are downloaded again using the GraphQL API."""
+    project_files = get_project_files("project", 4)
+    changed_project = "group/project_2"
+
+    async def run_test() -> List[List[FetchResult]]:
+        server = FakeGitlabServer(project_files)
+        await server.start()
+        try:
+            fetch_rounds = []
+            for fetch_round in range(3):
+                if fetch_round == 2:
+                    project_files[changed_project][MANIFEST_FILENAME] = "Name: changed\n"
+                fetch_cache = FetchCache(tmp_path / "cache.json")
+                fetch_rounds.append(await fetch_files(
+                    [get_server_configuration(server.url, list(project_files))], tmp_path,
+                    graphql_batch_size=10, fetch_cache=fetch_cache))
+                assert fetch_cache.save()
+            # one full query, one blob id query and finally one blob id query and one full query
+            assert server.request_counts == {REQUEST_GRAPHQL: 4, REQUEST_REST: 0}
+            return fetch_rounds
+        finally:
+            await server.stop()
+
+    first_results, second_results, third_results = asyncio.run(run_test())
+    assert all(fetch_result.status == FETCH_STATUS_OK and fetch_result.changed for fetch_result in first_results)
+    assert all(fetch_result.status == FETCH_STATUS_NOT_MODIFIED for fetch_result in second_results)
+    assert {
+        fetch_result.repository_name: fetch_result.status
+        for fetch_result in third_results
+    } == {
+        project: FETCH_STATUS_OK if project == changed_project else FETCH_STATUS_NOT_MODIFIED
+        for project in project_files
+    }
+    changed_file = next(
+        fetch_result.output_filename
+        for fetch_result in third_results
+        if fetch_result.repository_name == changed_project
+    )
+    assert changed_file is not None and changed_file.read_text(encoding="UTF-8") == "Name: changed\n"
+
+
+def test_graphql_batch_fallback(tmp_path: pathlib.Path):
+    """Tests that the files missing from the GraphQL responses are fetched using the REST API."""
+    project_files = get_project_files("project", 4)
+
+    async def run_test(graphql_enabled: bool, hidden_projects: List[str]) -> List[FetchResult]:
+        server = FakeGitlabServer(
+            project_files, graphql_enabled=graphql_enabled, graphql_hidden_projects=hidden_projects)
+        await server.start()
+        try:
+            fetch_results = await fetch_files(
+                [get_server_configuration(server.url, list(project_files))], tmp_path, graphql_batch_size=10)
+            assert server.request_counts == {
+                REQUEST_GRAPHQL: 1,
+                REQUEST_REST: len(project_files) if not graphql_enabled else len(hidden_projects)
+            }
+            return fetch_results
+        finally:
+            await server.stop()
+
+    for graphql_enabled, hidden_projects in [(True, ["group/project_1"]), (False, [])]:
+        fetch_results = asyncio.run(run_test(graphql_enabled, hidden_projects))
+        assert len(fetch_results) == len(project_files)
+        assert all(fetch_result.status == FETCH_STATUS_OK for fetch_result in fetch_results)
+
+
+def test_start_fetch_local_manifests(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    """Tests that the component types with local manifests do not cause the fetching of all the repositories."""
+    project_files = get_project_files("project", 3)
+    configuration_folder = tmp_path / "components"
+    manifest_folder = tmp_path / "manifests"
+    (manifest_folder / "local" / "grid").mkdir(parents=True)
+    (manifest_folder / "local" / "grid" / MANIFEST_FILENAME).write_text("Name: Grid\n", encoding="UTF-8")
+    (manifest_folder / "root_manifest.yml").write_text("Name: Storage\n", encoding="UTF-8")
+    simulation_file = tmp_path / "simulation.yml"
+    simulation_file.write_text("Components:\n    project_0: {}\n    Grid: {}\n    Storage: {}\n", encoding="UTF-8")
+
+    monkeypatch.setenv(SERVER_CONFIG_FOLDER, str(configuration_folder))
+    monkeypatch.setenv(MANIFEST_FOLDER, str(manifest_folder))
+    monkeypatch.setenv(SIMULATION_CONFIGURATION_FILES, str(simulation_file))
+    monkeypatch.setenv(FETCH_GRAPHQL_BATCH_SIZE, "0")
+    # without the cache every fetched file results in a request to the server
+    monkeypatch.setenv(FETCH_CACHE_FILE, "")
+
+    async def run_test() -> List[int]:
+        server = FakeGitlabServer(project_files)
+        await server.start()
+        try:
+            configuration_folder.mkdir()
+            (configuration_folder / "gitlab.yml").write_text(
+                "Type: GitLab\nHost: {}\nRepositories:\n{}".format(
+                    server.url, "".join("    - {}\n".format(project) for project in project_files)),
+                encoding="UTF-8")
+
+            request_counts = []
+            # the first fetch builds the component index, the second fetch uses it
+            for _ in range(2):
+                await start_fetch()
+                request_counts.append(server.request_counts[REQUEST_REST])
+            return request_counts
+        finally:
+            await server.stop()
+
+    assert asyncio.run(run_test()) == [3, 4]
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for the validator cache used to make conditional requests."""
+
+import pathlib
+
+from fetch.fetch_cache import FetchCache, HEADER_IF_MODIFIED_SINCE, HEADER_IF_NONE_MATCH, get_cache_key
+
+CACHE_KEY = get_cache_key("GitLab", "group/project", "master", "component_manifest.yml")
+
+
+def test_request_headers(tmp_path: pathlib.Path):
+    """Tests that the conditional headers are returned only when the local file is available."""
+    target_filename = tmp_path / "manifest.yml"
+    fetch_cache = FetchCache(tmp_path / "cache.json")
+    fetch_cache.update(CACHE_KEY, target_filename, '"etag"', "Mon, 01 Feb 2021 10:00:00 GMT")
+
+    # the local file is missing
+    assert fetch_cache.get_request_headers(CACHE_KEY, target_filename) == {}
+
+    target_filename.write_text("Name: component\n", encoding="UTF-8")
+    assert fetch_cache.get_request_headers(CACHE_KEY, target_filename) == {
+        HEADER_IF_NONE_MATCH: '"etag"',
+        HEADER_IF_MODIFIED_SINCE: "Mon, 01 Feb 2021 10:00:00 GMT"
+    }
+    # the file was written to a different target
+    assert fetch_cache.get_request_headers(CACHE_KEY, tmp_path / "other.yml") == {}
+
+
+def test_update_without_validators(tmp_path: pathlib.Path):
+    """Tests that a response without validators removes the cache entry."""
+    target_filename = tmp_path / "manifest.yml"
+    target_filename.write_text("Name: component\n", encoding="UTF-8")
+    fetch_cache = FetchCache(tmp_path / "cache.json")
+    fetch_cache.update(CACHE_KEY, target_filename, '"etag"', None)
+    fetch_cache.update(CACHE_KEY, target_filename, None, None)
+    assert fetch_cache.get_request_headers(CACHE_KEY, target_filename) == {}
+
+
+def test_save_and_load(tmp_path: pathlib.Path):
+    """Tests that the saved cache is loaded back and that an invalid cache file results in an empty cache."""
+    cache_filename = tmp_path / "cache" / "cache.json"
+    target_filename = tmp_path / "manifest.yml"
+    target_filename.write_text("Name: component\n", encoding="UTF-8")
+
+    fetch_cache = FetchCache(cache_filename)
+    fetch_cache.update(CACHE_KEY, target_filename, '"etag"', None)
+    assert fetch_cache.save()
+    assert FetchCache(cache_filename).get_request_headers(CACHE_KEY, target_filename) == {
+        HEADER_IF_NONE_MATCH: '"etag"'
+    }
+
+    cache_filename.write_text("{not json", encoding="UTF-8")
+    assert FetchCache(cache_filename).get_request_headers(CACHE_KEY, target_filename) == {}
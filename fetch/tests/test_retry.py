@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for the retry policy of the fetcher."""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from fetch.retry import RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after_seconds():
+    """Tests the Retry-After values given in seconds."""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-5") == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_parse_retry_after_date():
+    """Tests the Retry-After values given as HTTP dates."""
+    future_date = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=60), usegmt=True)
+    assert parse_retry_after(future_date) == pytest.approx(60.0, abs=2.0)
+    past_date = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=60), usegmt=True)
+    assert parse_retry_after(past_date) == 0.0
+
+
+def test_delay_from_retry_after():
+    """Tests that the server given delay is used and limited by the maximum delay."""
+    retry_policy = RetryPolicy(base_delay=0.5, max_delay=10.0)
+    assert retry_policy.get_delay(0, "4") == 4.0
+    assert retry_policy.get_delay(0, "120") == 10.0
+
+
+def test_backoff_limits():
+    """Tests that the random backoff stays within the exponentially growing limit and the maximum delay."""
+    retry_policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for attempt, limit in enumerate([0.5, 1.0, 2.0, 3.0, 3.0]):
+        delays = [retry_policy.get_delay(attempt) for _ in range(100)]
+        assert all(0.0 <= delay <= limit for delay in delays)
@@ -5,58 +5,52 @@
 # Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
 
 # Script to follow a running simulation with a colored output simular to docker-compose logs.
-
-container_prefix="Sim${1}_"
-current_color_number=1
-
-set_color_code () {
-    if [[ $1 == "SimulationManager" ]]
-    then
-        color_code="1;31"  # red
-    elif [[ $1 == "LogWriter" ]]
-    then
-        color_code="1;37"  # white
-    elif [[ $current_color_number == 1 ]]
-    then
-        color_code="1;32"  # green
-        current_color_number=2
-    elif [[ $current_color_number == 2 ]]
-    then
-        color_code="1;33"  # yellow
-        current_color_number=3
-    elif [[ $current_color_number == 3 ]]
-    then
-        color_code="1;34"  # blue
-        current_color_number=4
-    elif [[ $current_color_number == 4 ]]
-    then
-        color_code="1;35"  # magenta
-        current_color_number=5
-    elif [[ $current_color_number == 5 ]]
+# Usage: source follow_simulation.sh <simulation_index> [--level <level>] [--output <file>] [--tail <lines>]
+# The simulation index is the number in the container name prefix, e.g. 01 for the containers starting with Sim01_.
+
+source "$(dirname "${BASH_SOURCE[0]}")/platform_manager_utility.sh"
+
+# the log follower from the platform manager image reads the log streams of all the simulation containers
+# within a single process, a terminal is allocated only when the output is a terminal to enable the colors
+terminal_option=""
+if [ -t 1 ]
+then
+    terminal_option="--tty"
+fi
+
+# the folder of the output file is mounted to the container and the output file is given relative to it
+follower_arguments=()
+output_options=()
+while [ $# -gt 0 ]
+do
+    if [[ "$1" == "--output" ]] || [[ "$1" == "--output="* ]]
     then
-        color_code="1;36"  # cyan
-        current_color_number=1
+        if [[ "$1" == "--output" ]]
+        then
+            output_file=$2
+            shift
+        else
+            output_file=${1#--output=}
+        fi
+        output_file=$(realpath -m "$output_file")
+        output_options=(--volume "$(dirname "$output_file")":/follow_output)
+        follower_arguments+=(--output "/follow_output/$(basename "$output_file")")
+    else
+        follower_arguments+=("$1")
     fi
-}
-
-comparison_name="SimulationManager"
-
-all_commands=()
-for container in $(docker ps | awk '{print $NF}' | grep "${container_prefix}")
-do
-    short_name=${container:${#container_prefix}}
-
-    # add extra spaces to the prefix to have properly aligned output
-    extra_spaces_number=$(( ${#comparison_name} - ${#short_name} ))
-    extra_spaces=""
-    for (( index=1; index<=$extra_spaces_number; index++))
-    do
-        extra_spaces="$extra_spaces "
-    done
-    output_prefix="$short_name$extra_spaces | "
-
-    set_color_code "$short_name"
-    all_commands+=( "docker logs --follow $container | sed -u -e 's/^/$output_prefix/' | GREP_COLOR='$color_code' grep --color '.' &" )
+    shift
 done
 
-echo "{ ${all_commands[@]} printf ''; }" | bash
+run_platform_manager_utility platform_manager.log_follower $terminal_option \
+    --user "$(id -u):$(id -g)" \
+    --group-add "$(stat -c '%g' /var/run/docker.sock)" \
+    --volume /var/run/docker.sock:/var/run/docker.sock \
+    "${output_options[@]}" \
+    -- "${follower_arguments[@]}"
+
+if [ $? -eq $utility_missing_code ]
+then
+    echo "ERROR: The log follower utility is not available in the local image '$platform_manager_image'."
+    echo "Update the image with: source pull_docker_images.sh docker_images_core.txt"
+    return 1 2> /dev/null || exit 1
+fi
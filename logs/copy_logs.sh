@@ -4,24 +4,52 @@
 # This source code is licensed under the MIT license. See LICENSE in the repository root directory.
 # Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
 
-# Script that copies all the log files from the Docker volume to a local folder.
+# Script that copies the log files from the Docker volume to a local folder.
 # This can be useful with Docker installation where sharing local folders as Docker volumnes is limited.
+# Any given arguments are passed to the log collector, e.g. "--simulation <simulation_id>" or "--compress".
 
-container="simces_log_access"
 volume_name="simces_simulation_logs"
-container_log_folder="logs"
 local_log_folder="."
-log_file_type="log"
 
-# start a container that has access to the volume containing the log files
-docker run -d --name $container --volume $volume_name:/$container_log_folder:ro ubuntu:18.04 sleep 10m > /dev/null
+source "$(dirname "${BASH_SOURCE[0]}")/../platform_manager_utility.sh"
 
-for log_file in $(docker exec -t ${container} ls -l ${container_log_folder} | grep .${log_file_type} | grep --invert-match total | awk '{print $NF}')
-do
-    log_file_name=$(echo "${log_file}" | cut --delimiter="." --fields=1)
-    docker cp ${container}:${container_log_folder}/${log_file_name}.${log_file_type} ${local_log_folder}
-done
+# the log collector from the platform manager image downloads the whole log folder as a single archive,
+# or only the files of the given simulations, and writes only the files that have changed since the previous collection
+run_platform_manager_utility platform_manager.log_collector \
+    --user "$(id -u):$(id -g)" \
+    --group-add "$(stat -c '%g' /var/run/docker.sock)" \
+    --volume /var/run/docker.sock:/var/run/docker.sock \
+    --volume "$(realpath $local_log_folder)":/collected_logs \
+    -- /collected_logs --volume $volume_name "$@"
 
-# stop and remove the helper container
-docker stop $container > /dev/null
-docker rm $container > /dev/null
+if [ $? -eq $utility_missing_code ]
+then
+    # an older platform manager image, copy all the log files one by one using a helper container
+    echo "The log collector utility is not available in '$platform_manager_image', copying all the log files"
+    if [ $# -gt 0 ]
+    then
+        echo "The given options are ignored: $*"
+    fi
+    echo "Update the image to use the log collector: source pull_docker_images.sh docker_images_core.txt"
+
+    container="simces_log_access"
+    container_log_folder="logs"
+    log_file_type="log"
+
+    # remove earlier helper container
+    docker stop $container > /dev/null 2>&1
+    docker rm $container > /dev/null 2>&1
+
+    # start a container that has access to the volume containing the log files
+    docker run -d --name $container --volume $volume_name:/$container_log_folder:ro ubuntu:18.04 sleep 10m > /dev/null
+
+    for log_file in $(docker exec -t ${container} ls -l ${container_log_folder} | grep .${log_file_type} | grep --invert-match total | awk '{print $NF}')
+    do
+        log_file_name=$(echo "${log_file}" | cut --delimiter="." --fields=1)
+        docker cp ${container}:${container_log_folder}/${log_file_name}.${log_file_type} ${local_log_folder}
+    done
+
+    # stop and remove the helper container
+    docker stop $container > /dev/null
+    docker rm $container > /dev/null
+fi
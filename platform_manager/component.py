@@ -11,6 +11,7 @@ This module contains data classes for storing information about the components t
 from __future__ import annotations
 import dataclasses
 import pathlib
+import re
 from typing import Any, Dict, Optional, Tuple, Union
 
 import yaml
@@ -31,12 +32,35 @@ PARAMETER_COMPONENT_TYPE = "Type"
 PARAMETER_DESCRIPTION = "Description"
 PARAMETER_DOCKER_IMAGE = "DockerImage"
 PARAMETER_ATTRIBUTES = "Attributes"
+PARAMETER_RESOURCES = "Resources"
+PARAMETER_SUPERVISION = "Supervision"
 
 ATTRIBUTE_ENVIRONMENT = "Environment"
 ATTRIBUTE_OPTIONAL = "Optional"
 ATTRIBUTE_DEFAULT = "Default"
 ATTRIBUTE_INCLUDE_IN_START = "IncludeInStart"
 
+RESOURCE_CPUS = "Cpus"
+RESOURCE_MEMORY = "Memory"
+RESOURCE_CPU_SET = "CpuSet"
+RESOURCE_CPU_AFFINITY = "CpuAffinity"
+
+CPU_AFFINITY_NONE = "none"            # the container can use any CPU of the host
+CPU_AFFINITY_DEDICATED = "dedicated"  # the container is pinned to the least used CPUs of the host
+ALLOWED_CPU_AFFINITIES = [CPU_AFFINITY_NONE, CPU_AFFINITY_DEDICATED]
+
+MEMORY_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+MEMORY_PATTERN = re.compile(r"^\s*([0-9]+(?:\.[0-9]+)?)\s*([bkmg]?)b?\s*$", re.IGNORECASE)
+CPU_SET_PATTERN = re.compile(r"^[0-9]+(-[0-9]+)?(,[0-9]+(-[0-9]+)?)*$")
+
+SUPERVISION_RESTART = "Restart"
+SUPERVISION_MAX_RESTARTS = "MaxRestarts"
+
+RESTART_NEVER = "never"            # crashed containers are not restarted
+RESTART_ON_FAILURE = "on-failure"  # containers that exit with a non-zero exit code are restarted
+ALLOWED_RESTART_POLICIES = [RESTART_NEVER, RESTART_ON_FAILURE]
+DEFAULT_MAX_RESTARTS = 3
+
 
 @dataclasses.dataclass
 class ImageName:
@@ -67,6 +91,47 @@ class ComponentAttribute:
     include_in_start: bool = True
 
 
+@dataclasses.dataclass
+class ComponentResources:
+    """
+    Data class for holding the resource limits for the containers of a component type.
+    - cpus: the maximum number of CPUs the container can use, None for no limit
+    - memory: the maximum amount of memory in bytes the container can use, None for no limit
+    - cpu_set: the CPUs the container is allowed to use in the Docker cpuset format, e.g. "0-3" or "1,3"
+    - cpu_affinity: the CPU affinity policy, either "none" or "dedicated", ignored if cpu_set is given,
+                    None if the policy was not given in which case the policy "none" is used
+    """
+    cpus: Optional[float] = None
+    memory: Optional[int] = None
+    cpu_set: Optional[str] = None
+    cpu_affinity: Optional[str] = None
+
+    def with_overrides(self, overrides: ComponentResources) -> ComponentResources:
+        """Returns new resource limits in which the values given in the overrides replace the current values."""
+        return ComponentResources(
+            cpus=self.cpus if overrides.cpus is None else overrides.cpus,
+            memory=self.memory if overrides.memory is None else overrides.memory,
+            cpu_set=self.cpu_set if overrides.cpu_set is None else overrides.cpu_set,
+            cpu_affinity=self.cpu_affinity if overrides.cpu_affinity is None else overrides.cpu_affinity
+        )
+
+
+@dataclasses.dataclass
+class SupervisionPolicy:
+    """
+    Data class for holding the supervision policy for the containers of a component type.
+    - restart: the restart policy, either "never" or "on-failure"
+    - max_restarts: the maximum number of times a single container is restarted during a simulation
+    """
+    restart: str = RESTART_NEVER
+    max_restarts: int = DEFAULT_MAX_RESTARTS
+
+    @property
+    def restart_on_failure(self) -> bool:
+        """Returns True, if the containers should be restarted after an unexpected exit."""
+        return self.restart == RESTART_ON_FAILURE and self.max_restarts > 0
+
+
 @dataclasses.dataclass
 class ComponentParameters:
     """
@@ -84,6 +149,8 @@ class ComponentParameters:
     - include_general_parameters: whether to pass the general environmental variables for a dynamic component,
                                   this should be True for any component inherited from AbstractSimulationComponent,
                                   these include simulation id, component name and the logging level
+    - resources: the resource limits for the containers of the component type
+    - supervision: the supervision policy for the containers of the component type
     """
     component_type: str
     description: str = ""
@@ -92,6 +159,8 @@ class ComponentParameters:
     include_rabbitmq_parameters: bool = True
     include_mongodb_parameters: bool = False
     include_general_parameters: bool = True
+    resources: ComponentResources = dataclasses.field(default_factory=ComponentResources)
+    supervision: SupervisionPolicy = dataclasses.field(default_factory=SupervisionPolicy)
 
 
 @dataclasses.dataclass
@@ -112,6 +181,81 @@ class ComponentCollectionParameters:
         return True
 
 
+def parse_memory_value(memory_value: Any) -> Optional[int]:
+    """
+    Returns the given memory value in bytes. The value can be given as a number of bytes or
+    as a string with a unit, e.g. "512m" or "2G". Returns None, if the value cannot be parsed.
+    """
+    if isinstance(memory_value, bool):
+        return None
+    if isinstance(memory_value, (int, float)):
+        return int(memory_value) if memory_value > 0 else None
+    if not isinstance(memory_value, str):
+        return None
+
+    memory_match = MEMORY_PATTERN.match(memory_value)
+    if memory_match is None:
+        return None
+    return int(float(memory_match.group(1)) * MEMORY_UNITS[memory_match.group(2).lower()])
+
+
+def get_component_resources(resource_definition: Any) -> ComponentResources:
+    """Returns the resource limits corresponding to the given definition. Invalid values are ignored."""
+    if not isinstance(resource_definition, dict):
+        if resource_definition is not None:
+            LOGGER.warning("Ignoring non-dictionary resource definition: {}".format(resource_definition))
+        return ComponentResources()
+
+    cpus = resource_definition.get(RESOURCE_CPUS, None)
+    if cpus is not None and (isinstance(cpus, bool) or not isinstance(cpus, (int, float)) or cpus <= 0):
+        LOGGER.warning("Ignoring invalid CPU limit: {}".format(cpus))
+        cpus = None
+
+    memory = resource_definition.get(RESOURCE_MEMORY, None)
+    memory_bytes = parse_memory_value(memory)
+    if memory is not None and memory_bytes is None:
+        LOGGER.warning("Ignoring invalid memory limit: {}".format(memory))
+
+    cpu_set = resource_definition.get(RESOURCE_CPU_SET, None)
+    if cpu_set is not None:
+        cpu_set = str(cpu_set).replace(" ", "")
+        if CPU_SET_PATTERN.match(cpu_set) is None:
+            LOGGER.warning("Ignoring invalid CPU set: {}".format(cpu_set))
+            cpu_set = None
+
+    cpu_affinity = resource_definition.get(RESOURCE_CPU_AFFINITY, None)
+    if cpu_affinity is not None and cpu_affinity not in ALLOWED_CPU_AFFINITIES:
+        LOGGER.warning("Ignoring unsupported CPU affinity policy: {}".format(cpu_affinity))
+        cpu_affinity = None
+
+    return ComponentResources(
+        cpus=None if cpus is None else float(cpus),
+        memory=memory_bytes,
+        cpu_set=cpu_set,
+        cpu_affinity=cpu_affinity
+    )
+
+
+def get_supervision_policy(supervision_definition: Any) -> SupervisionPolicy:
+    """Returns the supervision policy corresponding to the given definition. Invalid values are ignored."""
+    if not isinstance(supervision_definition, dict):
+        if supervision_definition is not None:
+            LOGGER.warning("Ignoring non-dictionary supervision definition: {}".format(supervision_definition))
+        return SupervisionPolicy()
+
+    restart = supervision_definition.get(SUPERVISION_RESTART, RESTART_NEVER)
+    if restart not in ALLOWED_RESTART_POLICIES:
+        LOGGER.warning("Ignoring unsupported restart policy: {}".format(restart))
+        restart = RESTART_NEVER
+
+    max_restarts = supervision_definition.get(SUPERVISION_MAX_RESTARTS, DEFAULT_MAX_RESTARTS)
+    if isinstance(max_restarts, bool) or not isinstance(max_restarts, int) or max_restarts < 0:
+        LOGGER.warning("Ignoring invalid maximum restart count: {}".format(max_restarts))
+        max_restarts = DEFAULT_MAX_RESTARTS
+
+    return SupervisionPolicy(restart=restart, max_restarts=max_restarts)
+
+
 def get_component_type_parameters(component_type_definition: Dict[str, Any]) -> Optional[ComponentParameters]:
     """get_component_type_parameters"""
     deployment_type = component_type_definition.get(PARAMETER_COMPONENT_TYPE, None)
@@ -142,7 +286,9 @@ def get_component_type_parameters(component_type_definition: Dict[str, Any]) ->
             if isinstance(attribute_definition, dict)
         },
         include_rabbitmq_parameters=deployment_type != EXTERNAL_COMPONENT_TYPE,
-        include_general_parameters=deployment_type != EXTERNAL_COMPONENT_TYPE
+        include_general_parameters=deployment_type != EXTERNAL_COMPONENT_TYPE,
+        resources=get_component_resources(component_type_definition.get(PARAMETER_RESOURCES, None)),
+        supervision=get_supervision_policy(component_type_definition.get(PARAMETER_SUPERVISION, None))
     )
 
 
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains an in-memory registry of the simulation containers that is kept up to date
+using the Docker event stream instead of listing the containers for every query.
+"""
+
+import asyncio
+import dataclasses
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Pattern, Set
+
+from aiodocker import Docker
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
+from aiohttp.client_exceptions import ClientError
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+EVENT_TYPE_CONTAINER = "container"
+EVENT_CREATE = "create"
+EVENT_START = "start"
+EVENT_DIE = "die"
+EVENT_DESTROY = "destroy"
+FOLLOWED_EVENTS = [EVENT_CREATE, EVENT_START, EVENT_DIE, EVENT_DESTROY]
+
+CONTAINER_STATE_CREATED = "created"
+CONTAINER_STATE_RUNNING = "running"
+CONTAINER_STATE_EXITED = "exited"
+
+# the prefix of the container labels set by the platform, only these labels are taken from the container events
+# since the event attributes mix the container labels with other attributes such as the container name and image
+PLATFORM_LABEL_PREFIX = "simces."
+
+# the events from this many seconds before the container list are replayed to avoid missing any changes
+EVENT_REPLAY_TIME = 1
+
+EventListener = Callable[[Dict[str, Any]], None]
+
+
+def get_event_container_name(event: Dict[str, Any]) -> Optional[str]:
+    """Returns the container name from the given Docker container event."""
+    return event.get("Actor", {}).get("Attributes", {}).get("name", None)
+
+
+@dataclasses.dataclass
+class RegisteredContainer:
+    """
+    Data class for holding the information about a simulation container.
+    - name: the container name
+    - container_id: the container id
+    - engine_index: the index of the Docker Engine hosting the container
+    - simulation_index: the simulation index from the container name prefix
+    - state: the container state, either "created", "running" or "exited"
+    - labels: the container labels
+    """
+    name: str
+    container_id: str
+    engine_index: int
+    simulation_index: int
+    state: str = CONTAINER_STATE_CREATED
+    labels: Dict[str, str] = dataclasses.field(default_factory=dict)
+
+
+class ContainerRegistry:
+    """
+    Class for keeping track of the simulation containers in several Docker Engines.
+    The registry lists the containers once when it is started and after that follows the Docker event stream.
+    The received container events are also forwarded to the registered event listeners.
+    """
+    def __init__(self, docker_clients: List[Docker], name_pattern: Pattern[str]):
+        """
+        Sets up the registry.
+        - docker_clients: the Docker clients for each Docker Engine
+        - name_pattern: the pattern for the simulation container names, the first group must match the simulation index
+        """
+        self.__docker_clients = docker_clients
+        self.__name_pattern = name_pattern
+
+        self.__containers = {}  # type: Dict[str, RegisteredContainer]
+        self.__simulations = {}  # type: Dict[int, Set[str]]
+        self.__listeners = []  # type: List[EventListener]
+
+        self.__event_tasks = []  # type: List[asyncio.Task]
+        self.__is_running = False
+        self.__start_lock = asyncio.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        """Returns True, if the registry is following the event streams from all the Docker Engines."""
+        return self.__is_running
+
+    @property
+    def simulation_indexes(self) -> Set[int]:
+        """The simulation indexes that are in use."""
+        return set(self.__simulations)
+
+    async def start(self) -> bool:
+        """
+        Lists the existing simulation containers and starts following the Docker event streams.
+        Returns True, if the registry is running.
+        """
+        async with self.__start_lock:
+            if self.__is_running:
+                return True
+
+            if self.__event_tasks:
+                # the previous event streams have ended and they are restarted
+                await self.stop()
+
+            # the event subscription is started before listing the containers so that no changes are missed
+            since = int(time.time()) - EVENT_REPLAY_TIME
+            subscribers = [
+                docker_client.events.subscribe(
+                    since=str(since),
+                    filters=json.dumps({"type": [EVENT_TYPE_CONTAINER], "event": FOLLOWED_EVENTS})
+                )
+                for docker_client in self.__docker_clients
+            ]
+            try:
+                engine_containers = await asyncio.gather(*(
+                    docker_client.containers.list(all=True)
+                    for docker_client in self.__docker_clients
+                ))
+            except (ClientError, DockerError) as error:
+                LOGGER.warning("Received {} when listing the containers: {}".format(type(error).__name__, error))
+                await self.__stop_event_streams()
+                return False
+
+            self.__containers.clear()
+            self.__simulations.clear()
+            for engine_index, containers in enumerate(engine_containers):
+                for container in containers:
+                    self.__register_listed_container(container, engine_index)
+
+            self.__event_tasks = [
+                asyncio.create_task(self.__follow_events(subscriber, engine_index))
+                for engine_index, subscriber in enumerate(subscribers)
+            ]
+            self.__is_running = True
+            LOGGER.debug("Container registry started with {} simulation containers".format(len(self.__containers)))
+            return True
+
+    async def stop(self):
+        """Stops following the Docker event streams."""
+        self.__is_running = False
+        for event_task in self.__event_tasks:
+            event_task.cancel()
+        self.__event_tasks = []
+        await self.__stop_event_streams()
+
+    def add_listener(self, listener: EventListener):
+        """Adds a listener that is called with every received container event."""
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener: EventListener):
+        """Removes the given event listener."""
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+    def register(self, container_name: str, container_id: str, engine_index: int,
+                 labels: Optional[Dict[str, str]] = None, state: str = CONTAINER_STATE_CREATED):
+        """Adds or updates a container in the registry. Containers not matching the name pattern are ignored."""
+        name_match = self.__name_pattern.match(container_name)
+        if name_match is None:
+            return
+
+        simulation_index = int(name_match.group(1))
+        registered_container = self.__containers.get(container_name, None)
+        if registered_container is None:
+            self.__containers[container_name] = RegisteredContainer(
+                name=container_name,
+                container_id=container_id,
+                engine_index=engine_index,
+                simulation_index=simulation_index,
+                state=state,
+                labels=labels if labels is not None else {}
+            )
+            self.__simulations.setdefault(simulation_index, set()).add(container_name)
+        else:
+            registered_container.container_id = container_id
+            registered_container.engine_index = engine_index
+            registered_container.state = state
+            if labels is not None:
+                registered_container.labels = labels
+
+    def unregister(self, container_name: str, container_id: Optional[str] = None):
+        """
+        Removes the given container from the registry. If the container id is given, the container is removed
+        only if the id matches, i.e. a recreated container with the same name is not removed by an old event.
+        """
+        registered_container = self.__containers.get(container_name, None)
+        if registered_container is None:
+            return
+        if container_id is not None and registered_container.container_id not in ("", container_id):
+            return
+        self.__containers.pop(container_name, None)
+
+        simulation_containers = self.__simulations.get(registered_container.simulation_index, set())
+        simulation_containers.discard(container_name)
+        if not simulation_containers:
+            self.__simulations.pop(registered_container.simulation_index, None)
+
+    def get_container(self, container_name: str) -> Optional[RegisteredContainer]:
+        """Returns the registered container with the given name or None, if there is no such container."""
+        return self.__containers.get(container_name, None)
+
+    def get_simulation_containers(self, simulation_index: int) -> List[RegisteredContainer]:
+        """Returns the registered containers for the given simulation index."""
+        return [
+            self.__containers[container_name]
+            for container_name in sorted(self.__simulations.get(simulation_index, set()))
+        ]
+
+    def get_next_simulation_index(self, index_limit: int) -> Optional[int]:
+        """Returns the smallest simulation index that is not in use or None, if all the indexes are in use."""
+        return next(
+            (simulation_index for simulation_index in range(index_limit) if simulation_index not in self.__simulations),
+            None
+        )
+
+    def get_simulation_label_counts(self, label_name: str) -> Dict[str, int]:
+        """Returns the number of simulations that have containers with each value of the given label."""
+        label_counts = {}  # type: Dict[str, int]
+        for container_names in self.__simulations.values():
+            label_values = {
+                self.__containers[container_name].labels[label_name]
+                for container_name in container_names
+                if label_name in self.__containers[container_name].labels
+            }
+            for label_value in label_values:
+                label_counts[label_value] = label_counts.get(label_value, 0) + 1
+        return label_counts
+
+    def get_engine_labels(self, engine_count: int) -> List[List[Dict[str, str]]]:
+        """Returns the labels of the registered containers that are not exited for each Docker Engine."""
+        engine_labels = [[] for _ in range(engine_count)]  # type: List[List[Dict[str, str]]]
+        for registered_container in self.__containers.values():
+            if (registered_container.state != CONTAINER_STATE_EXITED and
+                    registered_container.engine_index < engine_count):
+                engine_labels[registered_container.engine_index].append(registered_container.labels)
+        return engine_labels
+
+    def handle_event(self, event: Dict[str, Any], engine_index: int):
+        """Updates the registry according to the given container event and forwards the event to the listeners."""
+        container_name = get_event_container_name(event)
+        if container_name is not None:
+            action = event.get("Action", None)
+            if action == EVENT_DESTROY:
+                self.unregister(container_name, event.get("Actor", {}).get("ID", None))
+            elif action in (EVENT_CREATE, EVENT_START, EVENT_DIE):
+                container_id = event.get("Actor", {}).get("ID", "")
+                attributes = event.get("Actor", {}).get("Attributes", {})
+                registered_container = self.__containers.get(container_name, None)
+                # the labels captured when the container was listed or created are kept for the same container
+                if registered_container is not None and registered_container.container_id == container_id:
+                    labels = None  # type: Optional[Dict[str, str]]
+                else:
+                    labels = {
+                        label_name: label_value
+                        for label_name, label_value in attributes.items()
+                        if label_name.startswith(PLATFORM_LABEL_PREFIX)
+                    }
+                self.register(
+                    container_name=container_name,
+                    container_id=container_id,
+                    engine_index=engine_index,
+                    labels=labels,
+                    state={
+                        EVENT_CREATE: CONTAINER_STATE_CREATED,
+                        EVENT_START: CONTAINER_STATE_RUNNING,
+                        EVENT_DIE: CONTAINER_STATE_EXITED
+                    }[action]
+                )
+
+        for listener in list(self.__listeners):
+            listener(event)
+
+    def __register_listed_container(self, container: DockerContainer, engine_index: int):
+        """Adds a container from the container list response to the registry."""
+        container_info = container._container  # pylint: disable=protected-access
+        container_name = container_info.get("Names", [" "])[0][1:]
+        container_state = container_info.get("State", CONTAINER_STATE_CREATED)
+        self.register(
+            container_name=container_name,
+            container_id=container_info.get("Id", ""),
+            engine_index=engine_index,
+            labels=container_info.get("Labels", None) or {},
+            state=container_state if container_state in (CONTAINER_STATE_CREATED, CONTAINER_STATE_RUNNING)
+            else CONTAINER_STATE_EXITED
+        )
+
+    async def __follow_events(self, subscriber: Any, engine_index: int):
+        """Handles the events from the given event stream subscriber until the stream ends."""
+        while True:
+            event = await subscriber.get()
+            if event is None:
+                break
+            self.handle_event(event, engine_index)
+
+        if self.__is_running:
+            LOGGER.warning("The Docker event stream for engine {} ended unexpectedly.".format(engine_index))
+            self.__is_running = False
+
+    async def __stop_event_streams(self):
+        """Closes the event stream connections."""
+        for docker_client in self.__docker_clients:
+            try:
+                await docker_client.events.stop()
+            except (ClientError, DockerError) as error:
+                LOGGER.debug("Received {} when stopping the event stream: {}".format(type(error).__name__, error))
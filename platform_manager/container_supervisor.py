@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for restarting the simulation containers that have exited unexpectedly
+during a simulation according to the supervision policies given in the component manifests.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Set
+
+from tools.tools import FullLogger
+
+from platform_manager.container_registry import EVENT_DESTROY, EVENT_DIE, get_event_container_name
+from platform_manager.docker_runner import ContainerConfiguration, ContainerStarter
+
+LOGGER = FullLogger(__name__)
+
+
+def get_event_exit_code(event: Dict[str, Any]) -> int:
+    """Returns the exit code from the given Docker container die event."""
+    try:
+        return int(event.get("Actor", {}).get("Attributes", {}).get("exitCode", 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class ContainerSupervisor:
+    """
+    Class for restarting crashed simulation containers.
+    The supervisor follows the container events from the container registry. When a supervised container exits
+    with a non-zero exit code, and it has not been stopped by the container starter, the container is recreated
+    with the same name and configuration after the original container has been removed.
+    """
+    def __init__(self, container_starter: ContainerStarter,
+                 container_configurations: Dict[str, ContainerConfiguration]):
+        """
+        Sets up the supervisor.
+        - container_starter: the container starter that was used to create the containers
+        - container_configurations: the configurations for the created containers using the full container names
+                                    as keys, only the containers with a restart policy are supervised
+        """
+        self.__container_starter = container_starter
+        self.__supervised_containers = {
+            container_name: container_configuration
+            for container_name, container_configuration in container_configurations.items()
+            if container_configuration.supervision.restart_on_failure
+        }
+
+        self.__restart_counts = {}  # type: Dict[str, int]
+        self.__failed_containers = set()  # type: Set[str]
+        self.__is_running = False
+        self.__restart_tasks = set()  # type: Set[asyncio.Task]
+
+    @property
+    def supervised_containers(self) -> List[str]:
+        """The names of the supervised containers."""
+        return list(self.__supervised_containers)
+
+    @property
+    def restart_counts(self) -> Dict[str, int]:
+        """The number of restarts for each restarted container."""
+        return self.__restart_counts
+
+    async def start(self):
+        """Starts following the container events in all the Docker Engines."""
+        if not self.__supervised_containers or self.__is_running:
+            return
+
+        registry = self.__container_starter.registry
+        if not await registry.start():
+            LOGGER.warning("Cannot supervise the containers without the Docker event stream.")
+            return
+        registry.add_listener(self.handle_event)
+        self.__is_running = True
+        LOGGER.info("Supervising {} containers".format(len(self.__supervised_containers)))
+
+    async def stop(self):
+        """Stops following the container events and waits for the ongoing restarts to finish."""
+        self.__container_starter.registry.remove_listener(self.handle_event)
+        self.__is_running = False
+
+        if self.__restart_tasks:
+            await asyncio.gather(*self.__restart_tasks, return_exceptions=True)
+
+    def handle_event(self, event: Dict[str, Any]):
+        """Handles a Docker container event."""
+        container_name = get_event_container_name(event)
+        if container_name not in self.__supervised_containers:
+            return
+
+        action = event.get("Action", None)
+        if action == EVENT_DIE:
+            exit_code = get_event_exit_code(event)
+            if exit_code == 0 or self.__container_starter.is_stopping(container_name):
+                return
+
+            max_restarts = self.__supervised_containers[container_name].supervision.max_restarts
+            restart_count = self.__restart_counts.get(container_name, 0)
+            if restart_count >= max_restarts:
+                LOGGER.error("Container {} exited with code {} and it has already been restarted {} times".format(
+                    container_name, exit_code, restart_count))
+                return
+
+            LOGGER.warning("Container {} exited with code {}. It will be restarted.".format(
+                container_name, exit_code))
+            self.__failed_containers.add(container_name)
+
+        elif action == EVENT_DESTROY and container_name in self.__failed_containers:
+            # the containers are created with auto remove, so the name is free only after the destroy event
+            self.__failed_containers.discard(container_name)
+            self.__restart_counts[container_name] = self.__restart_counts.get(container_name, 0) + 1
+            restart_task = asyncio.create_task(self.__restart(container_name))
+            self.__restart_tasks.add(restart_task)
+            restart_task.add_done_callback(self.__restart_tasks.discard)
+
+    async def __restart(self, container_name: str):
+        """Restarts the given container."""
+        if await self.__container_starter.restart_container(container_name):
+            LOGGER.info("Restarted container {} (restart {}/{})".format(
+                container_name, self.__restart_counts[container_name],
+                self.__supervised_containers[container_name].supervision.max_restarts))
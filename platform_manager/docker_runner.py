@@ -6,24 +6,51 @@
 
 """This module contains the functionality for starting Docker containers."""
 
+from __future__ import annotations
 import asyncio
 import inspect
 import re
-from typing import cast, Dict, List, Optional, Union
+import sys
+from typing import Any, cast, Dict, List, Optional, Set, Tuple, Type, Union, TYPE_CHECKING
 
 from aiodocker import Docker
 from aiodocker.exceptions import DockerError
 from aiodocker.containers import DockerContainer
 from aiohttp.client_exceptions import ClientError
-from docker import from_env as docker_client_from_env, DockerClient
-from docker.errors import APIError
-from docker.models.containers import Container
-from docker.models.networks import Network
 
 from tools.tools import EnvironmentVariableValue, FullLogger, async_wrap
 
+from platform_manager.component import ComponentResources, SupervisionPolicy, CPU_AFFINITY_DEDICATED
+from platform_manager.container_registry import ContainerRegistry
+from platform_manager.launch_trace import LaunchTrace
+from platform_manager.scheduler import (
+    ContainerDemand, ContainerScheduler, EngineCapacity, PRIMARY_ENGINE_INDEX, parse_cpu_set)
+
+if TYPE_CHECKING:
+    # the 'docker' library is only needed as a fallback and it is imported when it is first used
+    from docker import DockerClient
+    from docker.models.containers import Container
+
 LOGGER = FullLogger(__name__)
 
+# the lane names used for the container related phases in the launch trace
+CONTAINER_LANE = "containers"
+CREATE_LANE_PREFIX = "create"
+
+# the container labels that hold the resource demand used when placing the container
+LABEL_CPUS = "simces.resources.cpus"
+LABEL_MEMORY = "simces.resources.memory"
+LABEL_CPU_SET = "simces.resources.cpuset"
+# the container label that holds the address of the RabbitMQ broker used by the simulation
+LABEL_BROKER = "simces.broker"
+# the container label that holds the component type of the simulation component
+LABEL_COMPONENT_TYPE = "simces.component.type"
+
+NANO_CPUS_IN_CPU = 1000000000
+
+HTTP_NOT_FOUND = 404
+HTTP_CONFLICT = 409
+
 
 def get_container_name(container: DockerContainer) -> str:
     """Returns the name of the given Docker container."""
@@ -31,12 +58,39 @@ def get_container_name(container: DockerContainer) -> str:
     return container._container.get("Names", [" "])[0][1:]  # pylint: disable=protected-access
 
 
+def get_backup_library_errors() -> Tuple[Type[Exception], ...]:
+    """Returns the exception types used by the 'docker' library, if the library has already been imported."""
+    if "docker.errors" not in sys.modules:
+        return ()
+    from docker.errors import APIError  # pylint: disable=import-outside-toplevel
+    return (APIError,)
+
+
+def get_container_labels(container: DockerContainer) -> Dict[str, str]:
+    """Returns the labels of the given Docker container from the container list response."""
+    return container._container.get("Labels", None) or {}  # pylint: disable=protected-access
+
+
+def get_resource_limits(resources: ComponentResources, cpu_set: Optional[str] = None) -> Dict[str, Any]:
+    """Returns the resource limit parameters for the HostConfig part of a Docker container configuration."""
+    resource_limits = {}  # type: Dict[str, Any]
+    if resources.cpus is not None:
+        resource_limits["NanoCpus"] = int(resources.cpus * NANO_CPUS_IN_CPU)
+    if resources.memory is not None:
+        resource_limits["Memory"] = resources.memory
+    if cpu_set is not None:
+        resource_limits["CpusetCpus"] = cpu_set
+    return resource_limits
+
+
 class ContainerConfiguration:
     """Class for holding the parameters needed when starting a Docker container instance.
     Only parameters needed for starting containers for the simulation platform are included.
     """
     def __init__(self, container_name: str, docker_image: str, environment: Dict[str, EnvironmentVariableValue],
-                 networks: Union[str, List[str]], volumes: Union[str, List[str]]):
+                 networks: Union[str, List[str]], volumes: Union[str, List[str]],
+                 resources: Optional[ComponentResources] = None, core_component: bool = False,
+                 supervision: Optional[SupervisionPolicy] = None, labels: Optional[Dict[str, str]] = None):
         """
         Sets up the parameters for the Docker container configuration to the format required by aiodocker.
         - container_name:    the container name
@@ -44,9 +98,17 @@ class ContainerConfiguration:
         - environment:       the environment variables and their values
         - networks:          the names of the Docker networks for the container
         - volumes:           the volume names and the target paths, format: <volume_name>:<target_path>[rw|ro]
+        - resources:         the resource limits for the container, also used as hints for the container placement
+        - core_component:    whether the container is for a core component, i.e. simulation manager or log writer
+        - supervision:       the supervision policy for the container
+        - labels:            additional labels for the container
         """
         self.__name = container_name
         self.__image = docker_image
+        self.__resources = resources if resources is not None else ComponentResources()
+        self.__core_component = core_component
+        self.__supervision = supervision if supervision is not None else SupervisionPolicy()
+        self.__labels = labels if labels is not None else {}
         self.__environment = [
             "=".join([
                 variable_name, str(variable_value)
@@ -89,36 +151,177 @@ class ContainerConfiguration:
         """The Docker volumes for the Docker container."""
         return self.__volumes
 
+    @property
+    def resources(self) -> ComponentResources:
+        """The resource limits for the Docker container."""
+        return self.__resources
+
+    @property
+    def labels(self) -> Dict[str, str]:
+        """The additional labels for the Docker container."""
+        return self.__labels
+
+    @property
+    def core_component(self) -> bool:
+        """Whether the Docker container is for a core component."""
+        return self.__core_component
+
+    @property
+    def supervision(self) -> SupervisionPolicy:
+        """The supervision policy for the Docker container."""
+        return self.__supervision
+
+    @property
+    def demand(self) -> ContainerDemand:
+        """The resource demand for the Docker container used when placing the container to a Docker Engine."""
+        return ContainerDemand(
+            cpus=self.__resources.cpus,
+            memory=self.__resources.memory,
+            core_component=self.__core_component
+        )
+
 
 class ContainerStarter:
     """Class for starting the Docker components for a simulation."""
     PREFIX_DIGITS = 2
     PREFIX_START = "Sim"
-
-    def __init__(self):
-        """Sets up the Docker client."""
+    # the maximum number of concurrent image checks or container creations
+    MAX_CONCURRENT_OPERATIONS = 10
+    # the health status of a container that has passed its health check
+    HEALTHY_STATUS = "healthy"
+    # the time in seconds the containers are given to stop before they are killed
+    STOP_TIMEOUT = 10
+
+    def __init__(self, docker_url: Optional[Union[str, List[str]]] = None,
+                 scheduler: Optional[ContainerScheduler] = None):
+        """
+        Sets up the Docker clients.
+        - docker_url: the address for the Docker Engine API, if None, the default Docker Engine is used.
+                      If a list of addresses is given, the containers are placed to several Docker Engines.
+                      The first engine in the list is the primary engine that is used for the core components.
+                      The Docker networks and volumes must be available in all the given Docker Engines.
+        - scheduler: the scheduler used to place the containers when using several Docker Engines
+        """
         self.__container_prefix = "{:s}{{index:0{:d}d}}_".format(
             self.__class__.PREFIX_START, self.__class__.PREFIX_DIGITS)     # Sim{index:02d}_
         self.__prefix_pattern = re.compile("{:s}([0-9]{{{:d}}})_".format(
             self.__class__.PREFIX_START, self.__class__.PREFIX_DIGITS))    # Sim([0-9]{2})_
 
-        # the docker client using aiodocker library
-        self.__docker_client = Docker()
-        # the docker client using docker library, used only if necessary
-        self.__docker_client_synchronous = None  # type: Optional[DockerClient]
+        if docker_url is None or isinstance(docker_url, str):
+            self.__docker_urls = [docker_url]  # type: List[Optional[str]]
+        else:
+            self.__docker_urls = list(docker_url)
+        if not self.__docker_urls:
+            self.__docker_urls = [None]
+
+        # the docker clients using aiodocker library, one for each Docker Engine
+        self.__docker_clients = [Docker(url=url) for url in self.__docker_urls]
+        self.__docker_client = self.__docker_clients[PRIMARY_ENGINE_INDEX]
+        # the docker clients using docker library, used only if necessary
+        self.__docker_clients_synchronous = {}  # type: Dict[int, DockerClient]
+
+        self.__scheduler = scheduler if scheduler is not None else ContainerScheduler()
+        # the Docker Engine index for each created container
+        self.__container_engines = {}  # type: Dict[str, int]
+        # the configuration and the CPU set for each created container, used when recreating a container
+        self.__container_configurations = {}  # type: Dict[str, Tuple[ContainerConfiguration, Optional[str]]]
+        # the containers that are being stopped on purpose
+        self.__stopping_containers = set()  # type: Set[str]
+
+        # the event based registry for the simulation containers in all the Docker Engines
+        self.__registry = ContainerRegistry(self.__docker_clients, self.__prefix_pattern)
 
         self.__lock = asyncio.Lock()
+        self.__semaphore = asyncio.Semaphore(self.__class__.MAX_CONCURRENT_OPERATIONS)
+
+    @property
+    def engine_count(self) -> int:
+        """The number of Docker Engines used for the simulation containers."""
+        return len(self.__docker_clients)
+
+    @property
+    def registry(self) -> ContainerRegistry:
+        """The registry for the simulation containers."""
+        return self.__registry
 
     async def close(self):
-        """Closes the Docker client connection."""
-        await self.__docker_client.close()
+        """Closes the Docker client connections."""
+        await self.__registry.stop()
+        for docker_client in self.__docker_clients:
+            await docker_client.close()
+
+    @property
+    def docker_clients(self) -> List[Docker]:
+        """The Docker clients for each Docker Engine."""
+        return self.__docker_clients
+
+    def is_stopping(self, container_name: str) -> bool:
+        """Returns True, if the given container is being stopped by the container starter."""
+        return container_name in self.__stopping_containers
+
+    def get_docker_client(self, container_name: Optional[str] = None) -> Docker:
+        """Returns the Docker client for the engine hosting the given container or the primary Docker client."""
+        if container_name is None:
+            return self.__docker_client
+        if container_name in self.__container_engines:
+            return self.__docker_clients[self.__container_engines[container_name]]
+
+        registered_container = self.__registry.get_container(container_name)
+        if registered_container is not None:
+            return self.__docker_clients[registered_container.engine_index]
+        return self.__docker_client
+
+    async def list_containers(self) -> List[List[DockerContainer]]:
+        """Returns the running containers for each Docker Engine."""
+        return cast(List[List[DockerContainer]], await asyncio.gather(*(
+            docker_client.containers.list()
+            for docker_client in self.__docker_clients
+        )))
+
+    async def get_engine_capacities(self, engine_labels: List[List[Dict[str, str]]]) -> List[EngineCapacity]:
+        """
+        Returns the resource capacities for each Docker Engine. The resource usage is calculated
+        from the resource demand labels of the existing containers in each engine.
+        """
+        engine_infos = await asyncio.gather(*(
+            docker_client.system.info()
+            for docker_client in self.__docker_clients
+        ))
+
+        engine_capacities = []
+        for engine_info, container_labels in zip(engine_infos, engine_labels):
+            engine_capacity = EngineCapacity(
+                cpus=float(engine_info.get("NCPU", 0)),
+                memory=int(engine_info.get("MemTotal", 0)),
+                core_usage=[0] * int(engine_info.get("NCPU", 0))
+            )
+            for labels in container_labels:
+                engine_capacity.reserve(
+                    float(labels.get(LABEL_CPUS, 0.0)),
+                    int(labels.get(LABEL_MEMORY, 0))
+                )
+                if labels.get(LABEL_CPU_SET, ""):
+                    engine_capacity.pin(parse_cpu_set(labels[LABEL_CPU_SET]))
+            engine_capacities.append(engine_capacity)
+
+        return engine_capacities
 
-    async def get_next_simulation_index(self) -> Union[int, None]:
+    async def get_next_simulation_index(self, engine_containers: Optional[List[List[DockerContainer]]] = None) \
+            -> Union[int, None]:
         """
         Returns the next available index for the container name prefix for a new simulation.
+        The index is checked from the given running containers, or from the container registry if they are not given.
         If all possible indexes are already in use, returns None.
         """
-        running_containers = cast(List[DockerContainer], await self.__docker_client.containers.list())
+        if engine_containers is None:
+            if await self.__registry.start():
+                return self.__registry.get_next_simulation_index(10 ** self.__class__.PREFIX_DIGITS)
+            engine_containers = await self.list_containers()
+        running_containers = [
+            container
+            for containers in engine_containers
+            for container in containers
+        ]
         simulation_indexes = {
             int(get_container_name(container)[len(self.__class__.PREFIX_START):][:self.__class__.PREFIX_DIGITS])
             for container in running_containers
@@ -136,10 +339,12 @@ class ContainerStarter:
         # no previous simulation containers found
         return 0
 
-    async def create_container(self, container_name: str, container_configuration: ContainerConfiguration) \
+    async def create_container(self, container_name: str, container_configuration: ContainerConfiguration,
+                               engine_index: int = PRIMARY_ENGINE_INDEX, cpu_set: Optional[str] = None) \
             -> Optional[Union[DockerContainer, Container]]:
         """
-        Creates and returns a Docker container according to the given configuration.
+        Creates and returns a Docker container according to the given configuration to the given Docker Engine.
+        The given CPU set overrides the CPU set in the container configuration.
         Uses the 'aiodocker' library by default and if that throws an exception, tries using the 'docker' library.
         """
         # The API specification for Docker Engine: https://docs.docker.com/engine/api/v1.40/
@@ -150,15 +355,21 @@ class ContainerStarter:
         else:
             first_network = {}
 
+        if cpu_set is None:
+            cpu_set = container_configuration.resources.cpu_set
+
+        docker_client = self.__docker_clients[engine_index]
         try:
-            container = await self.__docker_client.containers.create(
+            container = await docker_client.containers.create(
                 name=container_name,
                 config={
                     "Image": container_configuration.image,
                     "Env": container_configuration.environment,
+                    "Labels": self.get_labels(container_configuration, cpu_set),
                     "HostConfig": {
                         "Binds": container_configuration.volumes,
-                        "AutoRemove": True
+                        "AutoRemove": True,
+                        **get_resource_limits(container_configuration.resources, cpu_set)
                     },
                     "NetworkingConfig": {
                         "EndpointsConfig": first_network
@@ -173,7 +384,7 @@ class ContainerStarter:
             # When creating a container, it can only be connected to one network.
             # The other networks have to be connected separately.
             for other_network_name in container_configuration.networks[1:]:
-                other_network = await self.__docker_client.networks.get(net_specs=other_network_name)
+                other_network = await docker_client.networks.get(net_specs=other_network_name)
                 await other_network.connect(
                     config={
                         "Container": container_name,
@@ -181,115 +392,466 @@ class ContainerStarter:
                     }
                 )
 
+            self.__container_engines[container_name] = engine_index
+            self.__container_configurations[container_name] = (container_configuration, cpu_set)
+            # the container name can belong to an earlier simulation that used the same simulation index
+            self.__stopping_containers.discard(container_name)
+            self.__registry.register(
+                container_name, container.id, engine_index, self.get_labels(container_configuration, cpu_set))
             return container
 
         except ClientError as client_error:
             LOGGER.warning("Received {}: {}".format(type(client_error).__name__, client_error))
             LOGGER.info("Trying the 'docker' library instead of 'aiodocker'")
-            return await self._create_container_backup(container_name, container_configuration)
+            return await self._create_container_backup(
+                container_name, container_configuration, engine_index, cpu_set)
 
         except DockerError as docker_error:
             LOGGER.warning("Received {}: {}".format(type(docker_error).__name__, docker_error))
             return None
 
-    async def _create_container_backup(self, container_name: str, container_configuration: ContainerConfiguration) \
+    async def _create_container_backup(self, container_name: str, container_configuration: ContainerConfiguration,
+                                       engine_index: int = PRIMARY_ENGINE_INDEX, cpu_set: Optional[str] = None) \
             -> Optional[Container]:
         """
-        Creates and returns a Docker container according to the given configuration.
+        Creates and returns a Docker container according to the given configuration to the given Docker Engine.
         Uses the 'docker' library.
         """
+        # pylint: disable=import-outside-toplevel
+        from docker import from_env as docker_client_from_env, DockerClient
+        from docker.errors import APIError
+        from docker.models.containers import Container
+        from docker.models.networks import Network
+
+        resources = container_configuration.resources
+        if cpu_set is None:
+            cpu_set = resources.cpu_set
+
         if not container_configuration.networks:
             first_network = None
         else:
             first_network = container_configuration.networks[0]
 
         try:
-            if self.__docker_client_synchronous is None:
-                self.__docker_client_synchronous = await async_wrap(docker_client_from_env)()
-            container = await async_wrap(self.__docker_client_synchronous.containers.create)(
+            if engine_index not in self.__docker_clients_synchronous:
+                docker_url = self.__docker_urls[engine_index]
+                if docker_url is None:
+                    self.__docker_clients_synchronous[engine_index] = await async_wrap(docker_client_from_env)()
+                else:
+                    self.__docker_clients_synchronous[engine_index] = await async_wrap(DockerClient)(
+                        base_url=docker_url)
+            docker_client_synchronous = self.__docker_clients_synchronous[engine_index]
+
+            container = await async_wrap(docker_client_synchronous.containers.create)(
                 name=container_name,
                 image=container_configuration.image,
                 environment=container_configuration.environment,
+                labels=self.get_labels(container_configuration, cpu_set),
                 volumes=container_configuration.volumes,
                 network=first_network,
-                auto_remove=True
+                auto_remove=True,
+                nano_cpus=None if resources.cpus is None else int(resources.cpus * NANO_CPUS_IN_CPU),
+                mem_limit=resources.memory,
+                cpuset_cpus=cpu_set
             )
             if not isinstance(container, Container):
                 LOGGER.warning("Failed to create container: {:s}".format(
                     container_configuration.container_name))
                 return None
 
-            other_networks = await async_wrap(self.__docker_client_synchronous.networks.list)(
+            other_networks = await async_wrap(docker_client_synchronous.networks.list)(
                 names=container_configuration.networks[1:]
             )
             for other_network in other_networks:
                 if isinstance(other_network, Network):
                     await async_wrap(other_network.connect)(container)
 
+            self.__container_engines[container_name] = engine_index
+            self.__container_configurations[container_name] = (container_configuration, cpu_set)
+            # the container name can belong to an earlier simulation that used the same simulation index
+            self.__stopping_containers.discard(container_name)
+            self.__registry.register(
+                container_name, container.id, engine_index, self.get_labels(container_configuration, cpu_set))
             return container
 
         except APIError as docker_error:
             LOGGER.warning("Received {}: {}".format(type(docker_error).__name__, docker_error))
             return None
 
-    async def start_simulation(self, simulation_configurations: List[ContainerConfiguration]) -> Union[List[str], None]:
+    def get_labels(self, container_configuration: ContainerConfiguration,
+                   cpu_set: Optional[str] = None) -> Dict[str, str]:
         """
-        Starts a Docker container with the given configuration parameters.
-        Returns the names of the container objects representing the started containers.
-        Returns None, if there was a problem starting any of the containers.
+        Returns the labels for the container.
+        The labels contain the additional labels from the container configuration and
+        the resource demand and the CPU set used in the container placement.
+        """
+        cpus, memory = self.__scheduler.get_demand(container_configuration.demand)
+        labels = {
+            **container_configuration.labels,
+            LABEL_CPUS: str(cpus),
+            LABEL_MEMORY: str(memory)
+        }
+        if cpu_set is not None:
+            labels[LABEL_CPU_SET] = cpu_set
+        return labels
+
+    async def place_containers(self, simulation_configurations: List[ContainerConfiguration],
+                               engine_labels: List[List[Dict[str, str]]]) \
+            -> Tuple[List[int], List[Optional[str]]]:
+        """
+        Returns the Docker Engine index and the CPU set for each of the given container configurations.
+        The given labels of the existing containers in each engine are used to calculate the current resource usage.
+        """
+        needs_pinning = any(
+            container_configuration.resources.cpu_set is None and
+            container_configuration.resources.cpu_affinity == CPU_AFFINITY_DEDICATED
+            for container_configuration in simulation_configurations
+        )
+        if len(self.__docker_clients) == 1 and not needs_pinning:
+            return (
+                [PRIMARY_ENGINE_INDEX] * len(simulation_configurations),
+                [container_configuration.resources.cpu_set for container_configuration in simulation_configurations]
+            )
+
+        engine_capacities = await self.get_engine_capacities(engine_labels)
+        if len(self.__docker_clients) == 1:
+            engine_indexes = [PRIMARY_ENGINE_INDEX] * len(simulation_configurations)
+        else:
+            engine_indexes = self.__scheduler.place(
+                [container_configuration.demand for container_configuration in simulation_configurations],
+                engine_capacities
+            )
+            for engine_index, engine_capacity in enumerate(engine_capacities):
+                LOGGER.info("Docker Engine {}: {} containers, reserved {:.1f}/{:.1f} CPUs, {:.0f}/{:.0f} MB".format(
+                    engine_index, engine_indexes.count(engine_index), engine_capacity.used_cpus,
+                    engine_capacity.cpus, engine_capacity.used_memory / 1024 ** 2, engine_capacity.memory / 1024 ** 2))
+
+        cpu_sets = self.__scheduler.assign_cpu_sets(
+            [container_configuration.resources for container_configuration in simulation_configurations],
+            engine_indexes,
+            engine_capacities
+        )
+        return engine_indexes, cpu_sets
+
+    async def check_images(self, docker_images: List[str], engine_indexes: Optional[List[int]] = None) -> bool:
         """
+        Checks that all the given Docker images are available for the Docker Engines.
+        The engine indexes list gives the Docker Engine for each image, by default the primary engine is used.
+        The checks are done concurrently. Returns True, if all the images were found.
+        """
+        if engine_indexes is None:
+            engine_indexes = [PRIMARY_ENGINE_INDEX] * len(docker_images)
+
+        async def check_image(docker_image: str, engine_index: int) -> bool:
+            async with self.__semaphore:
+                try:
+                    await self.__docker_clients[engine_index].images.inspect(docker_image)
+                    return True
+                except DockerError as docker_error:
+                    LOGGER.error("Docker image '{}' not available in engine {}: {}".format(
+                        docker_image, engine_index, docker_error))
+                    return False
+                except ClientError as client_error:
+                    # let the container creation to decide whether the image is available
+                    LOGGER.warning("Received {} when checking image '{}': {}".format(
+                        type(client_error).__name__, docker_image, client_error))
+                    return True
+
+        image_checks = await asyncio.gather(*(
+            check_image(docker_image, engine_index)
+            for docker_image, engine_index in sorted(set(zip(docker_images, engine_indexes)))
+        ))
+        return all(image_checks)
+
+    async def remove_containers(self, simulation_containers: List[Tuple[str, Union[DockerContainer, Container]]]):
+        """Removes the given created containers. The containers are given as (container name, container) pairs."""
+        for container_name, created_container in simulation_containers:
+            LOGGER.warning("Removing container: {}".format(container_name))
+            try:
+                if isinstance(created_container, DockerContainer):
+                    # remove container created with aiodocker library
+                    await created_container.delete(force=True)
+                else:
+                    # remove container created with docker library
+                    await self._remove_container_backup(container_name, created_container)
+            except (ClientError, DockerError, *get_backup_library_errors()) as error:
+                LOGGER.warning("Received {} when removing container {}: {}".format(
+                    type(error).__name__, container_name, error))
+            self.__container_engines.pop(container_name, None)
+            self.__container_configurations.pop(container_name, None)
+
+    async def _remove_container_backup(self, container_name: str, created_container: Any):
+        """Removes the given container that has been created using the 'docker' library."""
+        from docker.models.containers import Container  # pylint: disable=import-outside-toplevel
+
+        if not isinstance(created_container, Container):
+            LOGGER.error("An unknown container type, {}, for container: {}".format(
+                type(created_container).__name__, container_name))
+            return
+        await async_wrap(created_container.remove)(force=True)
+
+    async def create_simulation_containers(self, simulation_configurations: List[ContainerConfiguration],
+                                           trace: Optional[LaunchTrace] = None) \
+            -> Optional[List[Tuple[str, Union[DockerContainer, Container]]]]:
+        """
+        Creates, but does not start, the Docker containers with the given configuration parameters.
+        The image checks and the container creations are done concurrently.
+        Returns a list of (container name, container) pairs in the same order as the given configurations.
+        Returns None, if there was a problem creating any of the containers.
+        The timing of the different phases are recorded to the given launch trace.
+        """
+        if trace is None:
+            trace = LaunchTrace()
+
         async with self.__lock:
-            simulation_index = await self.get_next_simulation_index()
+            with trace.phase("index allocation", lane=CONTAINER_LANE):
+                if await self.__registry.start():
+                    simulation_index = self.__registry.get_next_simulation_index(10 ** self.__class__.PREFIX_DIGITS)
+                    engine_labels = self.__registry.get_engine_labels(self.engine_count)
+                else:
+                    # without the Docker event streams the containers have to be listed
+                    engine_containers = await self.list_containers()
+                    simulation_index = await self.get_next_simulation_index(engine_containers)
+                    engine_labels = [
+                        [get_container_labels(container) for container in containers]
+                        for containers in engine_containers
+                    ]
             if simulation_index is None:
                 LOGGER.warning("No free simulation indexes. Wait until a simulation run has finished.")
                 return None
 
-            simulation_containers = []  # type: List[Union[DockerContainer, Container]]
-            container_names = []        # type: List[str]
-            for container_configuration in simulation_configurations:
-                full_container_name = (
-                    self.__container_prefix.format(index=simulation_index) +
-                    container_configuration.container_name)
-                container_names.append(full_container_name)
-
-                new_container = await self.create_container(full_container_name, container_configuration)
-                if new_container is None:
-                    # clean the already created containers
-                    LOGGER.warning("Removing containers that have been created.")
-
-                    for container_name, created_container in zip(container_names, simulation_containers):
-                        LOGGER.warning("Removing container: {}".format(container_name))
-                        if isinstance(created_container, DockerContainer):
-                            # remove container created with aiodocker library
-                            await created_container.delete()
-                        elif isinstance(created_container, Container):
-                            # remove container created with docker library
-                            await async_wrap(created_container.remove)()
-                        else:
-                            LOGGER.error("An unknown container type, {}, for container: {}".format(
-                                type(created_container).__name__, container_name))
-
-                    # return None to indicate that there was a problem in the container creation
-                    return None
-
-                # add the newly created container to the container list
-                simulation_containers.append(new_container)
-
-            # start the created containers
-            for container_name, container in zip(container_names, simulation_containers):
-                LOGGER.info("Starting container: {:s}".format(container_name))
-                if inspect.iscoroutinefunction(container.start):
-                    start_function = container.start
-                else:
-                    start_function = async_wrap(container.start)
+            with trace.phase("placement", lane=CONTAINER_LANE):
+                engine_indexes, cpu_sets = await self.place_containers(simulation_configurations, engine_labels)
+
+            with trace.phase("image check", lane=CONTAINER_LANE):
+                images_available = await self.check_images(
+                    [container_configuration.image for container_configuration in simulation_configurations],
+                    engine_indexes
+                )
+            if not images_available:
+                LOGGER.warning("All the required Docker images were not available.")
+                return None
+
+            container_names = [
+                self.__container_prefix.format(index=simulation_index) + container_configuration.container_name
+                for container_configuration in simulation_configurations
+            ]
+
+            # each concurrent container creation is recorded to a separate lane in the launch trace
+            free_lanes = list(reversed(range(self.__class__.MAX_CONCURRENT_OPERATIONS)))
+
+            async def create_limited(container_name: str, container_configuration: ContainerConfiguration,
+                                     engine_index: int, cpu_set: Optional[str]) \
+                    -> Optional[Union[DockerContainer, Container]]:
+                async with self.__semaphore:
+                    lane_index = free_lanes.pop()
+                    try:
+                        with cast(LaunchTrace, trace).phase(
+                                "create {}".format(container_name),
+                                lane="{} {}".format(CREATE_LANE_PREFIX, lane_index + 1),
+                                engine=engine_index):
+                            return await self.create_container(
+                                container_name, container_configuration, engine_index, cpu_set)
+                    finally:
+                        free_lanes.append(lane_index)
+
+            with trace.phase("container creation", lane=CONTAINER_LANE):
+                new_containers = await asyncio.gather(
+                    *(
+                        create_limited(container_name, container_configuration, engine_index, cpu_set)
+                        for container_name, container_configuration, engine_index, cpu_set in zip(
+                            container_names, simulation_configurations, engine_indexes, cpu_sets)
+                    ),
+                    return_exceptions=True
+                )
+            # an unexpected exception from one creation must not leave the other created containers behind
+            for container_name, new_container in zip(container_names, new_containers):
+                if isinstance(new_container, BaseException):
+                    LOGGER.error("Received {} when creating container {}: {}".format(
+                        type(new_container).__name__, container_name, new_container))
+            simulation_containers = [
+                (container_name, new_container)
+                for container_name, new_container in zip(container_names, new_containers)
+                if new_container is not None and not isinstance(new_container, BaseException)
+            ]
+
+            if len(simulation_containers) < len(simulation_configurations):
+                # clean the already created containers
+                LOGGER.warning("Removing containers that have been created.")
+                await self.remove_containers(simulation_containers)
+                # return None to indicate that there was a problem in the container creation
+                return None
+
+            return simulation_containers
+
+    async def start_containers(self, simulation_containers: List[Tuple[str, Union[DockerContainer, Container]]],
+                               trace: Optional[LaunchTrace] = None):
+        """
+        Starts the given created containers. The containers are given as (container name, container) pairs.
+        The start time for each container is recorded to the given launch trace.
+        """
+        if trace is None:
+            trace = LaunchTrace()
+
+        for container_name, container in simulation_containers:
+            LOGGER.info("Starting container: {:s}".format(container_name))
+            if inspect.iscoroutinefunction(container.start):
+                start_function = container.start
+            else:
+                start_function = async_wrap(container.start)
+            with trace.phase("start {}".format(container_name), lane=CONTAINER_LANE):
                 await start_function()
 
-            return container_names
+    async def restart_container(self, container_name: str) -> bool:
+        """
+        Recreates and starts the given container that has exited and been removed. The new container uses
+        the same name, configuration, Docker Engine and CPU set as the original container.
+        Returns True, if the container was restarted successfully.
+        """
+        if container_name not in self.__container_configurations or self.is_stopping(container_name):
+            LOGGER.warning("Cannot restart unknown container: {}".format(container_name))
+            return False
+
+        container_configuration, cpu_set = self.__container_configurations[container_name]
+        engine_index = self.__container_engines.get(container_name, PRIMARY_ENGINE_INDEX)
+        async with self.__semaphore:
+            container = await self.create_container(container_name, container_configuration, engine_index, cpu_set)
+        if container is None:
+            LOGGER.error("Could not recreate container: {}".format(container_name))
+            return False
+
+        try:
+            await self.start_containers([(container_name, container)])
+        except (ClientError, DockerError, *get_backup_library_errors()) as error:
+            LOGGER.error("Received {} when restarting container {}: {}".format(
+                type(error).__name__, container_name, error))
+            return False
+        return True
+
+    async def is_container_ready(self, container_name: str) -> bool:
+        """
+        Returns True, if the given container is running and healthy.
+        Containers without a health check are considered ready when they are running.
+        """
+        try:
+            container_info = await self.get_docker_client(container_name).containers.container(container_name).show()
+        except (ClientError, DockerError) as error:
+            LOGGER.debug("Received {} when inspecting container {}: {}".format(
+                type(error).__name__, container_name, error))
+            return False
+
+        container_state = container_info.get("State", {})
+        if not container_state.get("Running", False):
+            return False
+        health_status = container_state.get("Health", {}).get("Status", None)
+        return health_status is None or health_status == self.__class__.HEALTHY_STATUS
+
+    async def wait_for_containers(self, container_names: List[str], timeout: float,
+                                  check_interval: float = 0.5) -> bool:
+        """
+        Waits until all the given containers are ready or until the timeout, in seconds, has been reached.
+        Returns True, if all the containers were ready before the timeout.
+        """
+        loop = asyncio.get_event_loop()
+        end_time = loop.time() + timeout
+        waiting_containers = list(container_names)
+        while True:
+            readiness_checks = await asyncio.gather(*(
+                self.is_container_ready(container_name)
+                for container_name in waiting_containers
+            ))
+            waiting_containers = [
+                container_name
+                for container_name, is_ready in zip(waiting_containers, readiness_checks)
+                if not is_ready
+            ]
+            if not waiting_containers:
+                return True
+
+            if loop.time() + check_interval > end_time:
+                LOGGER.warning("Containers not ready after {} seconds: {}".format(
+                    timeout, ", ".join(waiting_containers)))
+                return False
+            await asyncio.sleep(check_interval)
+
+    async def start_simulation(self, simulation_configurations: List[ContainerConfiguration]) -> Union[List[str], None]:
+        """
+        Starts a Docker container with the given configuration parameters.
+        Returns the names of the container objects representing the started containers.
+        Returns None, if there was a problem starting any of the containers.
+        """
+        simulation_containers = await self.create_simulation_containers(simulation_configurations)
+        if simulation_containers is None:
+            return None
+
+        await self.start_containers(simulation_containers)
+        return [container_name for container_name, _ in simulation_containers]
+
+    async def stop_container(self, container_name: str, stop_timeout: int) -> bool:
+        """
+        Stops and removes the given container. The container is killed if it has not stopped within
+        the given timeout in seconds. Returns True, if the container no longer exists.
+        """
+        container = self.get_docker_client(container_name).containers.container(container_name)
+        self.__stopping_containers.add(container_name)
+        try:
+            LOGGER.info("Stopping container: {:s}".format(container_name))
+            await container.stop(t=stop_timeout)
+            # the containers are created with auto remove and the removal can already be in progress
+            await container.delete(force=True)
+
+        except DockerError as error:
+            if error.status not in (HTTP_NOT_FOUND, HTTP_CONFLICT):
+                LOGGER.warning("Received {} when stopping container {}: {}".format(
+                    type(error).__name__, container_name, error))
+                return False
+        except ClientError as error:
+            LOGGER.warning("Received {} when stopping container {}: {}".format(
+                type(error).__name__, container_name, error))
+            return False
+
+        self.__container_engines.pop(container_name, None)
+        self.__container_configurations.pop(container_name, None)
+        # the name stays marked as stopping until it is reused, since the die event can be handled after this
+        return True
+
+    async def stop_containers(self, container_names: List[str], stop_timeout: Optional[int] = None) -> bool:
+        """
+        Stops and removes all the Docker containers in the given container name list.
+        Once all the containers of a simulation have been removed, the simulation index can be used again.
+        Returns True, if all the containers were removed.
+        """
+        if stop_timeout is None:
+            stop_timeout = self.__class__.STOP_TIMEOUT
+
+        async def stop_limited(container_name: str) -> bool:
+            async with self.__semaphore:
+                return await self.stop_container(container_name, stop_timeout)
+
+        stop_checks = await asyncio.gather(*(
+            stop_limited(container_name)
+            for container_name in container_names
+        ))
+        return all(stop_checks)
+
+    async def stop_all_simulation_containers(self, stop_timeout: Optional[int] = None) -> bool:
+        """Stops and removes all the simulation containers in all the Docker Engines."""
+        if await self.__registry.start():
+            return await self.stop_containers(
+                [
+                    registered_container.name
+                    for simulation_index in sorted(self.__registry.simulation_indexes)
+                    for registered_container in self.__registry.get_simulation_containers(simulation_index)
+                ],
+                stop_timeout
+            )
 
-    async def stop_containers(self, container_names: List[str]):
-        """Stops all the Docker containers in the given container name list."""
-        # TODO: implement stop_containers
+        container_names = []
+        for engine_index, containers in enumerate(await self.list_containers()):
+            for container in containers:
+                container_name = get_container_name(container)
+                if self.__prefix_pattern.match(container_name) is not None:
+                    self.__container_engines[container_name] = engine_index
+                    container_names.append(container_name)
 
-    async def stop_all_simulation_containers(self):
-        """Stops all the Docker containers that have been started."""
-        # TODO: implement stop_all_simulation_containers
+        return await self.stop_containers(container_names, stop_timeout)
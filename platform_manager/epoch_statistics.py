@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for collecting the time each component takes to report ready in each epoch
+and for finding the straggler components that determine the epoch durations of a simulation.
+"""
+
+import dataclasses
+import json
+import math
+import pathlib
+import statistics
+from typing import Any, Dict, List, Optional
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+# the percentile reported in addition to the mean, median and the maximum latency
+LATENCY_PERCENTILE = 95
+# the number of the worst stragglers mentioned in the log summary
+LOGGED_STRAGGLER_COUNT = 3
+
+
+def get_percentile(values: List[float], percentile: float) -> float:
+    """Returns the given percentile (0-100) of the given values using the nearest rank method."""
+    sorted_values = sorted(values)
+    rank = max(1, math.ceil(percentile / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclasses.dataclass
+class EpochTiming:
+    """
+    Data class for holding the timing information for one epoch.
+    - start_time: the performance counter value in seconds when the epoch was started
+    - ready_times: the performance counter value for the first ready message from each component
+    """
+    start_time: Optional[float] = None
+    ready_times: Dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @property
+    def latencies(self) -> Dict[str, float]:
+        """The time in seconds from the start of the epoch to the ready message for each component."""
+        if self.start_time is None:
+            return {}
+        return {
+            component_name: ready_time - self.start_time
+            for component_name, ready_time in self.ready_times.items()
+        }
+
+    @property
+    def straggler(self) -> Optional[str]:
+        """The name of the component that was the last to report ready in the epoch."""
+        if not self.ready_times:
+            return None
+        return max(self.ready_times, key=lambda component_name: self.ready_times[component_name])
+
+
+class EpochLatencyCollector:
+    """
+    Class for collecting the ready message latencies for each component in each epoch.
+    The latency is measured from the receive time of the first Epoch message for an epoch to the receive time of
+    the first ready status message from the component for the same epoch.
+    """
+    def __init__(self, simulation_id: str):
+        """Sets up an empty collector for the given simulation."""
+        self.__simulation_id = simulation_id
+        self.__epochs = {}  # type: Dict[int, EpochTiming]
+
+    @property
+    def epoch_count(self) -> int:
+        """The number of epochs that have been started."""
+        return len([epoch for epoch in self.__epochs.values() if epoch.start_time is not None])
+
+    def record_epoch(self, epoch_number: int, receive_time: float):
+        """Records the start of the given epoch. Only the first start time for each epoch is used."""
+        epoch = self.__epochs.setdefault(epoch_number, EpochTiming())
+        if epoch.start_time is None:
+            epoch.start_time = receive_time
+
+    def record_ready(self, component_name: str, epoch_number: int, receive_time: float):
+        """Records a ready message from the given component. Only the first message for each epoch is used."""
+        self.__epochs.setdefault(epoch_number, EpochTiming()).ready_times.setdefault(component_name, receive_time)
+
+    def get_component_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the latency distribution and the straggler count for each component."""
+        component_latencies = {}  # type: Dict[str, List[float]]
+        straggler_counts = {}  # type: Dict[str, int]
+        for epoch in self.__epochs.values():
+            for component_name, latency in epoch.latencies.items():
+                component_latencies.setdefault(component_name, []).append(latency)
+            straggler = epoch.straggler
+            if straggler is not None and epoch.start_time is not None:
+                straggler_counts[straggler] = straggler_counts.get(straggler, 0) + 1
+
+        return {
+            component_name: {
+                "Epochs": len(latencies),
+                "Mean": statistics.mean(latencies),
+                "Median": statistics.median(latencies),
+                "P{}".format(LATENCY_PERCENTILE): get_percentile(latencies, LATENCY_PERCENTILE),
+                "Max": max(latencies),
+                "StragglerCount": straggler_counts.get(component_name, 0)
+            }
+            for component_name, latencies in sorted(component_latencies.items())
+        }
+
+    def get_epoch_statistics(self) -> Dict[int, Dict[str, Any]]:
+        """Returns the duration, the number of ready components and the straggler for each started epoch."""
+        epoch_statistics = {}
+        for epoch_number, epoch in sorted(self.__epochs.items()):
+            latencies = epoch.latencies
+            if not latencies:
+                continue
+            epoch_statistics[epoch_number] = {
+                "Duration": max(latencies.values()),
+                "ReadyComponents": len(latencies),
+                "Straggler": epoch.straggler
+            }
+        return epoch_statistics
+
+    def get_stragglers(self) -> List[str]:
+        """Returns the components that have been the last to report ready in some epoch, the worst first."""
+        component_statistics = self.get_component_statistics()
+        return sorted(
+            (
+                component_name
+                for component_name, component_values in component_statistics.items()
+                if component_values["StragglerCount"] > 0
+            ),
+            key=lambda component_name: (
+                -component_statistics[component_name]["StragglerCount"],
+                -component_statistics[component_name]["Mean"]
+            )
+        )
+
+    def get_report(self) -> Dict[str, Any]:
+        """Returns the full latency report for the simulation."""
+        return {
+            "SimulationId": self.__simulation_id,
+            "EpochCount": self.epoch_count,
+            "Stragglers": self.get_stragglers(),
+            "Components": self.get_component_statistics(),
+            "Epochs": self.get_epoch_statistics()
+        }
+
+    def get_summary(self) -> str:
+        """Returns a human readable summary about the worst stragglers."""
+        component_statistics = self.get_component_statistics()
+        return ", ".join(
+            "{} (last in {} epochs, mean {:.3f} s, max {:.3f} s)".format(
+                component_name,
+                component_statistics[component_name]["StragglerCount"],
+                component_statistics[component_name]["Mean"],
+                component_statistics[component_name]["Max"])
+            for component_name in self.get_stragglers()[:LOGGED_STRAGGLER_COUNT]
+        )
+
+    def store(self, filename: pathlib.Path) -> bool:
+        """Stores the latency report to the given file in JSON format."""
+        try:
+            with open(filename, mode="w", encoding="UTF-8") as report_file:
+                json.dump(self.get_report(), report_file, indent=4)
+            return True
+
+        except (OSError, TypeError, ValueError) as error:
+            LOGGER.error("Exception '{}' when trying to save the epoch statistics to file: {}".format(
+                type(error).__name__, error))
+            return False
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a utility for updating the local Docker images listed in image list files.
+The digest of each image in the registry is compared to the digests of the local image and only the images
+that are missing or have changed are pulled. Several images are handled concurrently.
+
+Usage: python -m platform_manager.image_sync <image_list_file> [<image_list_file> ...] [--max-concurrent <count>]
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import sys
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import aiohttp
+from aiodocker import Docker
+from aiodocker.exceptions import DockerError
+from aiodocker.jsonstream import json_stream_stream
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+# the outcomes for a single image
+IMAGE_UP_TO_DATE = "up-to-date"
+IMAGE_PULLED = "pulled"
+IMAGE_FAILED = "failed"
+
+DEFAULT_TAG = "latest"
+DIGEST_SEPARATOR = "@"
+COMMENT_START = "#"
+
+# the maximum number of images that are checked or pulled at the same time
+DEFAULT_MAX_CONCURRENT = 3
+# the time in seconds between the progress reports
+DEFAULT_PROGRESS_INTERVAL = 5.0
+# the pull progress status that contains the downloaded bytes for a layer
+STATUS_DOWNLOADING = "Downloading"
+
+
+@dataclasses.dataclass
+class ImageResult:
+    """
+    Data class for holding the outcome of updating a single image.
+    - image: the image name
+    - status: one of IMAGE_UP_TO_DATE, IMAGE_PULLED or IMAGE_FAILED
+    - remote_digest: the digest of the image in the registry or None, if it could not be resolved
+    - duration: the time in seconds spent for the image
+    """
+    image: str
+    status: str
+    remote_digest: Optional[str] = None
+    duration: float = 0.0
+
+
+@dataclasses.dataclass
+class SyncProgress:
+    """
+    Data class for holding the progress of an image update.
+    - total_images: the number of images to be updated
+    - finished_images: the number of images that have been handled
+    - pulling_images: the images that are currently being pulled
+    - downloaded_bytes: the downloaded bytes for each layer that is or has been downloaded
+    """
+    total_images: int
+    finished_images: int = 0
+    pulling_images: Set[str] = dataclasses.field(default_factory=set)
+    downloaded_bytes: Dict[str, int] = dataclasses.field(default_factory=dict)
+
+    def get_summary(self) -> str:
+        """Returns a one line description of the current progress."""
+        return "Handled {}/{} images, pulling {} images, downloaded {:.1f} MB".format(
+            self.finished_images, self.total_images, len(self.pulling_images),
+            sum(self.downloaded_bytes.values()) / 1024 ** 2)
+
+
+def read_image_list(filename: str) -> List[str]:
+    """Returns the image names from the given file. Empty lines and lines starting with a hash are ignored."""
+    with open(filename, mode="r", encoding="UTF-8") as image_file:
+        return [
+            line.strip()
+            for line in image_file
+            if line.strip() and not line.startswith(COMMENT_START)
+        ]
+
+
+def split_image_name(image: str) -> Tuple[str, str]:
+    """
+    Returns the repository and the tag for the given image name. For images given with a digest,
+    the digest is returned instead of the tag. The tag "latest" is used for images without a tag.
+    """
+    if DIGEST_SEPARATOR in image:
+        repository, _, digest = image.partition(DIGEST_SEPARATOR)
+        return repository, digest
+
+    tag_start = image.rfind(":")
+    if tag_start > image.rfind("/"):
+        return image[:tag_start], image[tag_start + 1:]
+    return image, DEFAULT_TAG
+
+
+def get_full_image_name(image: str) -> str:
+    """Returns the image name that includes either the tag or the digest."""
+    repository, reference = split_image_name(image)
+    if DIGEST_SEPARATOR in image:
+        return DIGEST_SEPARATOR.join([repository, reference])
+    return ":".join([repository, reference])
+
+
+async def get_remote_digest(docker_client: Docker, image: str) -> Optional[str]:
+    """
+    Returns the digest of the given image in the registry or None, if it could not be resolved.
+    The Docker Engine contacts the registry, so the registry credentials of the engine are used.
+    """
+    try:
+        distribution_info = await docker_client._query_json(  # pylint: disable=protected-access
+            "distribution/{}/json".format(image), method="GET")
+        return distribution_info.get("Descriptor", {}).get("digest", None)
+
+    except DockerError as error:
+        LOGGER.warning("Could not resolve the registry digest for '{}': {}".format(image, error))
+        return None
+
+
+async def get_local_digests(docker_client: Docker, image: str) -> Optional[List[str]]:
+    """Returns the registry digests for the local copy of the given image or None, if the image is not found."""
+    try:
+        image_info = await docker_client.images.inspect(image)
+    except DockerError:
+        return None
+    return [
+        repository_digest.partition(DIGEST_SEPARATOR)[2]
+        for repository_digest in image_info.get("RepoDigests", None) or []
+    ]
+
+
+async def pull_image(docker_client: Docker, image: str, progress: SyncProgress) -> bool:
+    """Pulls the given image and updates the download progress. Returns True, if the pull was successful."""
+    repository, reference = split_image_name(image)
+    if DIGEST_SEPARATOR in image:
+        params = {"fromImage": image}
+    else:
+        params = {"fromImage": repository, "tag": reference}
+
+    # Use a hack to disable the aiohttp default timeout since pulling a large image can take a long time.
+    async with docker_client._query(  # pylint: disable=protected-access
+            "images/create", method="POST", params=params,
+            timeout=aiohttp.ClientTimeout(total=None)) as response:
+        async for pull_status in json_stream_stream(response):
+            if not isinstance(pull_status, dict):
+                continue
+            if "error" in pull_status:
+                LOGGER.error("Could not pull '{}': {}".format(image, pull_status["error"]))
+                return False
+            if pull_status.get("status", None) == STATUS_DOWNLOADING and "id" in pull_status:
+                progress.downloaded_bytes[pull_status["id"]] = \
+                    (pull_status.get("progressDetail", None) or {}).get("current", 0)
+
+    return True
+
+
+async def sync_image(docker_client: Docker, image: str, semaphore: asyncio.Semaphore,
+                     progress: SyncProgress) -> ImageResult:
+    """
+    Pulls the given image if it is not available locally or if the registry has a different version of it.
+    If the registry digest cannot be resolved, the image is pulled like with the docker pull command.
+    """
+    async with semaphore:
+        start_time = time.perf_counter()
+        full_image_name = get_full_image_name(image)
+        image_result = ImageResult(image=full_image_name, status=IMAGE_FAILED)
+        try:
+            remote_digest, local_digests = await asyncio.gather(
+                get_remote_digest(docker_client, full_image_name),
+                get_local_digests(docker_client, full_image_name))
+            image_result.remote_digest = remote_digest
+
+            if remote_digest is not None and local_digests is not None and remote_digest in local_digests:
+                image_result.status = IMAGE_UP_TO_DATE
+            else:
+                LOGGER.info("Pulling '{}'".format(full_image_name))
+                progress.pulling_images.add(full_image_name)
+                try:
+                    if await pull_image(docker_client, full_image_name, progress):
+                        image_result.status = IMAGE_PULLED
+                finally:
+                    progress.pulling_images.discard(full_image_name)
+
+        except (DockerError, aiohttp.ClientError, asyncio.TimeoutError) as error:
+            LOGGER.error("Received {} when updating '{}': {}".format(type(error).__name__, full_image_name, error))
+
+        image_result.duration = time.perf_counter() - start_time
+        progress.finished_images += 1
+        LOGGER.info("{}: {} ({:.1f} seconds)".format(full_image_name, image_result.status, image_result.duration))
+        return image_result
+
+
+async def report_progress(progress: SyncProgress, interval: float):
+    """Logs the progress at the given interval until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        LOGGER.info(progress.get_summary())
+
+
+async def sync_images(docker_client: Docker, images: List[str], max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+                      progress_interval: float = DEFAULT_PROGRESS_INTERVAL) -> List[ImageResult]:
+    """Updates the given images using at most the given number of concurrent checks or pulls."""
+    # the same image can be listed in several files
+    unique_images = list(dict.fromkeys(get_full_image_name(image) for image in images))
+    progress = SyncProgress(total_images=len(unique_images))
+    semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    progress_task = asyncio.create_task(report_progress(progress, progress_interval)) \
+        if progress_interval > 0 else None
+    try:
+        return list(await asyncio.gather(*(
+            sync_image(docker_client, image, semaphore, progress)
+            for image in unique_images
+        )))
+    finally:
+        if progress_task is not None:
+            progress_task.cancel()
+
+
+async def start_sync(images: List[str], max_concurrent: int, progress_interval: float) -> bool:
+    """Updates the images using the local Docker Engine. Returns True, if all the images are up-to-date."""
+    start_time = time.perf_counter()
+    docker_client = Docker()
+    try:
+        image_results = await sync_images(docker_client, images, max_concurrent, progress_interval)
+    finally:
+        await docker_client.close()
+
+    status_counts = {
+        status: len([image_result for image_result in image_results if image_result.status == status])
+        for status in (IMAGE_UP_TO_DATE, IMAGE_PULLED, IMAGE_FAILED)
+    }
+    LOGGER.info("Handled {} images in {:.1f} seconds: {} up-to-date, {} pulled, {} failed".format(
+        len(image_results), time.perf_counter() - start_time, status_counts[IMAGE_UP_TO_DATE],
+        status_counts[IMAGE_PULLED], status_counts[IMAGE_FAILED]))
+    return status_counts[IMAGE_FAILED] == 0
+
+
+def main():
+    """Parses the command line arguments and updates the images."""
+    parser = argparse.ArgumentParser(description="Pulls the listed Docker images that have changed in the registry.")
+    parser.add_argument("image_list_files", type=str, nargs="+",
+                        help="the files containing the Docker image names, one per line")
+    parser.add_argument("--max-concurrent", type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help="the maximum number of images that are handled at the same time")
+    parser.add_argument("--progress-interval", type=float, default=DEFAULT_PROGRESS_INTERVAL,
+                        help="the time in seconds between the progress reports, 0 disables the reports")
+    arguments = parser.parse_args()
+
+    images = []  # type: List[str]
+    for image_list_file in arguments.image_list_files:
+        try:
+            images.extend(read_image_list(image_list_file))
+        except OSError as error:
+            LOGGER.error("Cannot read the image list '{}': {}".format(image_list_file, error))
+            return 1
+
+    if not asyncio.run(start_sync(images, arguments.max_concurrent, arguments.progress_interval)):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
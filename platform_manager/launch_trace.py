@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for recording the wall time of the different phases of a simulation launch.
+The recorded trace can be stored in the Chrome trace event format (https://ui.perfetto.dev or chrome://tracing).
+"""
+
+import contextlib
+import dataclasses
+import json
+import pathlib
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+MAIN_LANE = "main"
+MICROSECONDS_IN_SECOND = 1000000
+
+
+@dataclasses.dataclass
+class TracePhase:
+    """
+    Data class for holding the timing information for one phase of a simulation launch.
+    - name: the name of the phase
+    - lane: the name of the execution lane for the phase, concurrent phases should use different lanes
+    - start_time: the start time of the phase as a performance counter value in seconds
+    - end_time: the end time of the phase as a performance counter value in seconds
+    - arguments: additional information about the phase
+    """
+    name: str
+    lane: str
+    start_time: float
+    end_time: float
+    arguments: Dict[str, Any] = dataclasses.field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        """The duration of the phase in seconds."""
+        return self.end_time - self.start_time
+
+
+class LaunchTrace:
+    """Class for recording the wall time of the phases of a simulation launch."""
+    def __init__(self):
+        """Sets up an empty trace."""
+        self.__phases = []  # type: List[TracePhase]
+        self.__metadata = {}  # type: Dict[str, Any]
+        # the reference time pair that is used to convert the performance counter values to timestamps
+        self.__reference_counter = time.perf_counter()
+        self.__reference_timestamp = time.time()
+
+    @property
+    def phases(self) -> List[TracePhase]:
+        """The recorded phases in the order they were finished."""
+        return self.__phases
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Additional information about the launch, for example the simulation id."""
+        return self.__metadata
+
+    def add_phase(self, phase_name: str, start_time: float, end_time: float, lane: str = MAIN_LANE,
+                  **arguments: Any):
+        """Adds a phase with the given performance counter start and end times to the trace."""
+        self.__phases.append(
+            TracePhase(name=phase_name, lane=lane, start_time=start_time, end_time=end_time, arguments=arguments)
+        )
+
+    @contextlib.contextmanager
+    def phase(self, phase_name: str, lane: str = MAIN_LANE, **arguments: Any) -> Iterator[None]:
+        """Context manager that records the wall time of the enclosed code block as a phase."""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(phase_name, start_time, time.perf_counter(), lane, **arguments)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Returns the trace as a dictionary in the Chrome trace event format."""
+        if self.__phases:
+            origin = min(self.__reference_counter, min(phase.start_time for phase in self.__phases))
+        else:
+            origin = self.__reference_counter
+
+        lane_ids = {}  # type: Dict[str, int]
+        for phase in sorted(self.__phases, key=lambda phase: phase.start_time):
+            lane_ids.setdefault(phase.lane, len(lane_ids) + 1)
+
+        trace_events = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": 1,
+                "tid": lane_id,
+                "args": {"name": lane_name}
+            }
+            for lane_name, lane_id in lane_ids.items()
+        ]
+        trace_events += [
+            {
+                "name": phase.name,
+                "cat": "launch",
+                "ph": "X",
+                "ts": round((phase.start_time - origin) * MICROSECONDS_IN_SECOND),
+                "dur": round(phase.duration * MICROSECONDS_IN_SECOND),
+                "pid": 1,
+                "tid": lane_ids[phase.lane],
+                "args": phase.arguments
+            }
+            for phase in self.__phases
+        ]
+
+        return {
+            "traceEvents": trace_events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                **self.__metadata,
+                "StartTimestamp": self.__reference_timestamp - (self.__reference_counter - origin)
+            }
+        }
+
+    def store(self, filename: pathlib.Path) -> bool:
+        """Stores the trace to the given file in the Chrome trace event format."""
+        try:
+            with open(filename, mode="w", encoding="UTF-8") as trace_file:
+                json.dump(self.to_chrome_trace(), trace_file)
+            return True
+
+        except (OSError, TypeError, ValueError) as error:
+            LOGGER.error("Exception '{}' when trying to save the launch trace to file: {}".format(
+                type(error).__name__, error))
+            return False
+
+    def get_summary(self, lane: Optional[str] = MAIN_LANE) -> str:
+        """Returns a human readable summary of the phase durations in the given lane (None for all lanes)."""
+        return ", ".join(
+            "{}: {:.3f} s".format(phase.name, phase.duration)
+            for phase in self.__phases
+            if lane is None or phase.lane == lane
+        )
@@ -0,0 +1,449 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a utility for copying the simulation log files from the logs Docker volume to a local folder.
+The whole log folder is downloaded as a single streamed tar archive and only the files that have changed since
+the previous collection are written to the local folder, optionally gzip compressed. When simulations are given,
+only the start message folder and the files belonging to those simulations are downloaded.
+
+Usage: python -m platform_manager.log_collector <output_folder> [--simulation <id_or_exchange> ...] [--compress]
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import gzip
+import json
+import pathlib
+import posixpath
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Any, BinaryIO, Dict, Iterable, List, Optional, Set
+
+from aiodocker import Docker
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
+
+from tools.tools import FullLogger
+
+from platform_manager.component import COMPONENT_TYPE_LOG_WRITER, COMPONENT_TYPE_SIMULATION_MANAGER
+from platform_manager.platform_environment import (
+    get_component_log_filename, START_MESSAGE_FILENAME_TEMPLATE, LAUNCH_TRACE_FILENAME_TEMPLATE,
+    EPOCH_STATISTICS_FILENAME_TEMPLATE, RESOURCE_USAGE_FILENAME_TEMPLATE, START_MESSAGE_SIMULATION_ID,
+    START_MESSAGE_SIMULATION_SPECIFIC_EXCHANGE, START_MESSAGE_PROCESS_PARAMETERS)
+from platform_manager.simulation import SIMULATION_MANAGER_NAME
+from platform_manager.volume_helper import DEFAULT_HELPER_IMAGE, create_volume_container, remove_volume_container
+
+LOGGER = FullLogger(__name__)
+
+DEFAULT_LOGS_VOLUME = "simces_simulation_logs"
+DEFAULT_LOGS_FOLDER = "/logs"
+# the main log filename without the folder, the component log filenames are derived from it
+DEFAULT_MAIN_LOG_FILE = "logfile.log"
+# the start message folder relative to the logs folder
+DEFAULT_START_FOLDER = "start"
+# the default names for the core components when they are not given in the Start message
+DEFAULT_MANAGER_NAME = "SimulationManager"
+DEFAULT_LOGWRITER_NAME = "log_writer"
+
+# the file in the output folder that contains the state of the previous collection
+STATE_FILENAME = ".log_collection_state.json"
+COMPRESSED_SUFFIX = ".gz"
+# the size of the chunks used when reading the archive stream from the Docker Engine
+ARCHIVE_CHUNK_SIZE = 1024 ** 2
+# the status code from the Docker Engine when the requested path does not exist
+HTTP_NOT_FOUND = 404
+
+# the templates for the files in the start message folder that belong to a simulation
+SIMULATION_FILE_TEMPLATES = [
+    START_MESSAGE_FILENAME_TEMPLATE,
+    LAUNCH_TRACE_FILENAME_TEMPLATE,
+    EPOCH_STATISTICS_FILENAME_TEMPLATE,
+    RESOURCE_USAGE_FILENAME_TEMPLATE
+]
+
+
+@dataclasses.dataclass
+class CollectionResult:
+    """
+    Data class for holding the outcome of a log collection.
+    - copied_files: the relative paths of the files that were written to the output folder
+    - unchanged_files: the number of selected files that had not changed since the previous collection
+    - archive_bytes: the total size of the downloaded archives in bytes
+    - duration: the time in seconds spent for the collection
+    """
+    copied_files: List[str] = dataclasses.field(default_factory=list)
+    unchanged_files: int = 0
+    archive_bytes: int = 0
+    duration: float = 0.0
+
+
+def get_member_path(member: tarfile.TarInfo) -> str:
+    """Returns the path of the archive member relative to the downloaded folder."""
+    _, _, relative_path = member.name.partition("/")
+    return relative_path
+
+
+def is_safe_path(path: str) -> bool:
+    """Returns True, if the given path is a non-empty relative path that does not refer to any parent folder."""
+    posix_path = pathlib.PurePosixPath(path)
+    return bool(path) and not posix_path.is_absolute() and ".." not in posix_path.parts
+
+
+def get_member_state(member: tarfile.TarInfo) -> str:
+    """Returns the value that is used to detect changes in the archive member between collections."""
+    return "{}:{}".format(member.size, member.mtime)
+
+
+def get_process_names(start_message: Dict[str, Any], manager_name: str, logwriter_name: str) -> List[str]:
+    """Returns the names of all the simulation components that are listed in the given Start message."""
+    process_names = []
+    for component_type, parameters in (start_message.get(START_MESSAGE_PROCESS_PARAMETERS, None) or {}).items():
+        if not isinstance(parameters, dict):
+            continue
+        if component_type == COMPONENT_TYPE_SIMULATION_MANAGER:
+            # the parameters for the core components are not given per process
+            process_names.append(str(parameters.get(SIMULATION_MANAGER_NAME, None) or manager_name))
+        elif component_type == COMPONENT_TYPE_LOG_WRITER:
+            process_names.append(logwriter_name)
+        else:
+            process_names.extend(str(process_name) for process_name in parameters)
+    return process_names
+
+
+def get_simulation_files(start_message: Dict[str, Any], main_log_filename: str, start_folder: str,
+                         manager_name: str, logwriter_name: str) -> Set[str]:
+    """
+    Returns the relative paths for the files that belong to the simulation described by the given Start message.
+    The core component logs are included even though they can also contain output from other simulations.
+    """
+    simulation_exchange = str(start_message.get(START_MESSAGE_SIMULATION_SPECIFIC_EXCHANGE, ""))
+    # the components write their log files directly to the logs folder
+    main_log_filename = posixpath.basename(main_log_filename)
+    simulation_files = {
+        get_component_log_filename(main_log_filename, process_name)
+        for process_name in get_process_names(start_message, manager_name, logwriter_name)
+    }
+    simulation_files.update(
+        posixpath.join(start_folder, filename_template.format(simulation_exchange=simulation_exchange))
+        for filename_template in SIMULATION_FILE_TEMPLATES
+    )
+    return simulation_files
+
+
+def read_start_messages(archive: tarfile.TarFile) -> List[Dict[str, Any]]:
+    """Returns the Start messages that are stored in the given archive of the start message folder."""
+    start_messages = []
+    start_message_prefix = START_MESSAGE_FILENAME_TEMPLATE.split("{", maxsplit=1)[0]
+    for member in archive.getmembers():
+        member_path = get_member_path(member)
+        if not member.isfile() or posixpath.dirname(member_path) != "" or \
+                not member_path.startswith(start_message_prefix):
+            continue
+
+        member_file = archive.extractfile(member)
+        if member_file is None:
+            continue
+        try:
+            start_message = json.loads(member_file.read().decode("UTF-8"))
+            if isinstance(start_message, dict):
+                start_messages.append(start_message)
+        except (UnicodeDecodeError, ValueError) as message_error:
+            LOGGER.warning("Could not read the Start message '{}': {}".format(member_path, message_error))
+
+    return start_messages
+
+
+def get_selected_paths(start_messages: List[Dict[str, Any]], simulations: Iterable[str], main_log_filename: str,
+                       start_folder: str, manager_name: str, logwriter_name: str) -> Set[str]:
+    """
+    Returns the relative paths of the files that belong to the given simulations. The simulations are identified
+    either by their simulation ids or by their simulation specific exchange names.
+    """
+    wanted_simulations = set(simulations)
+    selected_paths = set()  # type: Set[str]
+    for start_message in start_messages:
+        if not wanted_simulations.intersection({
+                str(start_message.get(START_MESSAGE_SIMULATION_ID, None)),
+                str(start_message.get(START_MESSAGE_SIMULATION_SPECIFIC_EXCHANGE, None))}):
+            continue
+        selected_paths.update(get_simulation_files(
+            start_message, main_log_filename, start_folder, manager_name, logwriter_name))
+
+    if not selected_paths:
+        LOGGER.warning("No Start messages found for simulations: {}".format(", ".join(sorted(wanted_simulations))))
+
+    # the paths are built from the Start message contents, so they are checked before they are used
+    for unsafe_path in sorted(path for path in selected_paths if not is_safe_path(path)):
+        LOGGER.warning("Skipping the file '{}' with an unsafe path".format(unsafe_path))
+        selected_paths.discard(unsafe_path)
+    return selected_paths
+
+
+def select_log_files(archive: tarfile.TarFile, main_log_filename: str) -> Dict[str, tarfile.TarInfo]:
+    """Returns the log files from the given archive of the logs folder using their relative paths as keys."""
+    log_suffix = pathlib.PurePosixPath(main_log_filename).suffix
+    return {
+        get_member_path(member): member
+        for member in archive.getmembers()
+        if member.isfile() and posixpath.dirname(get_member_path(member)) == "" and
+        get_member_path(member).endswith(log_suffix)
+    }
+
+
+def load_state(state_filename: pathlib.Path) -> Dict[str, str]:
+    """Returns the collection state stored in the given file. A missing or an invalid file results in empty state."""
+    try:
+        if state_filename.is_file():
+            with open(state_filename, mode="r", encoding="UTF-8") as state_file:
+                state = json.load(state_file)
+            if isinstance(state, dict):
+                return {str(member_path): str(member_state) for member_path, member_state in state.items()}
+
+    except (OSError, ValueError) as state_error:
+        LOGGER.warning("Ignoring the collection state '{}' due to '{}': {}".format(
+            state_filename, type(state_error).__name__, state_error))
+    return {}
+
+
+def save_state(state_filename: pathlib.Path, state: Dict[str, str]):
+    """Writes the given collection state to the given file."""
+    try:
+        with open(state_filename, mode="w", encoding="UTF-8") as state_file:
+            json.dump(state, state_file, indent=4, sort_keys=True)
+    except OSError as state_error:
+        LOGGER.warning("Received '{}' when writing the collection state '{}': {}".format(
+            type(state_error).__name__, state_filename, state_error))
+
+
+def get_output_filename(output_folder: pathlib.Path, member_path: str, compress: bool) -> pathlib.Path:
+    """Returns the local filename for the given archive member."""
+    return output_folder / (member_path + COMPRESSED_SUFFIX if compress else member_path)
+
+
+def write_files(archive: tarfile.TarFile, members: Dict[str, tarfile.TarInfo], output_folder: pathlib.Path,
+                compress: bool, state: Dict[str, str], collection_result: CollectionResult):
+    """
+    Writes the given archive members to the output folder using the given relative paths if they have changed
+    since the previous collection or if the local copy is missing. The given collection state is updated.
+    """
+    for member_path, member in sorted(members.items()):
+        if not is_safe_path(member.name) or not is_safe_path(member_path):
+            LOGGER.warning("Skipping the archive member '{}' with an unsafe path".format(member.name))
+            continue
+
+        output_filename = get_output_filename(output_folder, member_path, compress)
+        member_state = get_member_state(member)
+        if state.get(member_path, None) == member_state and output_filename.exists():
+            collection_result.unchanged_files += 1
+            continue
+
+        member_file = archive.extractfile(member)
+        if member_file is None:
+            continue
+        output_filename.parent.mkdir(parents=True, exist_ok=True)
+        if compress:
+            with gzip.open(output_filename, mode="wb") as output_file:
+                shutil.copyfileobj(member_file, output_file)
+        else:
+            with open(output_filename, mode="wb") as output_file:
+                shutil.copyfileobj(member_file, output_file)
+
+        state[member_path] = member_state
+        collection_result.copied_files.append(member_path)
+
+
+def extract_log_files(archive_file: BinaryIO, output_folder: pathlib.Path, main_log_filename: str, compress: bool,
+                      state: Dict[str, str], collection_result: CollectionResult):
+    """Writes the log files from the given archive of the whole logs folder to the output folder."""
+    with tarfile.open(fileobj=archive_file, mode="r") as archive:
+        write_files(archive, select_log_files(archive, main_log_filename), output_folder, compress,
+                    state, collection_result)
+
+
+def extract_file(archive_file: BinaryIO, member_path: str, output_folder: pathlib.Path, compress: bool,
+                 state: Dict[str, str], collection_result: CollectionResult):
+    """Writes the file from the given single file archive to the output folder using the given relative path."""
+    with tarfile.open(fileobj=archive_file, mode="r") as archive:
+        members = [member for member in archive.getmembers() if member.isfile()]
+        if len(members) != 1:
+            LOGGER.warning("Expected a single file in the archive for '{}', found {}".format(member_path, len(members)))
+            return
+        write_files(archive, {member_path: members[0]}, output_folder, compress, state, collection_result)
+
+
+def extract_start_messages(archive_file: BinaryIO) -> List[Dict[str, Any]]:
+    """Returns the Start messages from the given archive of the start message folder."""
+    with tarfile.open(fileobj=archive_file, mode="r") as archive:
+        return read_start_messages(archive)
+
+
+async def download_archive(docker_client: Docker, container: DockerContainer, path: str,
+                           archive_file: BinaryIO) -> int:
+    """
+    Writes the tar archive of the given path in the given container to the given file.
+    Returns the size of the archive in bytes.
+    """
+    # Use a hack to stream the archive because the aiodocker get_archive reads the whole archive into memory.
+    archive_size = 0
+    async with docker_client._query(  # pylint: disable=protected-access
+            "containers/{}/archive".format(container.id), method="GET", params={"path": path}) as response:
+        while True:
+            chunk = await response.content.read(ARCHIVE_CHUNK_SIZE)
+            if not chunk:
+                break
+            archive_file.write(chunk)
+            archive_size += len(chunk)
+    return archive_size
+
+
+async def download_optional_archive(docker_client: Docker, container: DockerContainer, path: str,
+                                    archive_file: BinaryIO, collection_result: CollectionResult) -> bool:
+    """
+    Writes the tar archive of the given path in the given container to the given file and adds its size to
+    the collection result. Returns False, if the path does not exist.
+    """
+    try:
+        collection_result.archive_bytes += await download_archive(docker_client, container, path, archive_file)
+        archive_file.seek(0)
+        return True
+    except DockerError as error:
+        if error.status == HTTP_NOT_FOUND:
+            return False
+        raise
+
+
+async def collect_simulation_files(docker_client: Docker, container: DockerContainer, output_folder: pathlib.Path,
+                                   simulations: List[str], compress: bool, main_log_filename: str,
+                                   start_folder: str, manager_name: str, logwriter_name: str,
+                                   state: Dict[str, str], collection_result: CollectionResult):
+    """
+    Writes the files belonging to the given simulations to the output folder. Only the start message folder
+    and the files belonging to the simulations are downloaded from the volume.
+    """
+    event_loop = asyncio.get_running_loop()
+    with tempfile.TemporaryFile() as archive_file:
+        if not await download_optional_archive(
+                docker_client, container, posixpath.join(DEFAULT_LOGS_FOLDER, start_folder), archive_file,
+                collection_result):
+            LOGGER.warning("No start message folder '{}' found in the logs volume".format(start_folder))
+            return
+        start_messages = await event_loop.run_in_executor(None, extract_start_messages, archive_file)
+
+    selected_paths = get_selected_paths(
+        start_messages, simulations, main_log_filename, start_folder, manager_name, logwriter_name)
+    for member_path in sorted(selected_paths):
+        # the files that are not produced by all simulations, e.g. the epoch statistics, can be missing
+        with tempfile.TemporaryFile() as archive_file:
+            if await download_optional_archive(
+                    docker_client, container, posixpath.join(DEFAULT_LOGS_FOLDER, member_path), archive_file,
+                    collection_result):
+                await event_loop.run_in_executor(
+                    None, extract_file, archive_file, member_path, output_folder, compress, state, collection_result)
+
+
+async def collect_logs(docker_client: Docker, output_folder: pathlib.Path, simulations: Optional[List[str]] = None,
+                       compress: bool = False, volume_name: str = DEFAULT_LOGS_VOLUME,
+                       main_log_filename: str = DEFAULT_MAIN_LOG_FILE, start_folder: str = DEFAULT_START_FOLDER,
+                       manager_name: str = DEFAULT_MANAGER_NAME, logwriter_name: str = DEFAULT_LOGWRITER_NAME,
+                       helper_image: str = DEFAULT_HELPER_IMAGE) -> Optional[CollectionResult]:
+    """
+    Copies the log files from the given Docker volume to the given local folder.
+    If simulations are given, only the files belonging to those simulations are downloaded and copied.
+    Returns None, if the collection failed.
+    """
+    start_time = time.perf_counter()
+    collection_result = CollectionResult()
+    state_filename = output_folder / STATE_FILENAME
+    try:
+        output_folder.mkdir(parents=True, exist_ok=True)
+        state = load_state(state_filename)
+        container = await create_volume_container(
+            docker_client, volume_name, DEFAULT_LOGS_FOLDER, helper_image, read_only=True)
+        try:
+            if simulations:
+                await collect_simulation_files(
+                    docker_client, container, output_folder, simulations, compress, main_log_filename,
+                    start_folder, manager_name, logwriter_name, state, collection_result)
+            else:
+                # the archive is written to a temporary file so that it is not kept in memory
+                with tempfile.TemporaryFile() as archive_file:
+                    collection_result.archive_bytes = await download_archive(
+                        docker_client, container, DEFAULT_LOGS_FOLDER, archive_file)
+                    archive_file.seek(0)
+                    await asyncio.get_running_loop().run_in_executor(
+                        None, extract_log_files, archive_file, output_folder, main_log_filename, compress,
+                        state, collection_result)
+        finally:
+            await remove_volume_container(container)
+        save_state(state_filename, state)
+
+    except (DockerError, OSError, tarfile.TarError) as error:
+        LOGGER.error("Received {} when collecting logs from volume '{}': {}".format(
+            type(error).__name__, volume_name, error))
+        return None
+
+    collection_result.duration = time.perf_counter() - start_time
+    LOGGER.info("Copied {} files from volume '{}' in {:.1f} seconds ({} archive bytes), {} files were unchanged".format(
+        len(collection_result.copied_files), volume_name, collection_result.duration,
+        collection_result.archive_bytes, collection_result.unchanged_files))
+    return collection_result
+
+
+async def start_collection(output_folder: pathlib.Path, arguments: argparse.Namespace) -> bool:
+    """Collects the logs using the local Docker Engine. Returns True, if the collection was successful."""
+    docker_client = Docker()
+    try:
+        return await collect_logs(
+            docker_client, output_folder,
+            simulations=arguments.simulation,
+            compress=arguments.compress,
+            volume_name=arguments.volume,
+            main_log_filename=arguments.main_log_file,
+            manager_name=arguments.manager_name,
+            logwriter_name=arguments.logwriter_name,
+            helper_image=arguments.helper_image
+        ) is not None
+    finally:
+        await docker_client.close()
+
+
+def main():
+    """Parses the command line arguments and collects the log files."""
+    parser = argparse.ArgumentParser(description="Copies the simulation log files from a Docker volume.")
+    parser.add_argument("output_folder", type=str, help="the local folder to which the log files are copied")
+    parser.add_argument("--simulation", type=str, action="append",
+                        help="the simulation id or the simulation specific exchange name for a simulation whose " +
+                             "files are copied, can be given multiple times (default: all log files)")
+    parser.add_argument("--compress", action="store_true", help="write the files gzip compressed")
+    parser.add_argument("--volume", type=str, default=DEFAULT_LOGS_VOLUME,
+                        help="the name of the Docker volume containing the logs")
+    parser.add_argument("--main-log-file", type=str, default=DEFAULT_MAIN_LOG_FILE,
+                        help="the main log filename from which the component log filenames are derived")
+    parser.add_argument("--manager-name", type=str, default=DEFAULT_MANAGER_NAME,
+                        help="the simulation manager name used when it is not given in the Start message")
+    parser.add_argument("--logwriter-name", type=str, default=DEFAULT_LOGWRITER_NAME,
+                        help="the log writer name, i.e. the value of MONGODB_APPNAME")
+    parser.add_argument("--helper-image", type=str, default=DEFAULT_HELPER_IMAGE,
+                        help="the Docker image used for the helper container")
+    arguments = parser.parse_args()
+
+    output_folder = pathlib.Path(arguments.output_folder)
+    if output_folder.exists() and not output_folder.is_dir():
+        LOGGER.error("'{}' is not a directory".format(output_folder))
+        return 1
+
+    if not asyncio.run(start_collection(output_folder, arguments)):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a utility for following the log output of all the containers of a running simulation.
+The log streams are read concurrently within a single process and the lines are written to the output
+with a component name prefix and an optional color similar to the docker-compose logs command.
+
+Usage: python -m platform_manager.log_follower [<simulation_index>] [--level <level>] [--output <file>]
+"""
+
+import argparse
+import asyncio
+import codecs
+import dataclasses
+import logging
+import re
+import sys
+from typing import List, Optional, TextIO, Tuple
+
+import aiohttp
+from aiodocker import Docker
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
+from aiodocker.multiplexed import MultiplexedResult
+
+from tools.tools import FullLogger
+
+from platform_manager.component import COMPONENT_TYPE_LOG_WRITER, COMPONENT_TYPE_SIMULATION_MANAGER
+from platform_manager.docker_runner import ContainerStarter, LABEL_COMPONENT_TYPE, get_container_name
+
+LOGGER = FullLogger(__name__)
+
+# the ANSI color codes for the core components and the cycle of color codes for the other components
+CORE_COLOR_CODES = {
+    COMPONENT_TYPE_SIMULATION_MANAGER: "1;31",  # red
+    COMPONENT_TYPE_LOG_WRITER: "1;37"           # white
+}
+COMPONENT_COLOR_CODES = [
+    "1;32",  # green
+    "1;33",  # yellow
+    "1;34",  # blue
+    "1;35",  # magenta
+    "1;36"   # cyan
+]
+PREFIX_SEPARATOR = " | "
+
+# the encoding of the container output, the invalid bytes are shown as replacement characters
+OUTPUT_ENCODING = "UTF-8"
+
+# the log level names that are recognized from the log lines
+LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|WARNING|ERROR|CRITICAL)\b")
+
+# the maximum number of formatted lines waiting to be written, the log streams are not read when the queue is full
+DEFAULT_QUEUE_SIZE = 10000
+# the maximum number of lines written to the output at once
+WRITE_BATCH_SIZE = 1000
+# the maximum number of log streams per Docker client, i.e. the default connection limit of aiohttp
+STREAMS_PER_CLIENT = 100
+
+
+@dataclasses.dataclass
+class FollowedContainer:
+    """
+    Data class for holding a container whose log output is followed.
+    - container: the Docker container
+    - label: the name shown in the output prefix
+    - color_code: the ANSI color code used for the output lines
+    """
+    container: DockerContainer
+    label: str
+    color_code: str
+
+
+@dataclasses.dataclass
+class FollowStatistics:
+    """
+    Data class for holding the line counts from following the log output.
+    - written_lines: the number of lines written to the output
+    - filtered_lines: the number of lines that were below the minimum log level
+    """
+    written_lines: int = 0
+    filtered_lines: int = 0
+
+
+def get_line_level(line: str, previous_level: Optional[int]) -> Optional[int]:
+    """
+    Returns the log level for the given line. Lines without a log level, e.g. the lines of a traceback,
+    are considered to have the same level as the previous line from the same container.
+    """
+    level_match = LEVEL_PATTERN.search(line)
+    if level_match is None:
+        return previous_level
+    return logging.getLevelName(level_match.group(1))
+
+
+def split_lines(partial_line: str, output_piece: str) -> Tuple[List[str], str]:
+    """
+    Returns the complete lines and the new partial line after adding the given output piece to the partial line.
+    The line separators and the trailing carriage returns are not included in the returned lines.
+    """
+    output_lines = (partial_line + output_piece).split("\n")
+    partial_line = output_lines.pop()
+    return [line.rstrip("\r") for line in output_lines], partial_line
+
+
+def get_followed_containers(containers: List[DockerContainer], name_prefix: str) -> List[FollowedContainer]:
+    """
+    Returns the containers whose name starts with the given prefix sorted by their names. The prefix is removed
+    from the names in the output prefix. The core components have fixed colors while the others get rotating colors.
+    """
+    named_containers = sorted(
+        (get_container_name(container), container)
+        for container in containers
+        if get_container_name(container).startswith(name_prefix)
+    )
+    followed_containers = []
+    color_index = 0
+    for container_name, container in named_containers:
+        component_type = container._container.get("Labels", {}).get(  # pylint: disable=protected-access
+            LABEL_COMPONENT_TYPE, None)
+        color_code = CORE_COLOR_CODES.get(component_type, None)
+        if color_code is None:
+            color_code = COMPONENT_COLOR_CODES[color_index % len(COMPONENT_COLOR_CODES)]
+            color_index += 1
+        followed_containers.append(FollowedContainer(
+            container=container,
+            label=container_name[len(name_prefix):],
+            color_code=color_code
+        ))
+
+    return followed_containers
+
+
+class LogFollower:
+    """
+    Class for following the log output of several containers. The log streams are read concurrently and
+    the lines are passed to the writer through a bounded queue, so a slow output slows down the reading
+    of the streams instead of buffering the output in memory.
+    """
+    def __init__(self, output: TextIO, use_colors: bool = False, min_level: int = logging.NOTSET,
+                 queue_size: int = DEFAULT_QUEUE_SIZE):
+        """
+        Sets up the log follower.
+        - output: the text stream to which the log lines are written
+        - use_colors: whether to add the ANSI color codes to the output lines
+        - min_level: the lines with a lower log level are not written to the output
+        - queue_size: the maximum number of lines waiting to be written
+        """
+        self.__output = output
+        self.__use_colors = use_colors
+        self.__min_level = min_level
+        self.__line_queue = asyncio.Queue(maxsize=queue_size)  # type: asyncio.Queue
+        self.__statistics = FollowStatistics()
+
+    @property
+    def statistics(self) -> FollowStatistics:
+        """The line counts for the followed log output."""
+        return self.__statistics
+
+    async def follow(self, docker_clients: List[Docker], containers: List[FollowedContainer], tail: str = "all"):
+        """
+        Writes the log output of the given containers to the output until all the log streams have ended.
+        Each Docker client is used for at most STREAMS_PER_CLIENT log streams. An unexpected error in one
+        of the streams stops the following of all the streams and the error is raised after the written lines.
+        """
+        prefix_width = max((len(followed.label) for followed in containers), default=0)
+        writer_task = asyncio.create_task(self.__write_lines())
+        stream_tasks = [
+            asyncio.create_task(self.__read_stream(
+                docker_clients[stream_index // STREAMS_PER_CLIENT], followed, prefix_width, tail))
+            for stream_index, followed in enumerate(containers)
+        ]
+        try:
+            await asyncio.gather(*stream_tasks)
+        finally:
+            # the other streams would otherwise be left running without the writer
+            for stream_task in stream_tasks:
+                stream_task.cancel()
+            await asyncio.gather(*stream_tasks, return_exceptions=True)
+            await self.__line_queue.put(None)
+            await writer_task
+
+    def format_line(self, followed: FollowedContainer, prefix_width: int, line: str) -> str:
+        """Returns the output line with the component name prefix and the optional color."""
+        output_line = followed.label.ljust(prefix_width) + PREFIX_SEPARATOR + line
+        if self.__use_colors:
+            return "\033[{}m{}\033[0m\n".format(followed.color_code, output_line)
+        return output_line + "\n"
+
+    async def __read_stream(self, docker_client: Docker, followed: FollowedContainer, prefix_width: int, tail: str):
+        """Reads the log stream of the given container and adds the lines to the output queue."""
+        line_level = None  # type: Optional[int]
+        partial_line = ""
+        # the stream frames do not necessarily match the output lines or even the character boundaries
+        decoder = codecs.getincrementaldecoder(OUTPUT_ENCODING)(errors="replace")
+        try:
+            # Use a hack to disable the aiohttp default timeout since the followed streams can last for hours.
+            # The simulation containers are created without a TTY, so the stream is always multiplexed.
+            async with docker_client._query(  # pylint: disable=protected-access
+                    "containers/{}/logs".format(followed.container.id), method="GET",
+                    params={"stdout": True, "stderr": True, "follow": True, "tail": tail},
+                    timeout=aiohttp.ClientTimeout(total=None)) as response:
+                async for output_frame in MultiplexedResult(response, raw=False):
+                    output_lines, partial_line = split_lines(partial_line, decoder.decode(output_frame))
+                    for line in output_lines:
+                        line_level = await self.__add_line(followed, prefix_width, line, line_level)
+
+        except (DockerError, aiohttp.ClientError, asyncio.TimeoutError) as error:
+            LOGGER.warning("Stopped following '{}' due to {}: {}".format(followed.label, type(error).__name__, error))
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as error:  # pylint: disable=broad-except
+            LOGGER.error("Stopped following all containers after {} from '{}': {}".format(
+                type(error).__name__, followed.label, error))
+            raise
+
+        partial_line += decoder.decode(b"", final=True)
+        if partial_line:
+            await self.__add_line(followed, prefix_width, partial_line, line_level)
+
+    async def __add_line(self, followed: FollowedContainer, prefix_width: int, line: str,
+                         previous_level: Optional[int]) -> Optional[int]:
+        """
+        Adds the line to the output queue unless it is below the minimum log level.
+        Waits if the queue is full. Returns the log level for the line.
+        """
+        line_level = get_line_level(line, previous_level)
+        if line_level is not None and line_level < self.__min_level:
+            self.__statistics.filtered_lines += 1
+        else:
+            await self.__line_queue.put(self.format_line(followed, prefix_width, line))
+        return line_level
+
+    async def __write_lines(self):
+        """Writes the lines from the output queue in batches until the end marker is received."""
+        while True:
+            lines = [await self.__line_queue.get()]
+            while len(lines) < WRITE_BATCH_SIZE and not self.__line_queue.empty():
+                lines.append(self.__line_queue.get_nowait())
+
+            end_received = lines[-1] is None
+            if end_received:
+                lines.pop()
+            if lines:
+                # the blocking write is done in a separate thread so that a slow terminal does not block the streams
+                await asyncio.get_running_loop().run_in_executor(None, self.__write_batch, "".join(lines))
+                self.__statistics.written_lines += len(lines)
+            if end_received:
+                return
+
+    def __write_batch(self, text: str):
+        self.__output.write(text)
+        self.__output.flush()
+
+
+def get_name_prefix(simulation_index: Optional[int]) -> str:
+    """Returns the container name prefix for the given simulation or for all simulations if the index is None."""
+    if simulation_index is None:
+        return ContainerStarter.PREFIX_START
+    return "{}{:0{}d}_".format(ContainerStarter.PREFIX_START, simulation_index, ContainerStarter.PREFIX_DIGITS)
+
+
+async def follow_simulation(output: TextIO, simulation_index: Optional[int], use_colors: bool = False,
+                            min_level: int = logging.NOTSET, tail: str = "all", queue_size: int = DEFAULT_QUEUE_SIZE,
+                            docker_url: Optional[str] = None) -> Optional[FollowStatistics]:
+    """
+    Follows the log output of the running containers of the given simulation until all of them have stopped.
+    Returns None, if the containers could not be listed.
+    """
+    docker_clients = [Docker(url=docker_url)]
+    try:
+        name_prefix = get_name_prefix(simulation_index)
+        followed_containers = get_followed_containers(
+            await docker_clients[0].containers.list(filters={"name": [name_prefix]}), name_prefix)
+        if not followed_containers:
+            LOGGER.warning("No running containers found with the prefix '{}'".format(name_prefix))
+            return FollowStatistics()
+        LOGGER.info("Following the log output of {} containers".format(len(followed_containers)))
+
+        # each followed stream keeps one connection open, so the streams are divided between enough clients
+        for _ in range(STREAMS_PER_CLIENT, len(followed_containers), STREAMS_PER_CLIENT):
+            docker_clients.append(Docker(url=docker_url))
+
+        log_follower = LogFollower(output, use_colors, min_level, queue_size)
+        await log_follower.follow(docker_clients, followed_containers, tail)
+        return log_follower.statistics
+
+    except DockerError as error:
+        LOGGER.error("Received {} when listing the simulation containers: {}".format(type(error).__name__, error))
+        return None
+
+    finally:
+        for docker_client in docker_clients:
+            await docker_client.close()
+
+
+def main():
+    """Parses the command line arguments and follows the simulation log output."""
+    parser = argparse.ArgumentParser(description="Follows the log output of the containers of a running simulation.")
+    parser.add_argument("simulation_index", type=int, nargs="?", default=None,
+                        help="the index in the container name prefix, e.g. 1 for Sim01_ (default: all simulations)")
+    parser.add_argument("--level", type=str.upper, default="DEBUG",
+                        choices=["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"],
+                        help="the minimum log level for the shown lines")
+    parser.add_argument("--output", type=str, default=None,
+                        help="the file to which the log lines are appended (default: standard output)")
+    parser.add_argument("--no-color", action="store_true", help="do not use colors even for terminal output")
+    parser.add_argument("--tail", type=str, default="all",
+                        help="the number of existing lines to show from each container (default: all)")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="the maximum number of lines waiting to be written")
+    arguments = parser.parse_args()
+
+    output = sys.stdout if arguments.output is None else open(arguments.output, mode="a", encoding="UTF-8")
+    try:
+        statistics = asyncio.run(follow_simulation(
+            output=output,
+            simulation_index=arguments.simulation_index,
+            use_colors=output.isatty() and not arguments.no_color,
+            min_level=logging.getLevelName(arguments.level),
+            tail=arguments.tail,
+            queue_size=arguments.queue_size
+        ))
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if statistics is None:
+        return 1
+    LOGGER.info("Wrote {} log lines, {} lines were below the level {}".format(
+        statistics.written_lines, statistics.filtered_lines, arguments.level))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
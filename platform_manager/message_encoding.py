@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for compressing the message payloads sent to the management exchange
+and for decoding them according to the content encoding property of the received message.
+"""
+
+import gzip
+import zlib
+from typing import Optional
+
+# the supported values for the content encoding message property
+CONTENT_ENCODING_GZIP = "gzip"
+CONTENT_ENCODING_DEFLATE = "deflate"
+CONTENT_ENCODINGS = (CONTENT_ENCODING_GZIP, CONTENT_ENCODING_DEFLATE)
+
+# the compression level used for both encodings, the messages are compressed once per simulation
+COMPRESSION_LEVEL = 6
+
+
+def encode_message_body(message_bytes: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Returns the given message payload compressed using the given content encoding.
+    If the content encoding is None or empty, the payload is returned as is.
+    Raises ValueError for an unsupported content encoding.
+    """
+    if not content_encoding:
+        return message_bytes
+    if content_encoding == CONTENT_ENCODING_GZIP:
+        return gzip.compress(message_bytes, compresslevel=COMPRESSION_LEVEL)
+    if content_encoding == CONTENT_ENCODING_DEFLATE:
+        return zlib.compress(message_bytes, COMPRESSION_LEVEL)
+    raise ValueError("Unsupported content encoding: '{}'".format(content_encoding))
+
+
+def decode_message_body(message_bytes: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Returns the uncompressed message payload for a message with the given content encoding property.
+    Messages without a content encoding are returned as is. Raises ValueError for an unsupported content encoding.
+    """
+    if not content_encoding:
+        return message_bytes
+    if content_encoding == CONTENT_ENCODING_GZIP:
+        return gzip.decompress(message_bytes)
+    if content_encoding == CONTENT_ENCODING_DEFLATE:
+        return zlib.decompress(message_bytes)
+    raise ValueError("Unsupported content encoding: '{}'".format(content_encoding))
@@ -8,6 +8,8 @@
    a simulation using the simulation platform.
 """
 
+import dataclasses
+import hashlib
 import logging
 import json
 import pathlib
@@ -26,9 +28,9 @@ from tools.tools import (
 
 from platform_manager.component import (
     EXTERNAL_COMPONENT_TYPE, ComponentParameters, ComponentCollectionParameters,
-    get_component_type_parameters, load_component_parameters_from_yaml,
+    get_component_type_parameters, load_component_parameters_from_yaml, get_component_resources,
     COMPONENT_TYPE_SIMULATION_MANAGER, COMPONENT_TYPE_LOG_WRITER)
-from platform_manager.docker_runner import ContainerConfiguration
+from platform_manager.docker_runner import ContainerConfiguration, LABEL_BROKER, LABEL_COMPONENT_TYPE
 from platform_manager.simulation import (
     SimulationConfiguration, SimulationComponentConfiguration,
     DUPLICATE_CONTAINER_NAME_SEPARATOR, SIMULATION_MANAGER_NAME)
@@ -50,6 +52,17 @@ RABBITMQ_EXCHANGE = "RABBITMQ_EXCHANGE"
 RABBITMQ_EXCHANGE_AUTODELETE = "RABBITMQ_EXCHANGE_AUTODELETE"
 RABBITMQ_EXCHANGE_DURABLE = "RABBITMQ_EXCHANGE_DURABLE"
 RABBITMQ_EXCHANGE_PREFIX = "RABBITMQ_EXCHANGE_PREFIX"
+RABBITMQ_VARIABLE_PREFIX = "RABBITMQ_"
+RABBITMQ_HOST = "RABBITMQ_HOST"
+RABBITMQ_PORT = "RABBITMQ_PORT"
+# Comma separated list of RabbitMQ brokers (host or host:port) for the simulation specific exchanges.
+# Empty value means that all simulations use the broker given by RABBITMQ_HOST and RABBITMQ_PORT.
+RABBITMQ_BROKER_POOL = "RABBITMQ_BROKER_POOL"
+# The policy for assigning a broker from the broker pool for a new simulation.
+RABBITMQ_BROKER_POLICY = "RABBITMQ_BROKER_POLICY"
+BROKER_POLICY_HASH = "hash"
+BROKER_POLICY_LEAST_SIMULATIONS = "least-simulations"
+BROKER_POLICIES = (BROKER_POLICY_HASH, BROKER_POLICY_LEAST_SIMULATIONS)
 MONGODB_APPNAME = "MONGODB_APPNAME"
 
 MANIFEST_FOLDER = "MANIFEST_FOLDER"
@@ -69,12 +82,30 @@ START_MESSAGE_TYPE = "Type"
 START_MESSAGE_TIMESTAMP = "Timestamp"
 START_MESSAGE_SIMULATION_ID = "SimulationId"
 START_MESSAGE_SIMULATION_SPECIFIC_EXCHANGE = "SimulationSpecificExchange"
+# the broker for the simulation specific exchange, only included when the broker pool is used
+START_MESSAGE_SIMULATION_SPECIFIC_BROKER = "SimulationSpecificBroker"
+START_MESSAGE_BROKER_HOST = "Host"
+START_MESSAGE_BROKER_PORT = "Port"
 START_MESSAGE_NAME = "SimulationName"
 START_MESSAGE_DESCRIPTION = "SimulationDescription"
 START_MESSAGE_PROCESS_PARAMETERS = "ProcessParameters"
 
 # The filename for a stored Start message
 START_MESSAGE_FILENAME_TEMPLATE = "start_message_{simulation_exchange:}.json"
+# The filename for a stored launch trace
+LAUNCH_TRACE_FILENAME_TEMPLATE = "launch_trace_{simulation_exchange:}.json"
+EPOCH_STATISTICS_FILENAME_TEMPLATE = "epoch_statistics_{simulation_exchange:}.json"
+RESOURCE_USAGE_FILENAME_TEMPLATE = "resource_usage_{simulation_exchange:}.json"
+
+
+def get_component_log_filename(main_log_filename: str, component_name: str) -> str:
+    """Returns the log filename for the given component based on the main log filename."""
+    filename_addition = "_" + component_name
+    identifier_start = main_log_filename.rfind(".")
+
+    if identifier_start == -1:
+        return main_log_filename + filename_addition
+    return main_log_filename[:identifier_start] + filename_addition + main_log_filename[identifier_start:]
 
 
 # This helper function is a copy from fetch/fetch.py
@@ -99,6 +130,42 @@ def create_folder(target_folder: pathlib.Path):
         ))
 
 
+@dataclasses.dataclass(frozen=True)
+class BrokerEndpoint:
+    """
+    Data class for holding the address of a RabbitMQ broker.
+    - host: the host name for the broker
+    - port: the port number for the broker
+    """
+    host: str
+    port: int
+
+    @property
+    def address(self) -> str:
+        """The broker address in format host:port."""
+        return "{}:{}".format(self.host, self.port)
+
+
+def get_broker_pool(broker_addresses: str, default_port: int) -> List[BrokerEndpoint]:
+    """
+    Returns the brokers from the given comma separated list of broker addresses.
+    The default port is used for the addresses that do not include a port. Invalid addresses are ignored.
+    """
+    broker_pool = []  # type: List[BrokerEndpoint]
+    for broker_address in broker_addresses.split(","):
+        host, _, port = broker_address.strip().partition(":")
+        if not host:
+            continue
+        try:
+            broker = BrokerEndpoint(host=host, port=int(port) if port else default_port)
+        except ValueError:
+            LOGGER.warning("Ignoring invalid broker address: '{}'".format(broker_address.strip()))
+            continue
+        if broker not in broker_pool:
+            broker_pool.append(broker)
+    return broker_pool
+
+
 class PlatformEnvironment:
     """Class for holding the values for non-simulation specific environment variables."""
     def __init__(self):
@@ -107,6 +174,7 @@ class PlatformEnvironment:
 
         # setup the RabbitMQ parameters for the simulation specific exchange
         rabbitmq_env_variables = load_environmental_variables(*default_rabbitmq_definitions())
+        self.__management_rabbitmq = dict(rabbitmq_env_variables)
         # the exchange name is decided when starting a new simulation
         rabbitmq_env_variables.pop(RABBITMQ_EXCHANGE, None)
         self.__rabbitmq = {
@@ -117,6 +185,17 @@ class PlatformEnvironment:
         self.__rabbitmq_exchange_prefix = cast(
             str, EnvironmentVariable(RABBITMQ_EXCHANGE_PREFIX, str, "procem.").value)
 
+        # setup the optional broker pool for distributing the simulation specific exchanges
+        self.__broker_pool = get_broker_pool(
+            cast(str, EnvironmentVariable(RABBITMQ_BROKER_POOL, str, "").value),
+            cast(int, self.__rabbitmq[RABBITMQ_PORT]))
+        self.__broker_policy = cast(str, EnvironmentVariable(RABBITMQ_BROKER_POLICY, str, BROKER_POLICY_HASH).value)
+        if self.__broker_policy not in BROKER_POLICIES:
+            LOGGER.warning("Unknown broker policy '{}', using '{}' instead".format(
+                self.__broker_policy, BROKER_POLICY_HASH))
+            self.__broker_policy = BROKER_POLICY_HASH
+        self.__broker_assignments = {}  # type: Dict[str, BrokerEndpoint]
+
         # setup the MongoDB parameters for components needing database access
         self.__mongodb = load_environmental_variables(*default_mongodb_definitions())
 
@@ -152,12 +231,83 @@ class PlatformEnvironment:
             (DOCKER_VOLUME_TARGET_LOGS, str, "")
         )
 
+    def get_management_rabbitmq_parameters(self) -> Dict[str, EnvironmentVariableValue]:
+        """The parameters for a RabbitMQ connection to the management exchange."""
+        return self.__management_rabbitmq
+
+    @property
+    def broker_pool(self) -> List[BrokerEndpoint]:
+        """The brokers available for the simulation specific exchanges, empty if the broker pool is not used."""
+        return self.__broker_pool
+
+    @property
+    def broker_policy(self) -> str:
+        """The policy for assigning a broker from the broker pool for a new simulation."""
+        return self.__broker_policy
+
+    def assign_broker(self, simulation_id: str,
+                      broker_loads: Optional[Dict[str, int]] = None) -> Optional[BrokerEndpoint]:
+        """
+        Assigns a broker from the broker pool for the given simulation and returns it.
+        Returns None, if the broker pool is not used.
+        - simulation_id: the simulation id
+        - broker_loads: the number of running simulations for each broker address, used with the least simulations
+                        policy, if None, the simulations assigned by this object are counted
+        """
+        if not self.__broker_pool:
+            return None
+
+        if self.__broker_policy == BROKER_POLICY_LEAST_SIMULATIONS:
+            if broker_loads is None:
+                broker_loads = {}
+                for assigned_broker in self.__broker_assignments.values():
+                    broker_loads[assigned_broker.address] = broker_loads.get(assigned_broker.address, 0) + 1
+            broker = min(self.__broker_pool, key=lambda pool_broker: broker_loads.get(pool_broker.address, 0))
+        else:
+            simulation_hash = int(hashlib.sha256(simulation_id.encode("UTF-8")).hexdigest(), 16)
+            broker = self.__broker_pool[simulation_hash % len(self.__broker_pool)]
+
+        self.__broker_assignments[simulation_id] = broker
+        return broker
+
+    def get_broker(self, simulation_id: str) -> Optional[BrokerEndpoint]:
+        """
+        Returns the broker for the given simulation from the broker pool. The broker is assigned if necessary.
+        Returns None, if the broker pool is not used.
+        """
+        broker = self.__broker_assignments.get(simulation_id, None)
+        if broker is None:
+            broker = self.assign_broker(simulation_id)
+        return broker
+
     def get_rabbitmq_parameters(self, simulation_id: str) -> Dict[str, EnvironmentVariableValue]:
         """The simulation specific parameters for a RabbitMQ connection."""
-        return {
+        rabbitmq_parameters = {
             **self.__rabbitmq,
             RABBITMQ_EXCHANGE: self.get_simulation_exchange_name(simulation_id)
         }
+        broker = self.get_broker(simulation_id)
+        if broker is not None:
+            rabbitmq_parameters[RABBITMQ_HOST] = broker.host
+            rabbitmq_parameters[RABBITMQ_PORT] = broker.port
+        return rabbitmq_parameters
+
+    def get_rabbitmq_client_parameters(self, simulation_id: str) -> Dict[str, EnvironmentVariableValue]:
+        """The simulation specific parameters as keyword arguments for a RabbitmqClient object."""
+        return {
+            variable_name[len(RABBITMQ_VARIABLE_PREFIX):].lower(): variable_value
+            for variable_name, variable_value in self.get_rabbitmq_parameters(simulation_id).items()
+        }
+
+    def get_simulation_topics(self) -> Dict[str, str]:
+        """The topic names for the simulation specific messages using the environment variable names as keys."""
+        return {
+            topic_variable: cast(str, self.__common[topic_variable])
+            for topic_variable in (
+                SIMULATION_STATE_MESSAGE_TOPIC, SIMULATION_EPOCH_MESSAGE_TOPIC,
+                SIMULATION_STATUS_MESSAGE_TOPIC, SIMULATION_ERROR_MESSAGE_TOPIC
+            )
+        }
 
     def get_simulation_exchange_name(self, simulation_id: str) -> str:
         """Returns the name for the simulation specific exchange."""
@@ -168,13 +318,7 @@ class PlatformEnvironment:
 
     def get_component_log_filename(self, component_name: str) -> str:
         """Returns the log filename for the given component."""
-        filename_addition = "_" + component_name
-        main_log_filename = cast(str, self.__common[SIMULATION_LOG_FILE])
-        identifier_start = main_log_filename.rfind(".")
-
-        if identifier_start == -1:
-            return main_log_filename + filename_addition
-        return main_log_filename[:identifier_start] + filename_addition + main_log_filename[identifier_start:]
+        return get_component_log_filename(cast(str, self.__common[SIMULATION_LOG_FILE]), component_name)
 
     def get_docker_networks(self, rabbitmq: bool = True, mongodb: bool = False) -> List[str]:
         """Returns the names of the asked Docker networks."""
@@ -309,6 +453,8 @@ class PlatformEnvironment:
             Optional[List[ContainerConfiguration]]:
         """Returns a list containing the Docker container configurations for a new simulation run."""
         container_configurations = []
+        broker = self.get_broker(simulation_configuration.simulation.simulation_id)
+        container_labels = {LABEL_BROKER: broker.address} if broker is not None else {}
 
         for component_type in ([COMPONENT_TYPE_LOG_WRITER] +
                                list(simulation_configuration.components) +
@@ -329,6 +475,11 @@ class PlatformEnvironment:
 
             # Go through each instance for each of the dynamic component type.
             for component_name, component_configuration in component_instance_dictionary.items():
+                component_resources = component_type_settings.resources
+                if component_configuration.resources is not None:
+                    component_resources = component_resources.with_overrides(
+                        get_component_resources(component_configuration.resources))
+
                 for index in range(1, component_configuration.duplication_count + 1):
                     if component_configuration.duplication_count == 1:
                         full_component_name = component_name
@@ -362,7 +513,12 @@ class PlatformEnvironment:
                             volumes=self.get_docker_volumes(
                                 resources=component_name not in (
                                     COMPONENT_TYPE_SIMULATION_MANAGER, COMPONENT_TYPE_LOG_WRITER)
-                            )
+                            ),
+                            resources=component_resources,
+                            supervision=component_type_settings.supervision,
+                            labels={**container_labels, LABEL_COMPONENT_TYPE: component_type},
+                            core_component=component_type in (
+                                COMPONENT_TYPE_SIMULATION_MANAGER, COMPONENT_TYPE_LOG_WRITER)
                         )
                     )
 
@@ -393,6 +549,14 @@ class PlatformEnvironment:
             }
         }
 
+        # the listeners on the management exchange need the broker to find the simulation specific exchange
+        broker = self.get_broker(simulation_id)
+        if broker is not None:
+            start_message[START_MESSAGE_SIMULATION_SPECIFIC_BROKER] = {
+                START_MESSAGE_BROKER_HOST: broker.host,
+                START_MESSAGE_BROKER_PORT: broker.port
+            }
+
         for component_type, component_instances in simulation_configuration.components.items():
             if component_type not in self.__supported_component_types.component_types:
                 LOGGER.error("Encountered unsupported component type: {}".format(component_type))
@@ -458,6 +622,23 @@ class PlatformEnvironment:
         simple_filename = pathlib.Path(START_MESSAGE_FILENAME_TEMPLATE.format(simulation_exchange=simulation_exchange))
         return self.__start_message_folder / simple_filename
 
+    def get_launch_trace_filename(self, simulation_exchange: str) -> pathlib.Path:
+        """Returns the full filename where the launch trace will be stored. Uses the Start message folder."""
+        simple_filename = pathlib.Path(LAUNCH_TRACE_FILENAME_TEMPLATE.format(simulation_exchange=simulation_exchange))
+        return self.__start_message_folder / simple_filename
+
+    def get_epoch_statistics_filename(self, simulation_exchange: str) -> pathlib.Path:
+        """Returns the full filename where the epoch statistics will be stored. Uses the Start message folder."""
+        simple_filename = pathlib.Path(
+            EPOCH_STATISTICS_FILENAME_TEMPLATE.format(simulation_exchange=simulation_exchange))
+        return self.__start_message_folder / simple_filename
+
+    def get_resource_usage_filename(self, simulation_exchange: str) -> pathlib.Path:
+        """Returns the full filename where the resource usage summary will be stored. Uses the Start message folder."""
+        simple_filename = pathlib.Path(
+            RESOURCE_USAGE_FILENAME_TEMPLATE.format(simulation_exchange=simulation_exchange))
+        return self.__start_message_folder / simple_filename
+
     def __read_manifest_folder(self, manifest_folder: pathlib.Path):
         """
         Iterates through the given folder and parses all found files and
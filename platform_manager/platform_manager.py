@@ -11,34 +11,124 @@ a simulation using the simulation platform.
 
 import asyncio
 import json
-from typing import Any, cast, Dict
+import time
+from typing import Any, cast, Dict, List, Optional, TYPE_CHECKING
 
 from tools.clients import RabbitmqClient
-from tools.tools import FullLogger, EnvironmentVariable, log_exception
-
-from platform_manager.docker_runner import ContainerStarter
-from platform_manager.platform_environment import PlatformEnvironment
-from platform_manager.simulation import load_simulation_parameters_from_yaml
+from tools.tools import FullLogger, EnvironmentVariable, async_wrap, log_exception
+
+from platform_manager.docker_runner import (
+    ContainerConfiguration, ContainerStarter, LABEL_BROKER, LABEL_COMPONENT_TYPE)
+from platform_manager.launch_trace import LaunchTrace
+from platform_manager.message_encoding import CONTENT_ENCODINGS
+from platform_manager.platform_environment import (
+    PlatformEnvironment, START_MESSAGE_NAME, START_MESSAGE_SIMULATION_ID, BROKER_POLICY_LEAST_SIMULATIONS)
+from platform_manager.simulation import SimulationConfiguration, load_simulation_parameters_from_yaml
+from platform_manager.start_publisher import StartMessagePublisher, DEFAULT_CONFIRM_TIMEOUT, PUBLISH_ERRORS
+
+if TYPE_CHECKING:
+    # the monitoring related modules are only needed when the simulation is followed and they are imported on demand
+    from platform_manager.container_supervisor import ContainerSupervisor
+    from platform_manager.resource_usage import ResourceUsageSampler
+    from platform_manager.simulation_monitor import SimulationMonitor
 
 LOGGER = FullLogger(__name__)
 
 SIMULATION_CONFIGURATION_FILE = "SIMULATION_CONFIGURATION_FILE"
 SIMULATION_START_MESSAGE_TOPIC = "SIMULATION_START_MESSAGE_TOPIC"
+# The maximum time in seconds to wait for the containers to be ready before sending the Start message.
+# Value 0 disables the readiness check.
+START_READINESS_TIMEOUT = "START_READINESS_TIMEOUT"
+START_READINESS_CHECK_INTERVAL = "START_READINESS_CHECK_INTERVAL"
+# Comma separated list of Docker Engine addresses used for the simulation containers.
+# The first address is used for the core components. Empty value means only the default Docker Engine is used.
+DOCKER_ENGINES = "DOCKER_ENGINES"
+# Whether to follow the started simulation and remove its containers as soon as the simulation has finished.
+SIMULATION_MONITOR = "SIMULATION_MONITOR"
+# The time in seconds without any simulation messages after which the monitored simulation is considered crashed.
+# Value 0 disables the timeout.
+SIMULATION_MONITOR_TIMEOUT = "SIMULATION_MONITOR_TIMEOUT"
+# The time in seconds between the resource usage samples of the monitored simulation containers.
+# Value 0 disables the resource usage sampling.
+RESOURCE_SAMPLING_INTERVAL = "RESOURCE_SAMPLING_INTERVAL"
+# Whether to declare the simulation specific exchange before starting the containers and to publish
+# the Start message with publisher confirms using a persistent connection.
+START_MESSAGE_CONFIRMS = "START_MESSAGE_CONFIRMS"
+# The time in seconds to wait for the message bus connection and the publisher confirmation.
+START_MESSAGE_CONFIRM_TIMEOUT = "START_MESSAGE_CONFIRM_TIMEOUT"
+# The optional compression for the Start message payload, either "gzip" or "deflate".
+# Empty value means that the Start message is sent uncompressed.
+START_MESSAGE_COMPRESSION = "START_MESSAGE_COMPRESSION"
+
+# The lane name for the Start message related phases and additional attribute names in the launch trace
+START_MESSAGE_LANE = "start message"
+TRACE_CONTAINER_COUNT = "ContainerCount"
+TRACE_PUBLISH_CONFIRM_TIME = "PublishConfirmTime"
+TRACE_BROKER = "Broker"
 
 
 class PlatformManager:
     """PlatformManager handlers the starting of new simulations for the simulation platform."""
-    def __init__(self):
+    def __init__(self, rabbitmq_client: Optional[RabbitmqClient] = None,
+                 container_starter: Optional[ContainerStarter] = None,
+                 start_publisher: Optional[StartMessagePublisher] = None):
+        """
+        Sets up the platform manager. The clients are created based on the environment variables
+        unless they are given as parameters.
+        - rabbitmq_client: the message bus client for sending messages to the management exchange
+        - container_starter: the container starter used for starting the Docker containers
+        - start_publisher: the publisher for sending the Start message with publisher confirms
+        """
         # Message bus client for sending messages to the management exchange.
-        self.__rabbitmq_client = RabbitmqClient()
+        if rabbitmq_client is None:
+            rabbitmq_client = RabbitmqClient()
+        self.__rabbitmq_client = rabbitmq_client
 
-        # Load the environment variables.
+        # Load the environment variables and the component manifests.
+        manifest_resolution_start = time.perf_counter()
         self.__platform_environment = PlatformEnvironment()
+        self.__manifest_resolution_time = (manifest_resolution_start, time.perf_counter())
+
+        # Publisher for declaring the simulation specific exchange and for sending the confirmed Start message.
+        if start_publisher is None and cast(bool, EnvironmentVariable(START_MESSAGE_CONFIRMS, bool, True).value):
+            start_publisher = StartMessagePublisher(
+                rabbitmq_parameters=self.__platform_environment.get_management_rabbitmq_parameters(),
+                fallback_client=self.__rabbitmq_client,
+                confirm_timeout=cast(float, EnvironmentVariable(
+                    START_MESSAGE_CONFIRM_TIMEOUT, float, DEFAULT_CONFIRM_TIMEOUT).value)
+            )
+        self.__start_publisher = start_publisher
+
+        self.__start_message_compression = cast(str, EnvironmentVariable(START_MESSAGE_COMPRESSION, str, "").value)
+        if self.__start_message_compression and self.__start_message_compression not in CONTENT_ENCODINGS:
+            LOGGER.warning("Unsupported Start message compression '{}', sending the Start message uncompressed".format(
+                self.__start_message_compression))
+            self.__start_message_compression = ""
+        elif self.__start_message_compression and self.__start_publisher is None:
+            LOGGER.warning("Start message compression requires the publisher confirms to be enabled.")
+            self.__start_message_compression = ""
 
         # Open the Docker Engine connection.
-        self.__container_starter = ContainerStarter()
+        if container_starter is None:
+            docker_engines = [
+                docker_engine.strip()
+                for docker_engine in cast(str, EnvironmentVariable(DOCKER_ENGINES, str, "").value).split(",")
+                if docker_engine.strip()
+            ]
+            container_starter = ContainerStarter(docker_url=docker_engines if docker_engines else None)
+        self.__container_starter = container_starter
 
         self.__start_topic = cast(str, EnvironmentVariable(SIMULATION_START_MESSAGE_TOPIC, str, "Start").value)
+        self.__readiness_timeout = cast(float, EnvironmentVariable(START_READINESS_TIMEOUT, float, 0.0).value)
+        self.__readiness_check_interval = cast(
+            float, EnvironmentVariable(START_READINESS_CHECK_INTERVAL, float, 0.5).value)
+        self.__use_monitor = cast(bool, EnvironmentVariable(SIMULATION_MONITOR, bool, False).value)
+        self.__monitor_timeout = cast(float, EnvironmentVariable(SIMULATION_MONITOR_TIMEOUT, float, 0.0).value)
+        self.__sampling_interval = cast(float, EnvironmentVariable(RESOURCE_SAMPLING_INTERVAL, float, 0.0).value)
+        if self.__sampling_interval > 0 and not self.__use_monitor:
+            LOGGER.warning("The resource usage is sampled only for monitored simulations.")
+        self.__monitors = []  # type: List[SimulationMonitor]
+        self.__supervisors = []  # type: List[ContainerSupervisor]
         self.__is_stopped = False
 
     @property
@@ -49,10 +139,23 @@ class PlatformManager:
     async def stop(self):
         """Closes the connections to the RabbitMQ client and to the Docker Engine."""
         LOGGER.info("Stopping the platform manager.")
+        for monitor in self.__monitors:
+            await monitor.stop()
+        for supervisor in self.__supervisors:
+            await supervisor.stop()
+        if self.__start_publisher is not None:
+            await self.__start_publisher.close()
         await self.__rabbitmq_client.close()
         await self.__container_starter.close()
         self.__is_stopped = True
 
+    async def wait_for_simulations(self):
+        """Waits until all the monitored simulations have finished and their containers have been removed."""
+        await asyncio.gather(*(monitor.wait() for monitor in self.__monitors))
+        for supervisor in self.__supervisors:
+            await supervisor.stop()
+        self.__supervisors = []
+
     def register_component_type(self, component_type: str,
                                 component_type_definition: Dict[str, Any]) -> bool:
         """Registers a new (or updates a registered) component type to the platform manager."""
@@ -66,42 +169,150 @@ class PlatformManager:
         return register_check
 
     async def start_simulation(self, simulation_configuration_file: str) -> bool:
-        """Starts a new simulation using the given simulation configuration file."""
+        """
+        Starts a new simulation using the given simulation configuration file.
+        The timing of the launch phases is stored to a trace file next to the stored Start message.
+        """
         if self.is_stopped:
             return False
 
-        simulation_configuration = load_simulation_parameters_from_yaml(simulation_configuration_file)
+        launch_trace = LaunchTrace()
+        launch_trace.add_phase("manifest resolution", *self.__manifest_resolution_time)
+        try:
+            return await self.__launch_simulation(simulation_configuration_file, launch_trace)
+        finally:
+            await self.__store_launch_trace(launch_trace)
+
+    async def __launch_simulation(self, simulation_configuration_file: str, launch_trace: LaunchTrace) -> bool:
+        """Starts a new simulation using the given simulation configuration file."""
+        with launch_trace.phase("config load"):
+            simulation_configuration = load_simulation_parameters_from_yaml(simulation_configuration_file)
         if simulation_configuration is None:
             LOGGER.error("Could not load the simulation configuration.")
             return False
 
         simulation_name = simulation_configuration.simulation.simulation_name
         simulation_id = simulation_configuration.simulation.simulation_id
+        launch_trace.metadata[START_MESSAGE_SIMULATION_ID] = simulation_id
+        launch_trace.metadata[START_MESSAGE_NAME] = simulation_name
+
+        if self.__platform_environment.broker_pool:
+            with launch_trace.phase("broker assignment"):
+                await self.__assign_broker(simulation_id, launch_trace)
 
-        container_configuration = self.__platform_environment.get_container_configurations(simulation_configuration)
+        with launch_trace.phase("container configuration"):
+            container_configuration = self.__platform_environment.get_container_configurations(
+                simulation_configuration)
         if container_configuration is None:
             LOGGER.error("Could not create the Docker container configurations.")
             return False
-
-        start_message = self.__platform_environment.get_start_message(simulation_configuration)
-        if start_message is None:
-            LOGGER.error("Could not create the Start message.")
-            return False
-        start_message_is_stored = self.__platform_environment.store_start_message(start_message)
-        if not start_message_is_stored:
-            LOGGER.warning("Could not save the Start message to a file.")
+        launch_trace.metadata[TRACE_CONTAINER_COUNT] = len(container_configuration)
 
         LOGGER.info("Starting the Docker containers for simulation: '{:s}' with id: {:s}".format(
             simulation_name, simulation_id))
-        container_names = await self.__container_starter.start_simulation(container_configuration)
-
-        if container_names is None:
+        # The Start message preparation, the exchange declaration and the container creation are independent
+        # of each other and they are run concurrently. All have to be finished before the containers are started.
+        with launch_trace.phase("start message and container creation"):
+            start_message, simulation_containers, exchange_result = await asyncio.gather(
+                self.__prepare_start_message(simulation_configuration, launch_trace),
+                self.__container_starter.create_simulation_containers(container_configuration, launch_trace),
+                self.__declare_simulation_exchange(simulation_id, launch_trace),
+                return_exceptions=True
+            )
+
+        # the containers that were already created must not be left behind if the other tasks failed
+        launch_errors = [
+            result for result in (start_message, simulation_containers, exchange_result)
+            if isinstance(result, BaseException)
+        ]
+        if launch_errors:
+            if isinstance(simulation_containers, list):
+                LOGGER.error("Removing the created containers after {}: {}".format(
+                    type(launch_errors[0]).__name__, launch_errors[0]))
+                await self.__container_starter.remove_containers(simulation_containers)
+            raise launch_errors[0]
+
+        if simulation_containers is None:
             LOGGER.error("A problem starting the simulation. Could not create the Docker containers.")
             return False
+        if start_message is None:
+            LOGGER.error("Could not create the Start message.")
+            await self.__container_starter.remove_containers(simulation_containers)
+            return False
 
-        start_message_bytes = bytes(json.dumps(start_message), encoding="UTF-8")
-        await self.__rabbitmq_client.send_message(topic_name=self.__start_topic, message_bytes=start_message_bytes)
-        LOGGER.info("Start message for simulation '{:s}' sent to management exchange.".format(simulation_name))
+        with launch_trace.phase("container start"):
+            await self.__container_starter.start_containers(simulation_containers, launch_trace)
+        container_names = [container_name for container_name, _ in simulation_containers]
+        supervisor = None  # type: Optional[ContainerSupervisor]
+        monitor = None  # type: Optional[SimulationMonitor]
+
+        if any(configuration.supervision.restart_on_failure for configuration in container_configuration):
+            if self.__use_monitor:
+                # pylint: disable=import-outside-toplevel
+                from platform_manager.container_supervisor import ContainerSupervisor
+                supervisor = ContainerSupervisor(
+                    self.__container_starter, dict(zip(container_names, container_configuration)))
+                await supervisor.start()
+                self.__supervisors.append(supervisor)
+            else:
+                LOGGER.warning("The supervision policies are ignored since the simulation is not monitored.")
+
+        if self.__readiness_timeout > 0:
+            LOGGER.info("Waiting for the containers to be ready before sending the Start message.")
+            with launch_trace.phase("readiness wait"):
+                all_ready = await self.__container_starter.wait_for_containers(
+                    container_names, self.__readiness_timeout, self.__readiness_check_interval)
+            if not all_ready:
+                LOGGER.warning("Sending the Start message even though all the containers are not ready.")
+
+        if self.__use_monitor:
+            # the monitor must be listening to the simulation specific exchange before the simulation starts
+            # pylint: disable=import-outside-toplevel
+            from platform_manager.simulation_monitor import SimulationMonitor
+            simulation_exchange = self.__platform_environment.get_simulation_exchange_name(simulation_id)
+            monitor = SimulationMonitor(
+                simulation_id=simulation_id,
+                container_names=container_names,
+                container_starter=self.__container_starter,
+                rabbitmq_parameters=self.__platform_environment.get_rabbitmq_client_parameters(simulation_id),
+                topics=self.__platform_environment.get_simulation_topics(),
+                inactivity_timeout=self.__monitor_timeout,
+                statistics_filename=self.__platform_environment.get_epoch_statistics_filename(simulation_exchange),
+                resource_sampler=self.__get_resource_sampler(simulation_id, container_names, container_configuration),
+                resource_usage_filename=self.__platform_environment.get_resource_usage_filename(simulation_exchange)
+            )
+            await monitor.start()
+            self.__monitors.append(monitor)
+
+        with launch_trace.phase("publish"):
+            start_message_bytes = bytes(json.dumps(start_message), encoding="UTF-8")
+            if self.__start_publisher is None:
+                await self.__rabbitmq_client.send_message(
+                    topic_name=self.__start_topic, message_bytes=start_message_bytes)
+                confirm_time = None
+            else:
+                try:
+                    confirm_time = await self.__start_publisher.publish(
+                        self.__start_topic, start_message_bytes, self.__start_message_compression)
+                except PUBLISH_ERRORS as error:
+                    # The broker may have received the message, so it is not resent to avoid a duplicate Start.
+                    # Without the confirmation the simulation might never start, so it is stopped instead of
+                    # leaving the containers waiting without anyone following them.
+                    LOGGER.error("The Start message for simulation '{}' was not confirmed ({}: {}). ".format(
+                        simulation_name, type(error).__name__, error) +
+                        "Stopping the simulation containers.")
+                    await self.__abort_simulation(container_names, monitor, supervisor)
+                    return False
+        launch_trace.metadata[TRACE_PUBLISH_CONFIRM_TIME] = confirm_time
+        if confirm_time is None:
+            if self.__start_message_compression:
+                # the fallback client cannot set the content encoding property
+                LOGGER.warning("The Start message was sent without the '{}' compression.".format(
+                    self.__start_message_compression))
+            LOGGER.info("Start message for simulation '{:s}' sent to management exchange.".format(simulation_name))
+        else:
+            LOGGER.info("Start message for simulation '{:s}' confirmed by the management exchange in {:.1f} ms.".format(
+                simulation_name, confirm_time * 1000))
 
         # The container for the simulation manager should be the last one in the list.
         manager_container_name = container_names[-1]
@@ -113,11 +324,104 @@ class PlatformManager:
                     "    source follow_simulation.sh {:s}".format(simulation_identifier))
         LOGGER.info("Alternatively, the simulation manager logs can by viewed by:\n" +
                     "    docker logs --follow {:s}".format(manager_container_name))
-        LOGGER.info("Platform manager has finished starting the simulation and will now stop.")
-        LOGGER.info("The simulation will continue to run on the background.")
+        if self.__use_monitor:
+            LOGGER.info("Platform manager will follow the simulation and remove the containers when it has finished.")
+        else:
+            LOGGER.info("Platform manager has finished starting the simulation and will now stop.")
+            LOGGER.info("The simulation will continue to run on the background.")
 
         return True
 
+    async def __abort_simulation(self, container_names: List[str], monitor: Optional["SimulationMonitor"],
+                                 supervisor: Optional["ContainerSupervisor"]):
+        """Stops following the started simulation and stops and removes its containers."""
+        if monitor is not None:
+            await monitor.stop()
+            self.__monitors.remove(monitor)
+        # the supervisor is stopped before the containers so that it does not restart them
+        if supervisor is not None:
+            await supervisor.stop()
+            self.__supervisors.remove(supervisor)
+        if not await self.__container_starter.stop_containers(container_names):
+            LOGGER.error("Could not remove all the containers for the stopped simulation.")
+
+    def __get_resource_sampler(self, simulation_id: str, container_names: List[str],
+                               container_configurations: List[ContainerConfiguration]) \
+            -> Optional["ResourceUsageSampler"]:
+        """Returns the resource usage sampler for the simulation containers or None, if the sampling is disabled."""
+        if self.__sampling_interval <= 0:
+            return None
+
+        # pylint: disable=import-outside-toplevel
+        from platform_manager.resource_usage import ResourceUsageSampler
+        return ResourceUsageSampler(
+            simulation_id=simulation_id,
+            container_starter=self.__container_starter,
+            container_types={
+                container_name: configuration.labels.get(LABEL_COMPONENT_TYPE, configuration.image)
+                for container_name, configuration in zip(container_names, container_configurations)
+            },
+            sampling_interval=self.__sampling_interval
+        )
+
+    async def __assign_broker(self, simulation_id: str, launch_trace: LaunchTrace):
+        """
+        Assigns a broker from the broker pool for the simulation. With the least simulations policy the number of
+        simulations using each broker is taken from the labels of the existing simulation containers.
+        """
+        broker_loads = None
+        if self.__platform_environment.broker_policy == BROKER_POLICY_LEAST_SIMULATIONS:
+            registry = self.__container_starter.registry
+            if await registry.start():
+                broker_loads = registry.get_simulation_label_counts(LABEL_BROKER)
+            else:
+                LOGGER.warning("Could not count the simulations for each broker from the existing containers.")
+
+        broker = self.__platform_environment.assign_broker(simulation_id, broker_loads)
+        if broker is not None:
+            launch_trace.metadata[TRACE_BROKER] = broker.address
+            LOGGER.info("Using broker {} for simulation {}".format(broker.address, simulation_id))
+
+    async def __declare_simulation_exchange(self, simulation_id: str, launch_trace: LaunchTrace):
+        """Declares the simulation specific exchange so that it exists before the simulation components start."""
+        if self.__start_publisher is None:
+            return
+
+        with launch_trace.phase("exchange declaration", lane=START_MESSAGE_LANE):
+            exchange_declared = await self.__start_publisher.declare_simulation_exchange(
+                self.__platform_environment.get_rabbitmq_parameters(simulation_id))
+        if not exchange_declared:
+            LOGGER.warning("The simulation specific exchange will be created by the simulation components.")
+
+    async def __prepare_start_message(self, simulation_configuration: SimulationConfiguration,
+                                      launch_trace: LaunchTrace) -> Optional[Dict[str, Any]]:
+        """Creates the Start message for the simulation and stores it to a file."""
+        with launch_trace.phase("start message build", lane=START_MESSAGE_LANE):
+            start_message = await async_wrap(self.__platform_environment.get_start_message)(
+                simulation_configuration)
+        if start_message is None:
+            return None
+
+        with launch_trace.phase("file store", lane=START_MESSAGE_LANE):
+            start_message_is_stored = await async_wrap(self.__platform_environment.store_start_message)(
+                start_message)
+        if not start_message_is_stored:
+            LOGGER.warning("Could not save the Start message to a file.")
+        return start_message
+
+    async def __store_launch_trace(self, launch_trace: LaunchTrace):
+        """Stores the launch trace to a file next to the stored Start message."""
+        simulation_id = launch_trace.metadata.get(START_MESSAGE_SIMULATION_ID, None)
+        if simulation_id is None:
+            # without the simulation id there is no simulation specific name for the trace file
+            LOGGER.debug("Launch trace: {}".format(launch_trace.get_summary()))
+            return
+
+        trace_filename = self.__platform_environment.get_launch_trace_filename(
+            self.__platform_environment.get_simulation_exchange_name(simulation_id))
+        if await async_wrap(launch_trace.store)(trace_filename):
+            LOGGER.info("Launch trace stored to '{}': {}".format(trace_filename, launch_trace.get_summary()))
+
 
 async def start_platform_manager():
     """Starts the Platform manager process."""
@@ -128,6 +432,7 @@ async def start_platform_manager():
         start_check = await platform_manager.start_simulation(configuration_filename)
         if start_check:
             LOGGER.debug("A new simulation run started.")
+            await platform_manager.wait_for_simulations()
 
         await platform_manager.stop()
 
@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for sampling the CPU, memory and network usage of the simulation containers
+from the Docker stats endpoint and for summarizing the usage for each component type.
+"""
+
+import asyncio
+import dataclasses
+import json
+import pathlib
+import time
+from typing import Any, cast, Dict, List, Optional, Tuple
+
+from aiodocker.exceptions import DockerError
+from aiohttp.client_exceptions import ClientError
+
+from tools.tools import FullLogger
+
+from platform_manager.docker_runner import ContainerStarter
+
+LOGGER = FullLogger(__name__)
+
+# the maximum number of concurrent stats requests, the Docker Engine takes about a second to answer each request
+MAX_CONCURRENT_STATS_REQUESTS = 16
+# the name used for the summary over all the component types
+TOTAL_USAGE_NAME = "Total"
+
+
+def get_cpu_usage(stats: Dict[str, Any]) -> float:
+    """Returns the CPU usage as the number of fully used CPU cores from the given Docker stats response."""
+    cpu_stats = stats.get("cpu_stats", {})
+    precpu_stats = stats.get("precpu_stats", {})
+    cpu_delta = (cpu_stats.get("cpu_usage", {}).get("total_usage", 0) -
+                 precpu_stats.get("cpu_usage", {}).get("total_usage", 0))
+    system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+    if cpu_delta <= 0 or system_delta <= 0:
+        return 0.0
+
+    online_cpus = cpu_stats.get("online_cpus", None)
+    if not online_cpus:
+        online_cpus = len(cpu_stats.get("cpu_usage", {}).get("percpu_usage", None) or [1])
+    return cpu_delta / system_delta * online_cpus
+
+
+def get_memory_usage(stats: Dict[str, Any]) -> int:
+    """Returns the memory usage in bytes without the page cache from the given Docker stats response."""
+    memory_stats = stats.get("memory_stats", {})
+    page_cache = memory_stats.get("stats", {}).get("inactive_file", memory_stats.get("stats", {}).get("cache", 0))
+    return max(0, memory_stats.get("usage", 0) - page_cache)
+
+
+def get_network_usage(stats: Dict[str, Any]) -> Tuple[int, int]:
+    """Returns the received and the transmitted bytes over all the network interfaces from the given stats response."""
+    networks = stats.get("networks", None) or {}
+    return (
+        sum(network.get("rx_bytes", 0) for network in networks.values()),
+        sum(network.get("tx_bytes", 0) for network in networks.values())
+    )
+
+
+@dataclasses.dataclass
+class UsageAccumulator:
+    """
+    Data class for accumulating the resource usage of a group of containers over the sampling rounds.
+    - sample_count: the number of sampling rounds in which at least one container of the group was sampled
+    - cpu_sum: the sum of the CPU usages (in cores) over the sampling rounds
+    - cpu_peak: the highest CPU usage (in cores) in a single sampling round
+    - memory_sum: the sum of the memory usages (in bytes) over the sampling rounds
+    - memory_peak: the highest memory usage (in bytes) in a single sampling round
+    """
+    sample_count: int = 0
+    cpu_sum: float = 0.0
+    cpu_peak: float = 0.0
+    memory_sum: int = 0
+    memory_peak: int = 0
+
+    def add_round(self, cpu_usage: float, memory_usage: int):
+        """Adds the combined usage of the group from one sampling round."""
+        self.sample_count += 1
+        self.cpu_sum += cpu_usage
+        self.cpu_peak = max(self.cpu_peak, cpu_usage)
+        self.memory_sum += memory_usage
+        self.memory_peak = max(self.memory_peak, memory_usage)
+
+    def get_summary(self, container_count: int, network_usage: Tuple[int, int]) -> Dict[str, Any]:
+        """Returns the usage summary for the group."""
+        return {
+            "Containers": container_count,
+            "Samples": self.sample_count,
+            "CpuMean": self.cpu_sum / self.sample_count if self.sample_count > 0 else 0.0,
+            "CpuPeak": self.cpu_peak,
+            "MemoryMean": self.memory_sum // self.sample_count if self.sample_count > 0 else 0,
+            "MemoryPeak": self.memory_peak,
+            "NetworkRxBytes": network_usage[0],
+            "NetworkTxBytes": network_usage[1]
+        }
+
+
+class ResourceUsageSampler:
+    """
+    Class for sampling the resource usage of the containers of a simulation at a fixed interval.
+    The CPU and memory usages of the containers of each component type are summed in each sampling round,
+    and the mean and the peak of these sums are reported. The network usage is the total over the simulation
+    accumulated from the changes in the network counters between the samples.
+    """
+    def __init__(self, simulation_id: str, container_starter: ContainerStarter,
+                 container_types: Dict[str, str], sampling_interval: float):
+        """
+        Sets up the sampler.
+        - simulation_id: the simulation id for the sampled simulation
+        - container_starter: the container starter that was used to start the simulation containers
+        - container_types: the component type for each sampled container using the container names as keys
+        - sampling_interval: the time in seconds between the starts of the sampling rounds
+        """
+        self.__simulation_id = simulation_id
+        self.__container_starter = container_starter
+        self.__container_types = container_types
+        self.__sampling_interval = sampling_interval
+
+        self.__type_usages = {
+            component_type: UsageAccumulator()
+            for component_type in sorted(set(container_types.values()))
+        }
+        self.__total_usage = UsageAccumulator()
+        # the latest cumulative network counters and the accumulated network usage for each container
+        self.__network_counters = {}  # type: Dict[str, Tuple[int, int]]
+        self.__network_usages = {}  # type: Dict[str, Tuple[int, int]]
+
+        self.__semaphore = asyncio.Semaphore(MAX_CONCURRENT_STATS_REQUESTS)
+        self.__sampling_task = None  # type: Optional[asyncio.Task]
+        self.__start_time = None  # type: Optional[float]
+        self.__end_time = None  # type: Optional[float]
+
+    @property
+    def sample_count(self) -> int:
+        """The number of sampling rounds in which at least one container was sampled."""
+        return self.__total_usage.sample_count
+
+    def start(self):
+        """Starts sampling the containers in the background."""
+        if self.__sampling_task is None:
+            self.__start_time = time.perf_counter()
+            self.__sampling_task = asyncio.create_task(self.__sample_periodically())
+            LOGGER.debug("Sampling the resource usage of {} containers every {} seconds".format(
+                len(self.__container_types), self.__sampling_interval))
+
+    async def stop(self):
+        """Stops the background sampling."""
+        if self.__sampling_task is not None:
+            self.__sampling_task.cancel()
+            await asyncio.gather(self.__sampling_task, return_exceptions=True)
+            self.__sampling_task = None
+            self.__end_time = time.perf_counter()
+
+    async def sample(self):
+        """Samples the resource usage of all the containers once."""
+        container_names = list(self.__container_types)
+        container_stats = await asyncio.gather(*(
+            self.__get_stats(container_name)
+            for container_name in container_names
+        ))
+
+        type_cpu_usages = {}  # type: Dict[str, float]
+        type_memory_usages = {}  # type: Dict[str, int]
+        for container_name, stats in zip(container_names, container_stats):
+            if stats is None:
+                continue
+            component_type = self.__container_types[container_name]
+            type_cpu_usages[component_type] = type_cpu_usages.get(component_type, 0.0) + get_cpu_usage(stats)
+            type_memory_usages[component_type] = type_memory_usages.get(component_type, 0) + get_memory_usage(stats)
+            self.__add_network_usage(container_name, get_network_usage(stats))
+
+        for component_type, cpu_usage in type_cpu_usages.items():
+            self.__type_usages[component_type].add_round(cpu_usage, type_memory_usages[component_type])
+        if type_cpu_usages:
+            self.__total_usage.add_round(sum(type_cpu_usages.values()), sum(type_memory_usages.values()))
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Returns the resource usage summary for the simulation."""
+        type_containers = {}  # type: Dict[str, List[str]]
+        for container_name, component_type in self.__container_types.items():
+            type_containers.setdefault(component_type, []).append(container_name)
+
+        if self.__start_time is None:
+            duration = 0.0
+        else:
+            duration = (self.__end_time if self.__end_time is not None else time.perf_counter()) - self.__start_time
+
+        return {
+            "SimulationId": self.__simulation_id,
+            "SamplingInterval": self.__sampling_interval,
+            "Duration": duration,
+            "ComponentTypes": {
+                component_type: usage.get_summary(
+                    len(type_containers[component_type]),
+                    self.__get_network_usage(type_containers[component_type]))
+                for component_type, usage in self.__type_usages.items()
+            },
+            TOTAL_USAGE_NAME: self.__total_usage.get_summary(
+                len(self.__container_types), self.__get_network_usage(list(self.__container_types)))
+        }
+
+    def store(self, filename: pathlib.Path) -> bool:
+        """Stores the resource usage summary to the given file in JSON format."""
+        try:
+            with open(filename, mode="w", encoding="UTF-8") as summary_file:
+                json.dump(self.get_summary(), summary_file, indent=4)
+            return True
+
+        except (OSError, TypeError, ValueError) as error:
+            LOGGER.error("Exception '{}' when trying to save the resource usage to file: {}".format(
+                type(error).__name__, error))
+            return False
+
+    def __add_network_usage(self, container_name: str, network_counters: Tuple[int, int]):
+        """
+        Adds the network usage since the previous sample of the given container to the accumulated usage.
+        A counter that is smaller than in the previous sample has been reset, e.g. by a container restart,
+        and its whole value is counted as new usage.
+        """
+        previous_counters = self.__network_counters.get(container_name, (0, 0))
+        network_usage = self.__network_usages.get(container_name, (0, 0))
+        self.__network_usages[container_name] = cast(Tuple[int, int], tuple(
+            usage + (counter - previous_counter if counter >= previous_counter else counter)
+            for usage, counter, previous_counter in zip(network_usage, network_counters, previous_counters)
+        ))
+        self.__network_counters[container_name] = network_counters
+
+    def __get_network_usage(self, container_names: List[str]) -> Tuple[int, int]:
+        """Returns the total received and transmitted bytes for the given containers."""
+        network_usages = [self.__network_usages.get(container_name, (0, 0)) for container_name in container_names]
+        return (
+            sum(received_bytes for received_bytes, _ in network_usages),
+            sum(transmitted_bytes for _, transmitted_bytes in network_usages)
+        )
+
+    async def __get_stats(self, container_name: str) -> Optional[Dict[str, Any]]:
+        """Returns a single stats response for the given container or None, if the stats are not available."""
+        async with self.__semaphore:
+            try:
+                docker_client = self.__container_starter.get_docker_client(container_name)
+                stats = await docker_client.containers.container(container_name).stats(stream=False)
+                # the non-streamed response contains a single stats object
+                return stats[0] if stats else None
+
+            except (ClientError, DockerError) as error:
+                LOGGER.debug("Received {} when reading the stats for container {}: {}".format(
+                    type(error).__name__, container_name, error))
+                return None
+
+    async def __sample_periodically(self):
+        """Samples the containers at the sampling interval until the sampling is stopped."""
+        while True:
+            round_start = time.perf_counter()
+            try:
+                await self.sample()
+            except Exception as error:  # pylint: disable=broad-except
+                # a single failed round must not stop the sampling for the rest of the simulation
+                LOGGER.error("Received {} when sampling the resource usage: {}".format(type(error).__name__, error))
+            await asyncio.sleep(max(0.0, self.__sampling_interval - (time.perf_counter() - round_start)))
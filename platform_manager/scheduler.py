@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""This module contains the functionality for placing the simulation containers to several Docker Engines."""
+
+import dataclasses
+import math
+from typing import List, Optional, Tuple
+
+from tools.tools import FullLogger
+
+from platform_manager.component import ComponentResources, CPU_AFFINITY_DEDICATED
+
+LOGGER = FullLogger(__name__)
+
+# The resource demand that is used for the containers that do not have resource hints
+DEFAULT_CONTAINER_CPUS = 0.5
+DEFAULT_CONTAINER_MEMORY = 256 * 1024 ** 2  # in bytes
+
+# The index for the Docker Engine that has access to the message bus network
+PRIMARY_ENGINE_INDEX = 0
+
+
+@dataclasses.dataclass
+class EngineCapacity:
+    """
+    Data class for holding the resource capacity and the current resource usage for a Docker Engine.
+    - cpus: the number of CPUs available for the Docker Engine
+    - memory: the total memory, in bytes, available for the Docker Engine
+    - used_cpus: the number of CPUs reserved for the existing containers
+    - used_memory: the memory, in bytes, reserved for the existing containers
+    - core_usage: the number of containers pinned to each CPU core of the Docker Engine host
+    """
+    cpus: float
+    memory: int
+    used_cpus: float = 0.0
+    used_memory: int = 0
+    core_usage: List[int] = dataclasses.field(default_factory=list)
+
+    @property
+    def free_cpus(self) -> float:
+        """The number of CPUs that have not been reserved."""
+        return self.cpus - self.used_cpus
+
+    @property
+    def free_memory(self) -> int:
+        """The amount of memory, in bytes, that has not been reserved."""
+        return self.memory - self.used_memory
+
+    @property
+    def load(self) -> float:
+        """The relative load of the Docker Engine, i.e. the larger of the CPU and memory reservation ratios."""
+        cpu_load = self.used_cpus / self.cpus if self.cpus > 0 else 1.0
+        memory_load = self.used_memory / self.memory if self.memory > 0 else 1.0
+        return max(cpu_load, memory_load)
+
+    def fits(self, cpus: float, memory: int) -> bool:
+        """Returns True, if a container with the given resource demand fits to the Docker Engine."""
+        return cpus <= self.free_cpus and memory <= self.free_memory
+
+    def reserve(self, cpus: float, memory: int):
+        """Reserves the given resources from the Docker Engine."""
+        self.used_cpus += cpus
+        self.used_memory += memory
+
+    def pin(self, cores: List[int]):
+        """Marks the given CPU cores as used by one more container."""
+        for core in cores:
+            if 0 <= core < len(self.core_usage):
+                self.core_usage[core] += 1
+
+    def allocate_cores(self, core_count: int) -> List[int]:
+        """Allocates the given number of the least used CPU cores and returns the allocated core indexes."""
+        cores = sorted(
+            sorted(range(len(self.core_usage)), key=lambda core: (self.core_usage[core], core))[:core_count]
+        )
+        self.pin(cores)
+        return cores
+
+
+def parse_cpu_set(cpu_set: str) -> List[int]:
+    """Returns the CPU core indexes corresponding to the given Docker cpuset string, e.g. "0-2,5" -> [0, 1, 2, 5]."""
+    cores = []  # type: List[int]
+    for cpu_range in cpu_set.split(","):
+        if not cpu_range:
+            continue
+        range_start, _, range_end = cpu_range.partition("-")
+        try:
+            cores += list(range(int(range_start), int(range_end if range_end else range_start) + 1))
+        except ValueError:
+            LOGGER.warning("Ignoring invalid CPU range '{}' in CPU set '{}'".format(cpu_range, cpu_set))
+    return cores
+
+
+def format_cpu_set(cores: List[int]) -> str:
+    """Returns the given CPU core indexes as a Docker cpuset string."""
+    return ",".join(str(core) for core in sorted(cores))
+
+
+@dataclasses.dataclass
+class ContainerDemand:
+    """
+    Data class for holding the resource demand for a container that is to be placed.
+    - cpus: the number of CPUs the container is expected to use, None for the default demand
+    - memory: the amount of memory, in bytes, the container is expected to use, None for the default demand
+    - core_component: whether the container belongs to a core component that must be placed to the primary engine
+    """
+    cpus: Optional[float] = None
+    memory: Optional[int] = None
+    core_component: bool = False
+
+
+class ContainerScheduler:
+    """
+    Class for placing containers to Docker Engines using the first fit decreasing bin packing policy.
+    The core components are always placed to the primary Docker Engine which has access to the message bus network.
+    If a container does not fit to any Docker Engine, it is placed to the least loaded engine.
+    """
+    def __init__(self, default_cpus: float = DEFAULT_CONTAINER_CPUS, default_memory: int = DEFAULT_CONTAINER_MEMORY,
+                 primary_engine_index: int = PRIMARY_ENGINE_INDEX):
+        """
+        Sets up the scheduler.
+        - default_cpus: the CPU demand used for containers without a CPU hint
+        - default_memory: the memory demand, in bytes, used for containers without a memory hint
+        - primary_engine_index: the index for the Docker Engine that is used for the core components
+        """
+        self.__default_cpus = default_cpus
+        self.__default_memory = default_memory
+        self.__primary_engine_index = primary_engine_index
+
+    def get_demand(self, demand: ContainerDemand) -> Tuple[float, int]:
+        """Returns the CPU and memory demand for the given container with the defaults applied."""
+        return (
+            self.__default_cpus if demand.cpus is None else demand.cpus,
+            self.__default_memory if demand.memory is None else demand.memory
+        )
+
+    def place(self, demands: List[ContainerDemand], engines: List[EngineCapacity]) -> List[int]:
+        """
+        Returns the index of the Docker Engine for each of the given containers.
+        The resources for the placed containers are reserved from the given engine capacities.
+        """
+        if not engines:
+            raise ValueError("No Docker Engines available for placing the containers")
+        primary_engine_index = min(self.__primary_engine_index, len(engines) - 1)
+
+        placements = [primary_engine_index] * len(demands)
+        resource_demands = [self.get_demand(demand) for demand in demands]
+
+        # the core components are placed first to ensure that they are always placed to the primary engine
+        for container_index, demand in enumerate(demands):
+            if demand.core_component:
+                engines[primary_engine_index].reserve(*resource_demands[container_index])
+
+        # the other containers are placed in the order of decreasing resource demand
+        other_containers = sorted(
+            (container_index for container_index, demand in enumerate(demands) if not demand.core_component),
+            key=lambda container_index: resource_demands[container_index],
+            reverse=True
+        )
+        overcommitted_containers = 0
+        for container_index in other_containers:
+            cpus, memory = resource_demands[container_index]
+            engine_index = next(
+                (index for index, engine in enumerate(engines) if engine.fits(cpus, memory)),
+                None
+            )
+            if engine_index is None:
+                engine_index = min(range(len(engines)), key=lambda index: engines[index].load)
+                overcommitted_containers += 1
+
+            engines[engine_index].reserve(cpus, memory)
+            placements[container_index] = engine_index
+
+        if overcommitted_containers > 0:
+            LOGGER.warning("{} containers did not fit to any Docker Engine. ".format(overcommitted_containers) +
+                           "They were placed to the least loaded engines.")
+        return placements
+
+    def assign_cpu_sets(self, resources: List[ComponentResources], placements: List[int],
+                        engines: List[EngineCapacity]) -> List[Optional[str]]:
+        """
+        Returns the CPU set for each of the given containers according to their CPU affinity policies.
+        The containers with an explicit CPU set keep it and the containers with the dedicated policy
+        are pinned to the least used cores of the Docker Engine they have been placed to.
+        Returns None for containers that are not pinned to any CPU cores.
+        """
+        cpu_sets = []  # type: List[Optional[str]]
+        for container_resources, engine_index in zip(resources, placements):
+            engine = engines[engine_index]
+            if container_resources.cpu_set is not None:
+                engine.pin(parse_cpu_set(container_resources.cpu_set))
+                cpu_sets.append(container_resources.cpu_set)
+
+            elif container_resources.cpu_affinity == CPU_AFFINITY_DEDICATED and engine.core_usage:
+                cpus = self.__default_cpus if container_resources.cpus is None else container_resources.cpus
+                core_count = min(max(1, math.ceil(cpus)), len(engine.core_usage))
+                cpu_sets.append(format_cpu_set(engine.allocate_cores(core_count)))
+
+            else:
+                cpu_sets.append(None)
+
+        return cpu_sets
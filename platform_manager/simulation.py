@@ -43,6 +43,9 @@ SIMULATION_DESCRIPTION_FOR_MANAGER = "SimulationDescription"
 
 # The special attribute that can be used to create multiple identical components for the simulation
 DUPLICATION_COUNT = "duplication_count"
+# The special attribute that can be used to override the resource limits given in the component manifest
+RESOURCES = "resources"
+SPECIAL_ATTRIBUTES = (DUPLICATION_COUNT, RESOURCES)
 
 DUPLICATE_CONTAINER_NAME_SEPARATOR = "_"
 
@@ -62,9 +65,12 @@ class SimulationComponentConfiguration:
     Data class for holding the parameters for one (either dynamic or static) component.
     - duplication_count: how many identical duplicates will be participating in the simulation run, default is 1
     - attributes: a dictionary containing the attribute names and values for the component
+    - resources: the resource limits that override the limits given in the component manifest,
+                 uses the same format as the Resources attribute in the component manifest
     """
     duplication_count: int = 1
     attributes: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    resources: Optional[Dict[str, Any]] = None
 
 
 @dataclasses.dataclass
@@ -129,8 +135,12 @@ def load_simulation_parameters_from_yaml(yaml_filename: str) -> Optional[Simulat
                                 {}.items() if component_attributes is None
                                 else component_attributes.items()
                             )
-                            if attribute_name != DUPLICATION_COUNT
-                        }
+                            if attribute_name not in SPECIAL_ATTRIBUTES
+                        },
+                        resources=(
+                            None if component_attributes is None
+                            else component_attributes.get(RESOURCES, None)
+                        )
                     )
                     for component_name, component_attributes in (
                         {}.items() if component_type_processes is None
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for following a running simulation through the simulation specific exchange
+and for removing the simulation containers as soon as the simulation has finished.
+"""
+
+import asyncio
+import pathlib
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from tools.clients import RabbitmqClient
+from tools.components import (
+    SIMULATION_STATE_MESSAGE_TOPIC, SIMULATION_EPOCH_MESSAGE_TOPIC,
+    SIMULATION_STATUS_MESSAGE_TOPIC, SIMULATION_ERROR_MESSAGE_TOPIC)
+from tools.messages import EpochMessage, SimulationStateMessage, StatusMessage
+from tools.tools import FullLogger, async_wrap
+
+from platform_manager.docker_runner import ContainerStarter
+from platform_manager.epoch_statistics import EpochLatencyCollector
+from platform_manager.resource_usage import ResourceUsageSampler
+
+LOGGER = FullLogger(__name__)
+
+SIMULATION_STATE_RUNNING = "running"
+SIMULATION_STATE_STOPPED = "stopped"
+STATUS_VALUE_READY = "ready"
+STATUS_VALUE_ERROR = "error"
+
+# the simulation state used by the monitor before any simulation state message has been received
+SIMULATION_STATE_STARTING = "starting"
+# the epoch number used by the components for the ready messages sent after receiving the Start message
+INITIALIZATION_EPOCH = 0
+
+
+class SimulationMonitor:
+    """
+    Class for following the state and the epoch progress of a running simulation.
+    The simulation containers are stopped and removed when the simulation has stopped, when any component
+    has reported an error or when no messages have been received within the inactivity timeout.
+    """
+    def __init__(self, simulation_id: str, container_names: List[str], container_starter: ContainerStarter,
+                 rabbitmq_parameters: Dict[str, Any], topics: Dict[str, str],
+                 inactivity_timeout: float = 0.0, stop_timeout: Optional[int] = None,
+                 statistics_filename: Optional[pathlib.Path] = None,
+                 rabbitmq_client: Optional[RabbitmqClient] = None,
+                 resource_sampler: Optional[ResourceUsageSampler] = None,
+                 resource_usage_filename: Optional[pathlib.Path] = None):
+        """
+        Sets up the monitor.
+        - simulation_id: the simulation id for the monitored simulation
+        - container_names: the names of the simulation containers that are removed after the simulation
+        - container_starter: the container starter that was used to start the simulation containers
+        - rabbitmq_parameters: the keyword arguments for the client for the simulation specific exchange
+        - topics: the simulation specific topic names using the environment variable names as keys
+        - inactivity_timeout: the time in seconds without any messages after which the simulation is considered
+                              to have crashed, value 0 disables the timeout
+        - stop_timeout: the time in seconds the containers are given to stop before they are killed
+        - statistics_filename: the file to which the epoch latency statistics are stored after the simulation
+        - rabbitmq_client: the client for the simulation specific exchange, if None, a new client is created
+        - resource_sampler: the sampler for the resource usage of the simulation containers, if None,
+                            the resource usage is not sampled
+        - resource_usage_filename: the file to which the resource usage summary is stored after the simulation
+        """
+        self.__simulation_id = simulation_id
+        self.__container_names = list(container_names)
+        self.__container_starter = container_starter
+        self.__rabbitmq_parameters = rabbitmq_parameters
+        self.__inactivity_timeout = inactivity_timeout
+        self.__stop_timeout = stop_timeout
+        self.__statistics_filename = statistics_filename
+        self.__rabbitmq_client = rabbitmq_client
+        self.__epoch_statistics = EpochLatencyCollector(simulation_id)
+        self.__resource_sampler = resource_sampler
+        self.__resource_usage_filename = resource_usage_filename
+
+        self.__state_topic = topics[SIMULATION_STATE_MESSAGE_TOPIC]
+        self.__epoch_topic = topics[SIMULATION_EPOCH_MESSAGE_TOPIC]
+        self.__status_topic = topics[SIMULATION_STATUS_MESSAGE_TOPIC]
+        self.__error_topic = topics[SIMULATION_ERROR_MESSAGE_TOPIC]
+
+        self.__simulation_state = SIMULATION_STATE_STARTING
+        self.__epoch_number = 0
+        self.__epoch_start_time = time.perf_counter()
+        self.__ready_components = {}  # type: Dict[int, Set[str]]
+        self.__error_components = set()  # type: Set[str]
+        self.__latest_message_time = time.perf_counter()
+
+        self.__finished = asyncio.Event()
+        self.__teardown_task = None  # type: Optional[asyncio.Task]
+        self.__timeout_task = None  # type: Optional[asyncio.Task]
+        self.__containers_removed = False
+
+    @property
+    def simulation_id(self) -> str:
+        """The simulation id for the monitored simulation."""
+        return self.__simulation_id
+
+    @property
+    def simulation_state(self) -> str:
+        """The latest known state of the simulation."""
+        return self.__simulation_state
+
+    @property
+    def epoch_number(self) -> int:
+        """The number of the latest started epoch."""
+        return self.__epoch_number
+
+    @property
+    def error_components(self) -> Set[str]:
+        """The names of the components that have reported an error."""
+        return self.__error_components
+
+    @property
+    def epoch_statistics(self) -> EpochLatencyCollector:
+        """The ready message latencies for the components of the simulation."""
+        return self.__epoch_statistics
+
+    @property
+    def containers_removed(self) -> bool:
+        """Returns True, if all the simulation containers have been removed."""
+        return self.__containers_removed
+
+    @property
+    def is_finished(self) -> bool:
+        """Returns True, if the simulation has finished and the teardown has been done."""
+        return self.__finished.is_set()
+
+    def get_ready_components(self, epoch_number: int) -> Set[str]:
+        """Returns the names of the components that have reported ready for the given epoch."""
+        return self.__ready_components.get(epoch_number, set())
+
+    async def start(self):
+        """Starts listening to the simulation specific exchange. Should be called before sending the Start message."""
+        if self.__rabbitmq_client is None:
+            self.__rabbitmq_client = RabbitmqClient(**self.__rabbitmq_parameters)
+
+        self.__rabbitmq_client.add_listener(
+            [self.__state_topic, self.__epoch_topic, self.__status_topic, self.__error_topic],
+            self.__handle_message
+        )
+        self.__latest_message_time = time.perf_counter()
+        # the initialization epoch starts when the Start message is sent right after the monitor has been started
+        self.__epoch_statistics.record_epoch(INITIALIZATION_EPOCH, self.__latest_message_time)
+        if self.__inactivity_timeout > 0:
+            self.__timeout_task = asyncio.create_task(self.__check_inactivity())
+        if self.__resource_sampler is not None:
+            self.__resource_sampler.start()
+        LOGGER.info("Monitoring simulation: {}".format(self.__simulation_id))
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        Waits until the simulation has finished and the containers have been removed or until the timeout.
+        Returns True, if the simulation finished before the timeout.
+        """
+        try:
+            await asyncio.wait_for(self.__finished.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def stop(self):
+        """Stops the monitoring without removing the containers."""
+        if self.__timeout_task is not None:
+            self.__timeout_task.cancel()
+            self.__timeout_task = None
+        if self.__resource_sampler is not None:
+            await self.__resource_sampler.stop()
+        if self.__rabbitmq_client is not None:
+            await self.__rabbitmq_client.close()
+            self.__rabbitmq_client = None
+
+    async def __handle_message(self, message_object: Any, message_routing_key: str):
+        """Handles a message received from the simulation specific exchange."""
+        self.__latest_message_time = time.perf_counter()
+
+        if isinstance(message_object, SimulationStateMessage):
+            await self.__handle_simulation_state(message_object)
+        elif isinstance(message_object, EpochMessage):
+            self.__handle_epoch(message_object)
+        elif isinstance(message_object, StatusMessage):
+            await self.__handle_status(message_object)
+        else:
+            LOGGER.debug("Ignoring message with topic '{}': {}".format(message_routing_key, message_object))
+
+    async def __handle_simulation_state(self, message_object: SimulationStateMessage):
+        """Handles a simulation state message."""
+        self.__simulation_state = message_object.simulation_state
+        LOGGER.info("Simulation {} state: {}".format(self.__simulation_id, self.__simulation_state))
+        if self.__simulation_state == SIMULATION_STATE_STOPPED:
+            self.__start_teardown("the simulation has stopped")
+
+    def __handle_epoch(self, message_object: EpochMessage):
+        """Handles an epoch message. The first message for each epoch starts a new epoch."""
+        current_time = time.perf_counter()
+        self.__epoch_statistics.record_epoch(message_object.epoch_number, current_time)
+        if message_object.epoch_number <= self.__epoch_number:
+            return
+
+        if self.__epoch_number > 0:
+            LOGGER.info("Simulation {}: epoch {} took {:.3f} s with {} ready components".format(
+                self.__simulation_id, self.__epoch_number, current_time - self.__epoch_start_time,
+                len(self.get_ready_components(self.__epoch_number))))
+        self.__epoch_number = message_object.epoch_number
+        self.__epoch_start_time = current_time
+
+    async def __handle_status(self, message_object: StatusMessage):
+        """Handles a status message. Any error message starts the teardown of the simulation."""
+        component_name = message_object.source_process_id
+        if message_object.value == STATUS_VALUE_READY:
+            self.__ready_components.setdefault(message_object.epoch_number, set()).add(component_name)
+            self.__epoch_statistics.record_ready(component_name, message_object.epoch_number, time.perf_counter())
+
+        elif message_object.value == STATUS_VALUE_ERROR:
+            self.__error_components.add(component_name)
+            LOGGER.warning("Component '{}' reported an error in epoch {} of simulation {}".format(
+                component_name, message_object.epoch_number, self.__simulation_id))
+            self.__start_teardown("component '{}' reported an error".format(component_name))
+
+    async def __check_inactivity(self):
+        """Starts the teardown if no messages have been received within the inactivity timeout."""
+        while not self.__finished.is_set():
+            waited_time = time.perf_counter() - self.__latest_message_time
+            if waited_time >= self.__inactivity_timeout:
+                self.__start_teardown("no messages received in {:.1f} seconds".format(waited_time))
+                return
+            await asyncio.sleep(self.__inactivity_timeout - waited_time)
+
+    def __start_teardown(self, reason: str):
+        """Starts the removal of the simulation containers unless it has already been started."""
+        if self.__teardown_task is None:
+            LOGGER.info("Removing the containers for simulation {} since {}.".format(self.__simulation_id, reason))
+            self.__teardown_task = asyncio.create_task(self.__teardown())
+
+    async def __teardown(self):
+        """Stops the monitoring and removes the simulation containers."""
+        try:
+            await self.stop()
+            await self.__store_epoch_statistics()
+            await self.__store_resource_usage()
+            self.__containers_removed = await self.__container_starter.stop_containers(
+                self.__container_names, self.__stop_timeout)
+            if self.__containers_removed:
+                LOGGER.info("Removed all {} containers for simulation {}".format(
+                    len(self.__container_names), self.__simulation_id))
+            else:
+                LOGGER.warning("Could not remove all the containers for simulation {}".format(self.__simulation_id))
+        finally:
+            self.__finished.set()
+
+    async def __store_epoch_statistics(self):
+        """Stores the epoch latency statistics to a file and logs the worst stragglers."""
+        if self.__epoch_statistics.epoch_count > 0:
+            LOGGER.info("Simulation {} stragglers: {}".format(
+                self.__simulation_id, self.__epoch_statistics.get_summary() or "-"))
+        if self.__statistics_filename is not None:
+            if await async_wrap(self.__epoch_statistics.store)(self.__statistics_filename):
+                LOGGER.info("Epoch statistics stored to '{}'".format(self.__statistics_filename))
+
+    async def __store_resource_usage(self):
+        """Stores the resource usage summary for the simulation containers to a file."""
+        if self.__resource_sampler is None or self.__resource_usage_filename is None:
+            return
+        if self.__resource_sampler.sample_count == 0:
+            LOGGER.warning("No resource usage samples collected for simulation {}".format(self.__simulation_id))
+        if await async_wrap(self.__resource_sampler.store)(self.__resource_usage_filename):
+            LOGGER.info("Resource usage stored to '{}'".format(self.__resource_usage_filename))
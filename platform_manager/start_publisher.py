@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for declaring the simulation specific exchange before the simulation
+components are started and for publishing the Start messages with publisher confirms.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, cast, Dict, Optional, Tuple
+
+import aio_pika
+from aio_pika.exceptions import AMQPError
+
+from tools.clients import RabbitmqClient
+from tools.tools import FullLogger, EnvironmentVariableValue
+
+from platform_manager.message_encoding import encode_message_body
+from platform_manager.platform_environment import (
+    RABBITMQ_EXCHANGE, RABBITMQ_EXCHANGE_AUTODELETE, RABBITMQ_EXCHANGE_DURABLE, RABBITMQ_HOST, RABBITMQ_PORT)
+
+LOGGER = FullLogger(__name__)
+
+RABBITMQ_LOGIN = "RABBITMQ_LOGIN"
+RABBITMQ_PASSWORD = "RABBITMQ_PASSWORD"
+RABBITMQ_SSL = "RABBITMQ_SSL"
+
+DEFAULT_CONFIRM_TIMEOUT = 10.0
+
+PUBLISH_ERRORS = (AMQPError, OSError, asyncio.TimeoutError)
+
+
+BrokerAddress = Tuple[str, int]
+
+
+def get_broker_address(rabbitmq_parameters: Dict[str, EnvironmentVariableValue]) -> BrokerAddress:
+    """Returns the host name and the port for the broker described by the given RabbitMQ parameters."""
+    return cast(str, rabbitmq_parameters[RABBITMQ_HOST]), cast(int, rabbitmq_parameters[RABBITMQ_PORT])
+
+
+class StartMessagePublisher:
+    """
+    Class for publishing the Start messages to the management exchange using a persistent channel with
+    publisher confirms. The simulation specific exchanges are declared using persistent channels before
+    the simulation components are started, so that the components do not need to race creating the exchange.
+    If the message bus cannot be reached using the persistent connection, the Start message is sent using
+    the fallback client without a delivery confirmation.
+    """
+    def __init__(self, rabbitmq_parameters: Dict[str, EnvironmentVariableValue], fallback_client: RabbitmqClient,
+                 confirm_timeout: float = DEFAULT_CONFIRM_TIMEOUT,
+                 connection_factory: Optional[Callable[..., Awaitable[Any]]] = None):
+        """
+        Sets up the publisher. The connections are opened when they are first needed.
+        - rabbitmq_parameters: the RabbitMQ parameters for the management exchange using the environment
+                               variable names as keys
+        - fallback_client: the client used to send the Start message if the persistent connection cannot be used
+        - confirm_timeout: the time in seconds to wait for the connection, the declarations and the confirmations
+        - connection_factory: the coroutine function used to open the connections, aio_pika.connect_robust by default
+        """
+        self.__rabbitmq_parameters = rabbitmq_parameters
+        self.__fallback_client = fallback_client
+        self.__confirm_timeout = confirm_timeout
+        self.__connection_factory = aio_pika.connect_robust if connection_factory is None else connection_factory
+
+        # the connections and the channels for each used broker, the simulation specific exchanges
+        # can be located in different brokers than the management exchange
+        self.__connections = {}  # type: Dict[BrokerAddress, Any]
+        self.__channels = {}  # type: Dict[BrokerAddress, Any]
+        self.__management_exchange = None  # type: Optional[Any]
+        self.__connection_lock = asyncio.Lock()
+
+    @property
+    def is_connected(self) -> bool:
+        """Returns True, if the persistent channel to the management exchange is open."""
+        return self.__management_exchange is not None and self.__is_open(get_broker_address(self.__rabbitmq_parameters))
+
+    async def connect(self) -> bool:
+        """
+        Opens the persistent connection and the channel with publisher confirms and declares the management exchange.
+        Returns True, if the channel is ready for publishing.
+        """
+        if self.is_connected:
+            return True
+
+        channel = await self.__get_channel(self.__rabbitmq_parameters)
+        if channel is None:
+            return False
+
+        try:
+            self.__management_exchange = await self.__declare_exchange(channel, self.__rabbitmq_parameters)
+            return True
+
+        except PUBLISH_ERRORS as error:
+            LOGGER.warning("Received {} when declaring the management exchange: {}".format(type(error).__name__, error))
+            return False
+
+    async def declare_simulation_exchange(self,
+                                          simulation_rabbitmq_parameters: Dict[str, EnvironmentVariableValue]) -> bool:
+        """
+        Declares the simulation specific exchange using the same broker and the same exchange parameters as
+        the simulation components. Returns True, if the exchange was declared successfully.
+        """
+        channel = await self.__get_channel(simulation_rabbitmq_parameters)
+        if channel is None:
+            return False
+
+        try:
+            await self.__declare_exchange(channel, simulation_rabbitmq_parameters)
+            LOGGER.debug("Declared exchange '{}' in {}:{}".format(
+                simulation_rabbitmq_parameters[RABBITMQ_EXCHANGE], *get_broker_address(simulation_rabbitmq_parameters)))
+            return True
+
+        except PUBLISH_ERRORS as error:
+            LOGGER.warning("Received {} when declaring the exchange '{}': {}".format(
+                type(error).__name__, simulation_rabbitmq_parameters[RABBITMQ_EXCHANGE], error))
+            return False
+
+    async def publish(self, topic_name: str, message_bytes: bytes,
+                      content_encoding: Optional[str] = None) -> Optional[float]:
+        """
+        Publishes the given message to the management exchange and waits for the broker confirmation.
+        Returns the time in seconds from the publish to the confirmation, or None if the message was sent
+        without a confirmation using the fallback client.
+        The fallback client is only used if the connection or the exchange declaration failed. If the message
+        was already published but the confirmation failed or timed out, the error (one of PUBLISH_ERRORS) is
+        raised instead, since the broker may have received the message and resending it could duplicate it.
+        - topic_name: the topic name for the message
+        - message_bytes: the uncompressed message payload
+        - content_encoding: the compression for the payload, signalled using the content encoding property,
+                            the fallback client always sends the uncompressed payload
+        """
+        if not await self.connect() or self.__management_exchange is None:
+            LOGGER.warning("Sending the message to topic '{}' without a delivery confirmation.".format(topic_name))
+            await self.__fallback_client.send_message(topic_name=topic_name, message_bytes=message_bytes)
+            return None
+
+        message_body = encode_message_body(message_bytes, content_encoding)
+        publish_start = time.perf_counter()
+        await self.__management_exchange.publish(
+            aio_pika.Message(body=message_body, content_encoding=content_encoding or None),
+            routing_key=topic_name,
+            mandatory=False,
+            timeout=self.__confirm_timeout
+        )
+        return time.perf_counter() - publish_start
+
+    async def close(self):
+        """Closes all the persistent connections."""
+        async with self.__connection_lock:
+            for broker_address in list(self.__connections):
+                await self.__close_connection(broker_address)
+
+    def __is_open(self, broker_address: BrokerAddress) -> bool:
+        """Returns True, if the channel to the given broker is open."""
+        channel = self.__channels.get(broker_address, None)
+        return channel is not None and not channel.is_closed
+
+    async def __get_channel(self, rabbitmq_parameters: Dict[str, EnvironmentVariableValue]) -> Optional[Any]:
+        """
+        Returns an open channel with publisher confirms to the broker described by the given RabbitMQ parameters.
+        The login credentials from the management exchange parameters are used for all brokers.
+        Returns None, if the connection could not be opened.
+        """
+        broker_address = get_broker_address(rabbitmq_parameters)
+        async with self.__connection_lock:
+            if self.__is_open(broker_address):
+                return self.__channels[broker_address]
+
+            await self.__close_connection(broker_address)
+            try:
+                connection = await self.__connection_factory(
+                    host=broker_address[0],
+                    port=broker_address[1],
+                    login=cast(str, self.__rabbitmq_parameters[RABBITMQ_LOGIN]),
+                    password=cast(str, self.__rabbitmq_parameters[RABBITMQ_PASSWORD]),
+                    ssl=cast(bool, self.__rabbitmq_parameters[RABBITMQ_SSL]),
+                    timeout=self.__confirm_timeout
+                )
+                self.__connections[broker_address] = connection
+                self.__channels[broker_address] = await connection.channel(publisher_confirms=True)
+                return self.__channels[broker_address]
+
+            except PUBLISH_ERRORS as error:
+                LOGGER.warning("Received {} when connecting to the message bus at {}:{}: {}".format(
+                    type(error).__name__, *broker_address, error))
+                await self.__close_connection(broker_address)
+                return None
+
+    async def __declare_exchange(self, channel: Any, rabbitmq_parameters: Dict[str, EnvironmentVariableValue]) -> Any:
+        """Declares the topic exchange described by the given RabbitMQ parameters using the given channel."""
+        return await channel.declare_exchange(
+            name=cast(str, rabbitmq_parameters[RABBITMQ_EXCHANGE]),
+            type=aio_pika.ExchangeType.TOPIC,
+            durable=cast(bool, rabbitmq_parameters[RABBITMQ_EXCHANGE_DURABLE]),
+            auto_delete=cast(bool, rabbitmq_parameters[RABBITMQ_EXCHANGE_AUTODELETE]),
+            timeout=self.__confirm_timeout
+        )
+
+    async def __close_connection(self, broker_address: BrokerAddress):
+        """Closes the connection to the given broker without acquiring the connection lock."""
+        connection = self.__connections.pop(broker_address, None)
+        self.__channels.pop(broker_address, None)
+        if broker_address == get_broker_address(self.__rabbitmq_parameters):
+            self.__management_exchange = None
+        if connection is not None:
+            try:
+                await connection.close()
+            except PUBLISH_ERRORS as error:
+                LOGGER.debug("Received {} when closing the connection: {}".format(type(error).__name__, error))
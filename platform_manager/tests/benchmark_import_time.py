@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+Benchmark for the cold start import time of the platform manager entry point.
+
+Each repeat imports the module in a new Python interpreter using the -X importtime option and
+reports the cumulative import time of the module and the heaviest top level packages.
+
+Usage example:
+    python -m platform_manager.tests.benchmark_import_time --repeats 5 --top 10
+"""
+
+import argparse
+import dataclasses
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_MODULE = "platform_manager.platform_manager"
+DEFAULT_REPEATS = 5
+DEFAULT_TOP_COUNT = 10
+
+# the format of the lines written by the -X importtime option:
+# import time: <self time in us> | <cumulative time in us> | <indentation><module name>
+IMPORT_TIME_PATTERN = re.compile(r"^import time:\s+([0-9]+) \|\s+([0-9]+) \| (\s*)(\S+)\s*$")
+MICROSECONDS_IN_MILLISECOND = 1000
+
+
+@dataclasses.dataclass
+class ImportTimeResult:
+    """
+    Data class for holding the result of one import of the benchmarked module.
+    - cumulative_time: the cumulative import time of the module in microseconds
+    - process_time: the wall time of the whole interpreter process in seconds
+    - package_times: the sum of the self import times in microseconds for each top level package
+    """
+    cumulative_time: int
+    process_time: float
+    package_times: Dict[str, int]
+
+
+def parse_import_times(import_time_output: str, module_name: str) -> Optional[ImportTimeResult]:
+    """Parses the output of the -X importtime option. Returns None, if the module was not imported."""
+    cumulative_time = None  # type: Optional[int]
+    package_times = {}  # type: Dict[str, int]
+    for line in import_time_output.splitlines():
+        line_match = IMPORT_TIME_PATTERN.match(line)
+        if line_match is None:
+            continue
+
+        self_time, module_cumulative_time, _, imported_module = line_match.groups()
+        package_name = imported_module.split(".")[0]
+        package_times[package_name] = package_times.get(package_name, 0) + int(self_time)
+        if imported_module == module_name:
+            cumulative_time = int(module_cumulative_time)
+
+    if cumulative_time is None:
+        return None
+    return ImportTimeResult(cumulative_time=cumulative_time, process_time=0.0, package_times=package_times)
+
+
+def measure_import_time(module_name: str) -> ImportTimeResult:
+    """Imports the given module in a new Python interpreter and returns the measured import times."""
+    start_time = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import {}".format(module_name)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        check=False
+    )
+    process_time = time.perf_counter() - start_time
+
+    result = parse_import_times(process.stderr, module_name)
+    if process.returncode != 0 or result is None:
+        raise RuntimeError("Importing module '{}' failed:\n{}".format(module_name, process.stderr[-2000:]))
+    result.process_time = process_time
+    return result
+
+
+def print_results(module_name: str, results: List[ImportTimeResult], top_count: int):
+    """Prints the median import times and the heaviest top level packages."""
+    print("Module: {} ({} repeats)".format(module_name, len(results)))
+    print("    cumulative import time: {:.1f} ms (min {:.1f} ms, max {:.1f} ms)".format(
+        statistics.median(result.cumulative_time for result in results) / MICROSECONDS_IN_MILLISECOND,
+        min(result.cumulative_time for result in results) / MICROSECONDS_IN_MILLISECOND,
+        max(result.cumulative_time for result in results) / MICROSECONDS_IN_MILLISECOND))
+    print("    interpreter process time: {:.1f} ms".format(
+        statistics.median(result.process_time for result in results) * MICROSECONDS_IN_MILLISECOND))
+
+    package_names = {package_name for result in results for package_name in result.package_times}
+    median_package_times = {
+        package_name: statistics.median(result.package_times.get(package_name, 0) for result in results)
+        for package_name in package_names
+    }
+    print("{:>30} {:>12}".format("package", "self (ms)"))
+    for package_name in sorted(median_package_times, key=median_package_times.__getitem__, reverse=True)[:top_count]:
+        print("{:>30} {:>12.1f}".format(package_name, median_package_times[package_name] / MICROSECONDS_IN_MILLISECOND))
+
+
+def main():
+    """Parses the command line arguments and runs the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark for the import time of the platform manager.")
+    parser.add_argument("--module", type=str, default=DEFAULT_MODULE, help="the module to import")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="the number of imports")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP_COUNT,
+                        help="the number of the heaviest top level packages to show")
+    parser.add_argument("--json", type=str, default=None, help="a file to which the results are written")
+    arguments = parser.parse_args()
+
+    results = [measure_import_time(arguments.module) for _ in range(arguments.repeats)]
+    print_results(arguments.module, results, arguments.top)
+
+    if arguments.json:
+        with open(arguments.json, mode="w", encoding="UTF-8") as json_file:
+            json.dump(
+                {
+                    "module": arguments.module,
+                    "results": [dataclasses.asdict(result) for result in results]
+                },
+                json_file,
+                indent=4
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+Benchmark for starting simulations with the platform manager using a fake Docker Engine and a fake message bus.
+
+The benchmark generates simulation configurations with the given numbers of domain components and
+measures the launch latency, the component throughput and the peak memory usage of the launch.
+
+Usage example:
+    python -m platform_manager.tests.benchmark_start_simulation --sizes 10 100 1000 --latency create=0.01
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+from platform_manager.docker_runner import ContainerStarter
+from platform_manager.platform_manager import PlatformManager
+from platform_manager.tests.fake_docker import FakeDockerEngine
+from platform_manager.tests.fake_rabbitmq import FakeRabbitmqClient
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+BENCHMARK_COMPONENT_TYPE = "BenchmarkComponent"
+
+MANIFESTS = {
+    "SimulationManager": "\n".join([
+        "Name: SimulationManager",
+        "Type: platform",
+        "DockerImage: ghcr.io/simcesplatform/simulation-manager:latest",
+        "Attributes:",
+        "    ManagerName:",
+        "        Optional: true",
+        "        Default: SimulationManager"
+    ]),
+    "LogWriter": "\n".join([
+        "Name: LogWriter",
+        "Type: platform",
+        "DockerImage: ghcr.io/simcesplatform/logwriter:latest"
+    ]),
+    BENCHMARK_COMPONENT_TYPE: "\n".join([
+        "Name: {}".format(BENCHMARK_COMPONENT_TYPE),
+        "Type: platform",
+        "DockerImage: ghcr.io/simcesplatform/benchmark-component:latest",
+        "Attributes:",
+        "    RequiredValue:",
+        "        Environment: REQUIRED_VALUE",
+        "    OptionalValue:",
+        "        Optional: true",
+        "        Default: 1.5"
+    ])
+}
+
+BENCHMARK_ENVIRONMENT = {
+    "DOCKER_NETWORK_PLATFORM": "benchmark_platform_network",
+    "DOCKER_NETWORK_RABBITMQ": "benchmark_rabbitmq_network",
+    "DOCKER_NETWORK_MONGODB": "benchmark_mongodb_network",
+    "DOCKER_VOLUME_NAME_RESOURCES": "benchmark_resources",
+    "DOCKER_VOLUME_NAME_LOGS": "benchmark_logs",
+    "DOCKER_VOLUME_TARGET_RESOURCES": "/resources",
+    "DOCKER_VOLUME_TARGET_LOGS": "/logs",
+    # the benchmark uses a fake message bus client, so the persistent publisher connection is not used
+    "START_MESSAGE_CONFIRMS": "false"
+}
+
+
+@dataclasses.dataclass
+class BenchmarkResult:
+    """
+    Data class for holding the result of one benchmark scenario.
+    - component_count: the number of domain components in the simulation configuration
+    - container_count: the number of created containers, including the core components
+    - launch_latencies: the launch times in seconds for each repeat
+    - peak_memory: the peak amount of memory in bytes allocated by Python during a launch
+    - max_rss: the maximum resident set size of the benchmark process in bytes after the scenario
+    """
+    component_count: int
+    container_count: int
+    launch_latencies: List[float]
+    peak_memory: Optional[int]
+    max_rss: int
+
+    @property
+    def mean_latency(self) -> float:
+        """The mean launch latency in seconds."""
+        return sum(self.launch_latencies) / len(self.launch_latencies)
+
+    @property
+    def throughput(self) -> float:
+        """The number of started containers per second."""
+        return self.container_count / self.mean_latency if self.mean_latency > 0 else 0.0
+
+
+def write_manifests(manifest_folder: pathlib.Path):
+    """Writes the component manifests used in the benchmark to the given folder."""
+    for component_type, manifest in MANIFESTS.items():
+        (manifest_folder / "{}.yml".format(component_type)).write_text(manifest + "\n", encoding="UTF-8")
+
+
+def write_simulation_configuration(filename: pathlib.Path, component_count: int):
+    """Writes a simulation configuration with the given number of domain components to the given file."""
+    lines = [
+        "Simulation:",
+        "    Name: \"Benchmark simulation with {} components\"".format(component_count),
+        "    Description: \"Generated benchmark simulation\"",
+        "    InitialStartTime: \"2020-01-01T00:00:00.000Z\"",
+        "    EpochLength: 3600",
+        "    MaxEpochCount: 24",
+        "",
+        "Components:",
+        "    {}:".format(BENCHMARK_COMPONENT_TYPE)
+    ]
+    for component_index in range(1, component_count + 1):
+        lines += [
+            "        component_{:05d}:".format(component_index),
+            "            RequiredValue: {}".format(component_index)
+        ]
+    filename.write_text("\n".join(lines) + "\n", encoding="UTF-8")
+
+
+def setup_environment(work_folder: pathlib.Path) -> pathlib.Path:
+    """Sets up the environment variables and the manifest folder for the benchmark. Returns the manifest folder."""
+    manifest_folder = work_folder / "manifests"
+    manifest_folder.mkdir()
+    write_manifests(manifest_folder)
+
+    os.environ.update(BENCHMARK_ENVIRONMENT)
+    os.environ["MANIFEST_FOLDER"] = str(manifest_folder)
+    os.environ["START_MESSAGE_FOLDER"] = str(work_folder / "start")
+    return manifest_folder
+
+
+async def run_scenario(work_folder: pathlib.Path, component_count: int, repeats: int,
+                       latencies: Dict[str, float], measure_memory: bool, engine_count: int = 1) -> BenchmarkResult:
+    """Runs the benchmark scenario with the given number of domain components and fake Docker Engines."""
+    configuration_file = work_folder / "simulation_{}.yml".format(component_count)
+    write_simulation_configuration(configuration_file, component_count)
+
+    launch_latencies = []  # type: List[float]
+    peak_memory = None  # type: Optional[int]
+    container_count = 0
+    for _ in range(repeats):
+        # each launch uses fresh fake Docker Engines so that the simulation indexes do not run out
+        docker_engines = [FakeDockerEngine(latencies=latencies) for _ in range(engine_count)]
+        for docker_engine in docker_engines:
+            await docker_engine.start()
+        try:
+            platform_manager = PlatformManager(
+                rabbitmq_client=FakeRabbitmqClient(),  # type: ignore
+                container_starter=ContainerStarter(docker_url=[docker_engine.url for docker_engine in docker_engines])
+            )
+
+            if measure_memory:
+                tracemalloc.start()
+            start_time = time.perf_counter()
+            start_check = await platform_manager.start_simulation(str(configuration_file))
+            launch_latencies.append(time.perf_counter() - start_time)
+            if measure_memory:
+                _, launch_peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                peak_memory = launch_peak if peak_memory is None else max(peak_memory, launch_peak)
+
+            await platform_manager.stop()
+            if not start_check:
+                raise RuntimeError("Starting the simulation with {} components failed".format(component_count))
+            container_count = sum(len(docker_engine.containers) for docker_engine in docker_engines)
+
+        finally:
+            for docker_engine in docker_engines:
+                await docker_engine.stop()
+
+    return BenchmarkResult(
+        component_count=component_count,
+        container_count=container_count,
+        launch_latencies=launch_latencies,
+        peak_memory=peak_memory,
+        # on Linux the maximum resident set size is given in kilobytes
+        max_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    )
+
+
+def parse_latencies(latency_arguments: List[str]) -> Dict[str, float]:
+    """Parses the latency arguments given in format <operation>=<seconds>."""
+    latencies = {}
+    for latency_argument in latency_arguments:
+        operation, _, latency = latency_argument.partition("=")
+        latencies[operation] = float(latency)
+    return latencies
+
+
+def print_results(results: List[BenchmarkResult]):
+    """Prints the benchmark results as a table."""
+    print("{:>10} {:>10} {:>12} {:>14} {:>14} {:>12}".format(
+        "components", "containers", "latency (s)", "containers/s", "peak mem (MB)", "max rss (MB)"))
+    for result in results:
+        print("{:>10} {:>10} {:>12.3f} {:>14.1f} {:>14} {:>12.1f}".format(
+            result.component_count,
+            result.container_count,
+            result.mean_latency,
+            result.throughput,
+            "-" if result.peak_memory is None else "{:.1f}".format(result.peak_memory / 1024 ** 2),
+            result.max_rss / 1024 ** 2
+        ))
+
+
+async def start_benchmark(arguments: argparse.Namespace):
+    """Runs the benchmark scenarios."""
+    latencies = parse_latencies(arguments.latency)
+    with tempfile.TemporaryDirectory() as work_directory:
+        work_folder = pathlib.Path(work_directory)
+        setup_environment(work_folder)
+
+        results = []
+        for component_count in arguments.sizes:
+            results.append(
+                await run_scenario(
+                    work_folder, component_count, arguments.repeats, latencies, not arguments.no_memory,
+                    arguments.engines)
+            )
+
+    print_results(results)
+    if arguments.json:
+        with open(arguments.json, mode="w", encoding="UTF-8") as json_file:
+            json.dump(
+                [
+                    {
+                        **dataclasses.asdict(result),
+                        "mean_latency": result.mean_latency,
+                        "throughput": result.throughput
+                    }
+                    for result in results
+                ],
+                json_file,
+                indent=4
+            )
+
+
+def main():
+    """Parses the command line arguments and runs the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark for starting simulations with the platform manager.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="the numbers of domain components in the generated simulations")
+    parser.add_argument("--repeats", type=int, default=1, help="the number of launches for each size")
+    parser.add_argument("--latency", nargs="*", default=[],
+                        help="latencies for the fake Docker Engine operations, e.g. create=0.01 start=0.005")
+    parser.add_argument("--engines", type=int, default=1, help="the number of fake Docker Engines")
+    parser.add_argument("--no-memory", action="store_true", help="do not trace the memory allocations")
+    parser.add_argument("--json", type=str, default=None, help="a file to which the results are written")
+    arguments = parser.parse_args()
+
+    # the per container log messages would dominate the measured times
+    logging.disable(logging.INFO)
+    asyncio.run(start_benchmark(arguments))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,568 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains an in-process fake Docker Engine API that can be used for testing and benchmarking
+the container handling of the platform manager without a real Docker Engine.
+Only the parts of the API that are used by the platform manager are implemented.
+"""
+
+import asyncio
+import dataclasses
+import io
+import itertools
+import json
+import posixpath
+import struct
+import tarfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiohttp import web
+
+API_VERSION = "1.40"
+
+# The operation names that can be given a latency
+OPERATION_LIST = "list"
+OPERATION_CREATE = "create"
+OPERATION_START = "start"
+OPERATION_STOP = "stop"
+OPERATION_INSPECT = "inspect"
+OPERATION_DELETE = "delete"
+OPERATION_IMAGE = "image"
+OPERATION_NETWORK = "network"
+OPERATION_INFO = "info"
+OPERATION_STATS = "stats"
+OPERATION_WAIT = "wait"
+OPERATION_LOGS = "logs"
+OPERATION_ARCHIVE = "archive"
+OPERATION_VOLUME = "volume"
+OPERATION_DISTRIBUTION = "distribution"
+OPERATION_PULL = "pull"
+
+# the container events sent to the event stream subscribers
+EVENT_CREATE = "create"
+EVENT_START = "start"
+EVENT_DIE = "die"
+EVENT_DESTROY = "destroy"
+# the exit code used for containers that have been stopped with the stop operation
+STOPPED_EXIT_CODE = 143
+# the exit code used for running containers that have been removed with the delete operation
+KILLED_EXIT_CODE = 137
+
+# the resource usage reported by the stats operation for each running container
+STATS_CPU_USAGE = 0.5
+STATS_MEMORY_USAGE = 64 * 1024 ** 2
+STATS_NETWORK_BYTES = 1000
+# the nanoseconds of system CPU time between two consecutive stats reports
+STATS_SYSTEM_CPU_DELTA = 10 ** 9
+
+
+@dataclasses.dataclass
+class FakeContainer:
+    """Data class for holding the state of a container in the fake Docker Engine."""
+    container_id: str
+    name: str
+    config: Dict[str, Any]
+    running: bool = False
+    stats_count: int = 0
+    exit_code: Optional[int] = None
+    output: str = ""
+    # the output sent in separate log stream frames after the output above
+    output_frames: List[bytes] = dataclasses.field(default_factory=list)
+
+    def to_list_item(self) -> Dict[str, Any]:
+        """Returns the container in the format used in the container list response."""
+        return {
+            "Id": self.container_id,
+            "Names": ["/" + self.name],
+            "Image": self.config.get("Image", ""),
+            "Labels": self.config.get("Labels", {}),
+            "State": "running" if self.running else "created"
+        }
+
+    def to_inspect_item(self) -> Dict[str, Any]:
+        """Returns the container in the format used in the container inspect response."""
+        return {
+            "Id": self.container_id,
+            "Name": "/" + self.name,
+            "Config": {**self.config, "Tty": False},
+            "HostConfig": self.config.get("HostConfig", {}),
+            "State": {
+                "Status": "running" if self.running else "created",
+                "Running": self.running
+            }
+        }
+
+
+# Volume contents: the file contents for each volume using the volume name and the relative file path as keys
+VolumeContents = Dict[str, Dict[str, bytes]]
+# Handler for simulating the command of a started container: returns the exit code and the standard output
+CommandHandler = Callable[[FakeContainer, VolumeContents], Tuple[int, str]]
+
+
+class FakeDockerEngine:
+    """
+    In-process fake Docker Engine API server with a configurable latency for each operation.
+    The engine listens to a local TCP port and the address can be given to the aiodocker client.
+    """
+    def __init__(self, latencies: Optional[Dict[str, float]] = None, images: Optional[List[str]] = None,
+                 cpu_count: int = 8, memory: int = 16 * 1024 ** 3, command_handler: Optional[CommandHandler] = None,
+                 registry_digests: Optional[Dict[str, str]] = None):
+        """
+        Sets up the fake Docker Engine.
+        - latencies: the latency in seconds for each operation type, e.g. {"create": 0.05}
+        - images: the available Docker images, if None, all images are considered available
+        - cpu_count: the number of CPUs reported by the engine
+        - memory: the total memory in bytes reported by the engine
+        - command_handler: if given, the containers with a command exit immediately after the start with
+                           the exit code and the output given by the handler
+        - registry_digests: the digests of the images that can be pulled from the registry using the full image
+                            names with the tag as keys
+        """
+        self.__latencies = latencies if latencies is not None else {}
+        self.__images = set(images) if images is not None else None
+        self.__cpu_count = cpu_count
+        self.__memory = memory
+        self.__command_handler = command_handler
+        self.__registry_digests = registry_digests if registry_digests is not None else {}
+        # the registry digests of the local images using the full image names as keys
+        self.__local_digests = {}  # type: Dict[str, str]
+        self.__volumes = {}  # type: VolumeContents
+        # the last seen contents and the modification time for each volume file
+        self.__modification_times = {}  # type: Dict[Tuple[str, str], Tuple[bytes, float]]
+
+        self.__containers = {}  # type: Dict[str, FakeContainer]
+        self.__container_names = {}  # type: Dict[str, str]
+        self.__container_ids = itertools.count(1)
+        self.__operation_counts = {}  # type: Dict[str, int]
+        self.__event_queues = []  # type: List[asyncio.Queue]
+
+        self.__runner = None  # type: Optional[web.AppRunner]
+        self.__url = None  # type: Optional[str]
+
+    @property
+    def url(self) -> str:
+        """The address of the fake Docker Engine API."""
+        if self.__url is None:
+            raise RuntimeError("The fake Docker Engine has not been started")
+        return self.__url
+
+    @property
+    def containers(self) -> Dict[str, FakeContainer]:
+        """The containers in the fake Docker Engine using the container id as the key."""
+        return self.__containers
+
+    @property
+    def volumes(self) -> VolumeContents:
+        """The file contents of the volumes using the volume name and the relative file path as keys."""
+        return self.__volumes
+
+    @property
+    def local_digests(self) -> Dict[str, str]:
+        """The registry digests of the local images using the full image names as keys."""
+        return self.__local_digests
+
+    @property
+    def operation_counts(self) -> Dict[str, int]:
+        """The number of handled requests for each operation type."""
+        return self.__operation_counts
+
+    async def start(self):
+        """Starts the fake Docker Engine API server to a free local port."""
+        application = web.Application()
+        application.add_routes([
+            web.get("/version", self.__handle_version),
+            web.get("/v{version}/info", self.__handle_info),
+            web.get("/v{version}/events", self.__handle_events),
+            web.get("/v{version}/containers/json", self.__handle_list),
+            web.post("/v{version}/containers/create", self.__handle_create),
+            web.post("/v{version}/containers/{container}/start", self.__handle_start),
+            web.post("/v{version}/containers/{container}/stop", self.__handle_stop),
+            web.get("/v{version}/containers/{container}/json", self.__handle_inspect),
+            web.get("/v{version}/containers/{container}/stats", self.__handle_stats),
+            web.delete("/v{version}/containers/{container}", self.__handle_delete),
+            web.post("/v{version}/containers/{container}/wait", self.__handle_wait),
+            web.get("/v{version}/containers/{container}/logs", self.__handle_logs),
+            web.put("/v{version}/containers/{container}/archive", self.__handle_put_archive),
+            web.get("/v{version}/containers/{container}/archive", self.__handle_get_archive),
+            web.post("/v{version}/volumes/create", self.__handle_volume_create),
+            web.get("/v{version}/images/{image:.+}/json", self.__handle_image),
+            web.post("/v{version}/images/create", self.__handle_pull),
+            web.get("/v{version}/distribution/{image:.+}/json", self.__handle_distribution),
+            web.get("/v{version}/networks/{network}", self.__handle_network),
+            web.post("/v{version}/networks/{network}/connect", self.__handle_network_connect)
+        ])
+        self.__runner = web.AppRunner(application)
+        await self.__runner.setup()
+        site = web.TCPSite(self.__runner, host="127.0.0.1", port=0)
+        await site.start()
+        port = self.__runner.addresses[0][1]
+        self.__url = "http://127.0.0.1:{}".format(port)
+
+    async def stop(self):
+        """Stops the fake Docker Engine API server."""
+        for event_queue in self.__event_queues:
+            event_queue.put_nowait(None)
+        if self.__runner is not None:
+            await self.__runner.cleanup()
+            self.__runner = None
+
+    async def __operation(self, operation: str):
+        """Counts the operation and waits for the latency configured for it."""
+        self.__operation_counts[operation] = self.__operation_counts.get(operation, 0) + 1
+        latency = self.__latencies.get(operation, 0.0)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+    def __find_container(self, container_reference: str) -> Optional[FakeContainer]:
+        """Returns the container corresponding to the given container id or name."""
+        container = self.__containers.get(container_reference, None)
+        if container is not None:
+            return container
+        container_id = self.__container_names.get(container_reference, None)
+        if container_id is None:
+            return None
+        return self.__containers.get(container_id, None)
+
+    def __remove_container(self, container: FakeContainer):
+        """Removes the given container from the fake Docker Engine."""
+        self.__containers.pop(container.container_id, None)
+        self.__container_names.pop(container.name, None)
+        self.__send_event(EVENT_DESTROY, container)
+
+    def __send_event(self, action: str, container: FakeContainer, **attributes: str):
+        """Sends a container event to all the event stream subscribers."""
+        event = {
+            "Type": "container",
+            "Action": action,
+            "status": action,
+            "id": container.container_id,
+            "Actor": {
+                "ID": container.container_id,
+                "Attributes": {
+                    **container.config.get("Labels", {}),
+                    "image": container.config.get("Image", ""),
+                    "name": container.name,
+                    **attributes
+                }
+            },
+            "time": int(time.time()),
+            "timeNano": time.time_ns()
+        }
+        for event_queue in self.__event_queues:
+            event_queue.put_nowait(event)
+
+    def __exit_container(self, container: FakeContainer, exit_code: int):
+        """Marks the given container as exited and removes it if it was created with the auto remove option."""
+        container.running = False
+        self.__send_event(EVENT_DIE, container, exitCode=str(exit_code))
+        if container.config.get("HostConfig", {}).get("AutoRemove", False):
+            self.__remove_container(container)
+
+    def __get_volume_path(self, container: FakeContainer, path: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns the volume name and the relative path within the volume for the given path in the given container.
+        Returns None, if the path is not inside a volume mounted to the container.
+        """
+        path = posixpath.normpath(path)
+        for bind in container.config.get("HostConfig", {}).get("Binds", None) or []:
+            volume_name, mount_path = bind.split(":")[:2]
+            mount_path = posixpath.normpath(mount_path)
+            if path == mount_path or path.startswith(mount_path + "/"):
+                self.__volumes.setdefault(volume_name, {})
+                return volume_name, path[len(mount_path):].strip("/")
+        return None
+
+    def crash_container(self, container_name: str, exit_code: int = 1) -> bool:
+        """Simulates an unexpected exit of the given running container. Returns False, if there is no container."""
+        container = self.__find_container(container_name)
+        if container is None or not container.running:
+            return False
+        self.__exit_container(container, exit_code)
+        return True
+
+    @staticmethod
+    def __error(status: int, message: str) -> web.Response:
+        """Returns an error response in the format used by the Docker Engine API."""
+        return web.json_response({"message": message}, status=status)
+
+    async def __handle_version(self, _: web.Request) -> web.Response:
+        return web.json_response({"ApiVersion": API_VERSION, "Version": "fake"})
+
+    async def __handle_info(self, _: web.Request) -> web.Response:
+        await self.__operation(OPERATION_INFO)
+        return web.json_response({
+            "NCPU": self.__cpu_count,
+            "MemTotal": self.__memory,
+            "Containers": len(self.__containers)
+        })
+
+    async def __handle_events(self, request: web.Request) -> web.StreamResponse:
+        event_filters = json.loads(request.query.get("filters", "{}"))
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+
+        event_queue = asyncio.Queue()  # type: asyncio.Queue
+        self.__event_queues.append(event_queue)
+        try:
+            while True:
+                event = await event_queue.get()
+                if event is None:
+                    break
+                if (event["Type"] not in event_filters.get("type", [event["Type"]]) or
+                        event["Action"] not in event_filters.get("event", [event["Action"]])):
+                    continue
+                await response.write(bytes(json.dumps(event) + "\n", encoding="UTF-8"))
+        finally:
+            self.__event_queues.remove(event_queue)
+        return response
+
+    async def __handle_list(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_LIST)
+        list_all = request.query.get("all", "false").lower() in ("1", "true")
+        name_filters = json.loads(request.query.get("filters", "{}")).get("name", [])
+        return web.json_response([
+            container.to_list_item()
+            for container in self.__containers.values()
+            if (list_all or container.running) and
+            (not name_filters or any(name_filter in container.name for name_filter in name_filters))
+        ])
+
+    async def __handle_create(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_CREATE)
+        name = request.query.get("name", "")
+        if name and self.__find_container(name) is not None:
+            return self.__error(409, "Conflict. The container name \"/{}\" is already in use".format(name))
+        config = await request.json()
+        if self.__images is not None and config.get("Image", None) not in self.__images:
+            return self.__error(404, "No such image: {}".format(config.get("Image", None)))
+
+        container_id = "{:064x}".format(next(self.__container_ids))
+        self.__containers[container_id] = FakeContainer(container_id=container_id, name=name, config=config)
+        self.__container_names[name] = container_id
+        self.__send_event(EVENT_CREATE, self.__containers[container_id])
+        return web.json_response({"Id": container_id, "Warnings": []}, status=201)
+
+    async def __handle_start(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_START)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        container.running = True
+        self.__send_event(EVENT_START, container)
+        if self.__command_handler is not None and container.config.get("Cmd", None):
+            exit_code, container.output = self.__command_handler(container, self.__volumes)
+            container.exit_code = exit_code
+            self.__exit_container(container, exit_code)
+        return web.Response(status=204)
+
+    async def __handle_stop(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_STOP)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        if container.running:
+            self.__exit_container(container, STOPPED_EXIT_CODE)
+        return web.Response(status=204)
+
+    async def __handle_inspect(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_INSPECT)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        return web.json_response(container.to_inspect_item())
+
+    async def __handle_stats(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_STATS)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+
+        # each running container uses a constant amount of CPU and memory and the network counters keep growing
+        container.stats_count += 1
+        cpu_delta = int(STATS_CPU_USAGE / self.__cpu_count * STATS_SYSTEM_CPU_DELTA) if container.running else 0
+        return web.json_response({
+            "cpu_stats": {
+                "cpu_usage": {"total_usage": container.stats_count * cpu_delta},
+                "system_cpu_usage": container.stats_count * STATS_SYSTEM_CPU_DELTA,
+                "online_cpus": self.__cpu_count
+            },
+            "precpu_stats": {
+                "cpu_usage": {"total_usage": (container.stats_count - 1) * cpu_delta},
+                "system_cpu_usage": (container.stats_count - 1) * STATS_SYSTEM_CPU_DELTA,
+                "online_cpus": self.__cpu_count
+            },
+            "memory_stats": {
+                "usage": STATS_MEMORY_USAGE if container.running else 0,
+                "stats": {"inactive_file": 0},
+                "limit": self.__memory
+            },
+            "networks": {
+                "eth0": {
+                    "rx_bytes": container.stats_count * STATS_NETWORK_BYTES,
+                    "tx_bytes": container.stats_count * STATS_NETWORK_BYTES
+                }
+            }
+        })
+
+    async def __handle_delete(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_DELETE)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        if container.running:
+            container.running = False
+            self.__send_event(EVENT_DIE, container, exitCode=str(KILLED_EXIT_CODE))
+        self.__remove_container(container)
+        return web.Response(status=204)
+
+    async def __handle_wait(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_WAIT)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        while container.running:
+            await asyncio.sleep(0.01)
+        return web.json_response({"StatusCode": container.exit_code if container.exit_code is not None else 0})
+
+    async def __handle_logs(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_LOGS)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        outputs = [container.output.encode("UTF-8")] + container.output_frames \
+            if request.query.get("stdout", "") in ("1", "True", "true") else []
+        # the output of a container without a TTY is multiplexed into frames with an 8 byte header
+        frames = b"".join(struct.pack(">BxxxL", 1, len(output)) + output for output in outputs if output)
+        if request.query.get("follow", "") not in ("1", "True", "true"):
+            return web.Response(body=frames)
+
+        # a followed log stream stays open until the container has stopped
+        response = web.StreamResponse()
+        await response.prepare(request)
+        await response.write(frames)
+        while container.running:
+            await asyncio.sleep(0.01)
+        await response.write_eof()
+        return response
+
+    async def __handle_put_archive(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_ARCHIVE)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        volume_path = self.__get_volume_path(container, request.query.get("path", ""))
+        if volume_path is None:
+            return self.__error(400, "Only paths inside volumes are supported")
+
+        volume_name, target_path = volume_path
+        with tarfile.open(fileobj=io.BytesIO(await request.read()), mode="r") as archive:
+            for member in archive.getmembers():
+                member_file = archive.extractfile(member) if member.isfile() else None
+                if member_file is not None:
+                    file_path = posixpath.join(target_path, member.name).strip("/")
+                    self.__volumes[volume_name][file_path] = member_file.read()
+        return web.Response(status=200, text="")
+
+    async def __handle_get_archive(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_ARCHIVE)
+        container = self.__find_container(request.match_info["container"])
+        if container is None:
+            return self.__error(404, "No such container")
+        volume_path = self.__get_volume_path(container, request.query.get("path", ""))
+        if volume_path is None:
+            return self.__error(400, "Only paths inside volumes are supported")
+
+        volume_name, source_path = volume_path
+        source_files = [
+            (file_path, file_contents)
+            for file_path, file_contents in sorted(self.__volumes[volume_name].items())
+            if not source_path or file_path == source_path or file_path.startswith(source_path + "/")
+        ]
+        if source_path and not source_files:
+            return self.__error(404, "Could not find the file {} in container".format(request.query["path"]))
+
+        # like the Docker Engine, the archive entries are named starting from the last component of the path
+        base_name = posixpath.basename(posixpath.normpath(request.query["path"]))
+        archive_bytes = io.BytesIO()
+        with tarfile.open(fileobj=archive_bytes, mode="w") as archive:
+            for file_path, file_contents in source_files:
+                tar_info = tarfile.TarInfo(
+                    posixpath.join(base_name, file_path[len(source_path):].strip("/")).rstrip("/"))
+                tar_info.size = len(file_contents)
+                tar_info.mtime = self.__get_modification_time(volume_name, file_path, file_contents)
+                archive.addfile(tar_info, io.BytesIO(file_contents))
+        return web.Response(body=archive_bytes.getvalue(), content_type="application/x-tar")
+
+    def __get_modification_time(self, volume_name: str, file_path: str, file_contents: bytes) -> float:
+        """Returns the modification time for the volume file. The time is updated when the contents change."""
+        previous_contents, modification_time = self.__modification_times.get((volume_name, file_path), (None, 0.0))
+        if previous_contents != file_contents:
+            modification_time = time.time()
+            self.__modification_times[(volume_name, file_path)] = (file_contents, modification_time)
+        return modification_time
+
+    async def __handle_volume_create(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_VOLUME)
+        volume_name = (await request.json()).get("Name", "")
+        self.__volumes.setdefault(volume_name, {})
+        return web.json_response({"Name": volume_name, "Driver": "local"}, status=201)
+
+    async def __handle_image(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_IMAGE)
+        image = request.match_info["image"]
+        if self.__images is not None and image not in self.__images:
+            return self.__error(404, "No such image: {}".format(image))
+        repository_digests = []
+        if image in self.__local_digests:
+            repository_digests.append("{}@{}".format(image.rpartition(":")[0], self.__local_digests[image]))
+        return web.json_response({"Id": "sha256:" + "0" * 64, "RepoTags": [image], "RepoDigests": repository_digests})
+
+    async def __handle_distribution(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_DISTRIBUTION)
+        image = request.match_info["image"]
+        if image not in self.__registry_digests:
+            return self.__error(404, "manifest unknown")
+        return web.json_response({
+            "Descriptor": {
+                "mediaType": "application/vnd.docker.distribution.manifest.list.v2+json",
+                "digest": self.__registry_digests[image],
+                "size": 1000
+            },
+            "Platforms": [{"architecture": "amd64", "os": "linux"}]
+        })
+
+    async def __handle_pull(self, request: web.Request) -> web.StreamResponse:
+        await self.__operation(OPERATION_PULL)
+        image = request.query.get("fromImage", "")
+        if request.query.get("tag", ""):
+            image = ":".join([image, request.query["tag"]])
+        if image not in self.__registry_digests:
+            return self.__error(404, "manifest for {} not found".format(image))
+
+        # the pull progress is streamed as JSON objects like with the Docker Engine
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        for pull_status in [
+                {"status": "Pulling from {}".format(image.rpartition(":")[0])},
+                {"status": "Downloading", "id": image, "progressDetail": {"current": 1024 ** 2, "total": 1024 ** 2}},
+                {"status": "Digest: {}".format(self.__registry_digests[image])}]:
+            await response.write(bytes(json.dumps(pull_status) + "\n", encoding="UTF-8"))
+        self.__local_digests[image] = self.__registry_digests[image]
+        if self.__images is not None:
+            self.__images.add(image)
+        await response.write_eof()
+        return response
+
+    async def __handle_network(self, request: web.Request) -> web.Response:
+        await self.__operation(OPERATION_NETWORK)
+        network = request.match_info["network"]
+        return web.json_response({"Id": network, "Name": network})
+
+    async def __handle_network_connect(self, _: web.Request) -> web.Response:
+        await self.__operation(OPERATION_NETWORK)
+        return web.Response(status=200, text="")
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a fake RabbitMQ client that can be used instead of tools.clients.RabbitmqClient
+when testing or benchmarking the platform manager without a message bus. It also contains a fake broker
+that can be used as the connection factory for the Start message publisher instead of aio_pika.
+"""
+
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+
+class FakeRabbitmqClient:
+    """Fake RabbitMQ client that stores the sent messages and delivers them to the local listeners."""
+    def __init__(self, send_latency: float = 0.0, **kwargs: Any):
+        """
+        Sets up the fake client.
+        - send_latency: the time in seconds that sending each message takes
+        - kwargs: the connection parameters, these are stored but otherwise ignored
+        """
+        self.__send_latency = send_latency
+        self.__parameters = kwargs
+        self.__sent_messages = []  # type: List[Tuple[str, bytes]]
+        self.__listeners = []  # type: List[Tuple[List[str], Callable]]
+        self.__is_closed = False
+
+    @property
+    def parameters(self) -> dict:
+        """The connection parameters given when creating the client."""
+        return self.__parameters
+
+    @property
+    def sent_messages(self) -> List[Tuple[str, bytes]]:
+        """The sent messages as (topic name, message bytes) pairs."""
+        return self.__sent_messages
+
+    @property
+    def is_closed(self) -> bool:
+        """Returns True, if the client has been closed."""
+        return self.__is_closed
+
+    async def close(self):
+        """Marks the client as closed."""
+        self.__is_closed = True
+
+    def add_listener(self, topic_names: Union[str, List[str]], callback_function: Callable):
+        """Adds a listener for the given topics. The topic names are matched exactly."""
+        if isinstance(topic_names, str):
+            topic_names = [topic_names]
+        self.__listeners.append((list(topic_names), callback_function))
+
+    async def send_message(self, topic_name: str, message_bytes: bytes):
+        """Stores the sent message."""
+        if self.__send_latency > 0:
+            await asyncio.sleep(self.__send_latency)
+        self.__sent_messages.append((topic_name, message_bytes))
+
+    async def deliver(self, message_object: Any, topic_name: str):
+        """Delivers the given message object to the listeners that are listening to the given topic."""
+        for topic_names, callback_function in self.__listeners:
+            if topic_name in topic_names:
+                await callback_function(message_object, topic_name)
+
+
+class FakeAmqpExchange:
+    """Fake aio_pika exchange that stores the published messages and optionally raises the given error."""
+    def __init__(self, name: str, publish_error: Optional[BaseException] = None):
+        self.name = name
+        self.publish_error = publish_error
+        self.published_messages = []  # type: List[Tuple[str, Any]]
+
+    async def publish(self, message: Any, routing_key: str, **kwargs: Any):
+        """Stores the published message as (routing key, message) pair or raises the error."""
+        self.published_messages.append((routing_key, message))
+        if self.publish_error is not None:
+            raise self.publish_error
+
+
+class FakeAmqpChannel:
+    """Fake aio_pika channel that declares the exchanges in the given fake broker."""
+    def __init__(self, broker: "FakeAmqpBroker"):
+        self.__broker = broker
+        self.is_closed = False
+
+    async def declare_exchange(self, name: str, **kwargs: Any) -> FakeAmqpExchange:
+        """Returns the exchange with the given name from the broker."""
+        return self.__broker.get_exchange(name)
+
+
+class FakeAmqpConnection:
+    """Fake aio_pika connection that opens channels to the given fake broker."""
+    def __init__(self, broker: "FakeAmqpBroker"):
+        self.__broker = broker
+        self.__channels = []  # type: List[FakeAmqpChannel]
+
+    async def channel(self, **kwargs: Any) -> FakeAmqpChannel:
+        """Opens a new channel."""
+        self.__channels.append(FakeAmqpChannel(self.__broker))
+        return self.__channels[-1]
+
+    async def close(self):
+        """Closes all the channels."""
+        for channel in self.__channels:
+            channel.is_closed = True
+
+
+class FakeAmqpBroker:
+    """Fake message broker whose connect method can be used instead of aio_pika.connect_robust."""
+    def __init__(self, connect_error: Optional[BaseException] = None,
+                 publish_error: Optional[BaseException] = None):
+        """
+        Sets up the fake broker.
+        - connect_error: the error raised when opening a connection, None if the connections succeed
+        - publish_error: the error raised when publishing to any exchange, None if the publishing succeeds
+        """
+        self.__connect_error = connect_error
+        self.__publish_error = publish_error
+        self.__exchanges = {}  # type: Dict[str, FakeAmqpExchange]
+        self.__connection_count = 0
+
+    @property
+    def connection_count(self) -> int:
+        """The number of connection attempts."""
+        return self.__connection_count
+
+    @property
+    def exchanges(self) -> Dict[str, FakeAmqpExchange]:
+        """The declared exchanges using the exchange names as keys."""
+        return self.__exchanges
+
+    def get_exchange(self, name: str) -> FakeAmqpExchange:
+        """Returns the exchange with the given name and declares it if it does not exist yet."""
+        if name not in self.__exchanges:
+            self.__exchanges[name] = FakeAmqpExchange(name, self.__publish_error)
+        return self.__exchanges[name]
+
+    async def connect(self, **kwargs: Any) -> FakeAmqpConnection:
+        """Opens a new connection or raises the connection error."""
+        self.__connection_count += 1
+        if self.__connect_error is not None:
+            raise self.__connect_error
+        return FakeAmqpConnection(self)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for the component resource limits."""
+
+from platform_manager.component import (
+    ComponentResources, CPU_AFFINITY_DEDICATED, CPU_AFFINITY_NONE, get_component_resources, parse_memory_value)
+
+
+def test_get_component_resources():
+    """Tests that the resource definitions are parsed and the invalid values are ignored."""
+    assert get_component_resources({"Cpus": 2, "Memory": "512m", "CpuSet": "0-1, 3", "CpuAffinity": "dedicated"}) == \
+        ComponentResources(cpus=2.0, memory=512 * 1024 ** 2, cpu_set="0-1,3", cpu_affinity=CPU_AFFINITY_DEDICATED)
+    assert get_component_resources({"Cpus": -1, "Memory": "lots", "CpuSet": "a", "CpuAffinity": "all"}) == \
+        ComponentResources()
+    assert get_component_resources(None) == ComponentResources()
+    assert parse_memory_value("2g") == 2 * 1024 ** 3
+
+
+def test_with_overrides():
+    """Tests that only the given override values replace the current values."""
+    resources = ComponentResources(cpus=1.0, memory=1024, cpu_affinity=CPU_AFFINITY_DEDICATED)
+    assert resources.with_overrides(ComponentResources(memory=2048)) == \
+        ComponentResources(cpus=1.0, memory=2048, cpu_affinity=CPU_AFFINITY_DEDICATED)
+    assert resources.with_overrides(ComponentResources(cpu_set="2")) == \
+        ComponentResources(cpus=1.0, memory=1024, cpu_set="2", cpu_affinity=CPU_AFFINITY_DEDICATED)
+
+
+def test_with_overrides_explicit_cpu_affinity():
+    """Tests that an explicitly given CPU affinity policy overrides the current policy in both directions."""
+    dedicated = get_component_resources({"CpuAffinity": CPU_AFFINITY_DEDICATED})
+    no_affinity = get_component_resources({"CpuAffinity": CPU_AFFINITY_NONE})
+    not_given = get_component_resources({"Cpus": 1})
+
+    assert dedicated.with_overrides(no_affinity).cpu_affinity == CPU_AFFINITY_NONE
+    assert no_affinity.with_overrides(dedicated).cpu_affinity == CPU_AFFINITY_DEDICATED
+    assert dedicated.with_overrides(not_given).cpu_affinity == CPU_AFFINITY_DEDICATED
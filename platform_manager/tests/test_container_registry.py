@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for keeping the container registry up to date with the Docker container events."""
+
+import re
+from typing import Any, Dict
+
+from platform_manager.container_registry import (
+    CONTAINER_STATE_EXITED, CONTAINER_STATE_RUNNING, ContainerRegistry, EVENT_CREATE, EVENT_DIE, EVENT_START)
+from platform_manager.docker_runner import LABEL_BROKER, LABEL_COMPONENT_TYPE
+
+
+def get_event(action: str, container_name: str, container_id: str, **attributes: str) -> Dict[str, Any]:
+    """Returns a Docker container event with the given attributes."""
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"ID": container_id, "Attributes": {"name": container_name, **attributes}}
+    }
+
+
+def get_registry() -> ContainerRegistry:
+    """Returns a registry without any Docker clients for the containers with prefixes Sim00_ to Sim99_."""
+    return ContainerRegistry([], re.compile("Sim([0-9]{2})_"))
+
+
+def test_handle_event_platform_labels():
+    """Tests that only the platform labels are taken from the attributes of a container event."""
+    registry = get_registry()
+    registry.handle_event(get_event(
+        EVENT_CREATE, "Sim01_component", "id1",
+        image="component:latest", **{LABEL_BROKER: "broker1:5672", "com.docker.compose.project": "simces"}), 0)
+
+    registered_container = registry.get_container("Sim01_component")
+    assert registered_container is not None
+    assert registered_container.labels == {LABEL_BROKER: "broker1:5672"}
+
+
+def test_handle_event_keeps_registered_labels():
+    """Tests that the later events for the same container do not replace the labels captured at list time."""
+    registry = get_registry()
+    labels = {LABEL_COMPONENT_TYPE: "Dummy", "owner": "user"}
+    registry.register("Sim01_component", "id1", 0, labels=labels)
+
+    registry.handle_event(get_event(EVENT_START, "Sim01_component", "id1"), 0)
+    registered_container = registry.get_container("Sim01_component")
+    assert registered_container is not None
+    assert registered_container.state == CONTAINER_STATE_RUNNING
+    assert registered_container.labels == labels
+
+    registry.handle_event(get_event(EVENT_DIE, "Sim01_component", "id1", exitCode="0"), 0)
+    assert registered_container.state == CONTAINER_STATE_EXITED
+    assert registered_container.labels == labels
+
+    # a recreated container with the same name gets the labels from the event
+    registry.handle_event(get_event(EVENT_CREATE, "Sim01_component", "id2", **{LABEL_COMPONENT_TYPE: "Other"}), 0)
+    assert registered_container.container_id == "id2"
+    assert registered_container.labels == {LABEL_COMPONENT_TYPE: "Other"}
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for creating and stopping the simulation containers using a fake Docker Engine."""
+
+import asyncio
+from typing import List
+
+import pytest
+
+from platform_manager.docker_runner import ContainerConfiguration, ContainerStarter
+from platform_manager.tests.fake_docker import FakeDockerEngine
+
+FAILING_CONTAINER = "component_3"
+
+
+def get_configurations(count: int) -> List[ContainerConfiguration]:
+    """Returns container configurations for the given number of components."""
+    return [
+        ContainerConfiguration(
+            container_name="component_{}".format(index),
+            docker_image="test/component:latest",
+            environment={"INDEX": index},
+            networks="test_network",
+            volumes=[]
+        )
+        for index in range(1, count + 1)
+    ]
+
+
+def test_create_simulation_containers_unexpected_error(monkeypatch: pytest.MonkeyPatch):
+    """Tests that the created containers are removed if one of the creations raises an unexpected exception."""
+    original_create_container = ContainerStarter.create_container
+
+    async def create_container(self, container_name, *args, **kwargs):
+        if container_name.endswith(FAILING_CONTAINER):
+            # let the other creations finish first
+            await asyncio.sleep(0.2)
+            raise RuntimeError("unexpected error")
+        return await original_create_container(self, container_name, *args, **kwargs)
+
+    monkeypatch.setattr(ContainerStarter, "create_container", create_container)
+
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        await docker_engine.start()
+        container_starter = ContainerStarter(docker_url=docker_engine.url)
+        try:
+            assert await container_starter.create_simulation_containers(get_configurations(5)) is None
+            assert not docker_engine.containers
+        finally:
+            await container_starter.close()
+            await docker_engine.stop()
+
+    asyncio.run(run_test())
+
+
+def test_stopping_state_cleared_on_reuse():
+    """Tests that a stopped container name is no longer considered stopping once the name is reused."""
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        await docker_engine.start()
+        container_starter = ContainerStarter(docker_url=docker_engine.url)
+        try:
+            container_names = await container_starter.start_simulation(get_configurations(2))
+            assert container_names is not None
+            assert not any(container_starter.is_stopping(name) for name in container_names)
+
+            assert await container_starter.stop_containers(container_names, stop_timeout=1)
+            assert all(container_starter.is_stopping(name) for name in container_names)
+            assert not docker_engine.containers
+
+            # the simulation index is free again, so the same names are used
+            assert await container_starter.start_simulation(get_configurations(2)) == container_names
+            assert not any(container_starter.is_stopping(name) for name in container_names)
+        finally:
+            await container_starter.close()
+            await docker_engine.stop()
+
+    asyncio.run(run_test())
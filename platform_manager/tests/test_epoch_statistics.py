@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for the epoch latency statistics and the straggler detection."""
+
+import json
+import pathlib
+
+import pytest
+
+from platform_manager.epoch_statistics import EpochLatencyCollector, get_percentile
+
+
+def get_collector() -> EpochLatencyCollector:
+    """Returns a collector with three epochs in which the component "slow" is usually the last to report ready."""
+    collector = EpochLatencyCollector("simulation_id")
+    ready_latencies = {
+        1: {"fast": 0.1, "slow": 0.9, "medium": 0.5},
+        2: {"fast": 0.2, "slow": 1.1, "medium": 0.4},
+        3: {"fast": 0.1, "slow": 0.3, "medium": 0.6}
+    }
+    for epoch_number, latencies in ready_latencies.items():
+        start_time = 10.0 * epoch_number
+        collector.record_epoch(epoch_number, start_time)
+        # only the first start time is used
+        collector.record_epoch(epoch_number, start_time + 5.0)
+        for component_name, latency in latencies.items():
+            collector.record_ready(component_name, epoch_number, start_time + latency)
+            # only the first ready message is used
+            collector.record_ready(component_name, epoch_number, start_time + latency + 5.0)
+    return collector
+
+
+def test_get_percentile():
+    """Tests the nearest rank percentile."""
+    values = [float(value) for value in range(1, 21)]
+    assert get_percentile(values, 95) == 19.0
+    assert get_percentile(values, 100) == 20.0
+    assert get_percentile([3.0], 50) == 3.0
+
+
+def test_stragglers():
+    """Tests that the stragglers are ordered by the number of epochs in which they were the last."""
+    collector = get_collector()
+    assert collector.epoch_count == 3
+    assert collector.get_stragglers() == ["slow", "medium"]
+
+    component_statistics = collector.get_component_statistics()
+    assert component_statistics["slow"]["StragglerCount"] == 2
+    assert component_statistics["fast"]["StragglerCount"] == 0
+    assert component_statistics["slow"]["Max"] == pytest.approx(1.1)
+    assert component_statistics["medium"]["Median"] == pytest.approx(0.5)
+
+
+def test_epoch_statistics():
+    """Tests the duration and the straggler for each epoch."""
+    epoch_statistics = get_collector().get_epoch_statistics()
+    assert epoch_statistics[2]["Duration"] == pytest.approx(1.1)
+    assert epoch_statistics[3]["Straggler"] == "medium"
+    assert all(epoch["ReadyComponents"] == 3 for epoch in epoch_statistics.values())
+
+
+def test_ready_without_epoch_start():
+    """Tests that the ready messages for epochs without a start time do not produce stragglers."""
+    collector = EpochLatencyCollector("simulation_id")
+    collector.record_ready("component", 1, 1.0)
+    assert collector.epoch_count == 0
+    assert not collector.get_stragglers()
+    assert not collector.get_epoch_statistics()
+
+
+def test_store(tmp_path: pathlib.Path):
+    """Tests that the stored report can be read back."""
+    report_file = tmp_path / "epochs.json"
+    assert get_collector().store(report_file)
+    with open(report_file, mode="r", encoding="UTF-8") as report:
+        stored_report = json.load(report)
+    assert stored_report["SimulationId"] == "simulation_id"
+    assert stored_report["Stragglers"] == ["slow", "medium"]
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for updating the local Docker images using a fake Docker Engine."""
+
+import asyncio
+import pathlib
+from typing import Dict, List
+
+from aiodocker import Docker
+
+from platform_manager.image_sync import (
+    IMAGE_PULLED, IMAGE_UP_TO_DATE, get_full_image_name, read_image_list, split_image_name, sync_images)
+from platform_manager.tests.fake_docker import FakeDockerEngine
+
+IMAGES = ["ghcr.io/simcesplatform/{}:latest".format(name) for name in ("first", "second", "third")]
+
+
+def test_split_image_name():
+    """Tests splitting the image names to the repository and the tag or the digest."""
+    assert split_image_name("ghcr.io/simcesplatform/logwriter:1.2") == ("ghcr.io/simcesplatform/logwriter", "1.2")
+    assert split_image_name("ghcr.io/simcesplatform/logwriter") == ("ghcr.io/simcesplatform/logwriter", "latest")
+    assert split_image_name("localhost:5000/logwriter") == ("localhost:5000/logwriter", "latest")
+    assert split_image_name("localhost:5000/logwriter:dev") == ("localhost:5000/logwriter", "dev")
+    assert split_image_name("mongo@sha256:abc") == ("mongo", "sha256:abc")
+    assert get_full_image_name("mongo") == "mongo:latest"
+    assert get_full_image_name("mongo@sha256:abc") == "mongo@sha256:abc"
+
+
+def test_read_image_list(tmp_path: pathlib.Path):
+    """Tests that the comments and the empty lines are ignored in the image list files."""
+    image_list = tmp_path / "images.txt"
+    image_list.write_text("# comment\n\n{}\n  {}  \n".format(*IMAGES[:2]), encoding="UTF-8")
+    assert read_image_list(str(image_list)) == IMAGES[:2]
+
+
+def test_sync_images():
+    """Tests that only the missing and the changed images are pulled."""
+    registry_digests = {image: "sha256:{:064x}".format(index) for index, image in enumerate(IMAGES)}
+
+    async def run_test() -> List[Dict[str, str]]:
+        docker_engine = FakeDockerEngine(images=[], registry_digests=registry_digests)
+        await docker_engine.start()
+        docker_client = Docker(url=docker_engine.url)
+        try:
+            image_statuses = []
+            for sync_round in range(3):
+                if sync_round == 2:
+                    registry_digests[IMAGES[1]] = "sha256:" + "f" * 64
+                # the same image can be given several times and without the tag
+                image_results = await sync_images(
+                    docker_client, IMAGES + ["ghcr.io/simcesplatform/first"], progress_interval=0)
+                image_statuses.append({image_result.image: image_result.status for image_result in image_results})
+            assert docker_engine.local_digests[IMAGES[1]] == "sha256:" + "f" * 64
+            return image_statuses
+        finally:
+            await docker_client.close()
+            await docker_engine.stop()
+
+    first_round, second_round, third_round = asyncio.run(run_test())
+    assert first_round == {image: IMAGE_PULLED for image in IMAGES}
+    assert second_round == {image: IMAGE_UP_TO_DATE for image in IMAGES}
+    assert third_round == {
+        image: IMAGE_PULLED if image == IMAGES[1] else IMAGE_UP_TO_DATE
+        for image in IMAGES
+    }
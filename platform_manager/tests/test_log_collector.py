@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for selecting, downloading and extracting the log files from the logs volume."""
+
+import asyncio
+import gzip
+import io
+import json
+import pathlib
+import tarfile
+from typing import Any, Dict, List
+
+from aiodocker import Docker
+
+from platform_manager.log_collector import (
+    CollectionResult, DEFAULT_LOGWRITER_NAME, DEFAULT_LOGS_VOLUME, DEFAULT_MAIN_LOG_FILE, DEFAULT_MANAGER_NAME,
+    DEFAULT_START_FOLDER, collect_logs, extract_log_files, get_selected_paths, get_simulation_files,
+    read_start_messages, select_log_files)
+from platform_manager.tests.fake_docker import FakeDockerEngine, OPERATION_ARCHIVE
+
+
+def get_start_message(simulation_id: str, simulation_exchange: str, process_names: List[str],
+                      manager_name: str = "") -> Dict[str, Any]:
+    """Returns a Start message with the given domain components and the core components."""
+    return {
+        "SimulationId": simulation_id,
+        "SimulationSpecificExchange": simulation_exchange,
+        "ProcessParameters": {
+            "SimulationManager": {"ManagerName": manager_name} if manager_name else {},
+            "LogWriter": {},
+            "Dummy": {process_name: {} for process_name in process_names}
+        }
+    }
+
+
+def get_archive(files: Dict[str, bytes]) -> io.BytesIO:
+    """Returns a tar archive in the format returned by the Docker Engine for a folder."""
+    archive_file = io.BytesIO()
+    with tarfile.open(fileobj=archive_file, mode="w") as archive:
+        for filename, contents in files.items():
+            member = tarfile.TarInfo(filename)
+            member.size = len(contents)
+            member.mtime = 1600000000
+            archive.addfile(member, io.BytesIO(contents))
+    archive_file.seek(0)
+    return archive_file
+
+
+def get_log_files() -> Dict[str, bytes]:
+    """Returns the contents of the logs volume with two simulations using the relative paths as keys."""
+    files = {
+        "start/start_message_exchange1.json": json.dumps(
+            get_start_message("2021-01-01T00:00:00.000Z", "exchange1", ["dummy1", "dummy2"], "Manager1")).encode(),
+        "start/start_message_exchange2.json": json.dumps(
+            get_start_message("2021-01-02T00:00:00.000Z", "exchange2", ["other"])).encode(),
+        "start/launch_trace_exchange1.json": b"{}",
+        "start/start_message_invalid.json": b"not json"
+    }
+    for process_name in ["dummy1", "dummy2", "other", "Manager1", "SimulationManager", "log_writer"]:
+        files["logfile_{}.log".format(process_name)] = "log of {}\n".format(process_name).encode()
+    return files
+
+
+def get_logs_archive(files: Dict[str, bytes]) -> io.BytesIO:
+    """Returns the archive of the whole logs folder with the given files."""
+    return get_archive({"logs/" + file_path: file_contents for file_path, file_contents in files.items()})
+
+
+def get_selected(simulations: List[str]) -> List[str]:
+    """Returns the relative paths of the files that are selected for the given simulations."""
+    with tarfile.open(fileobj=get_archive({
+            "start/" + file_path[len("start/"):]: file_contents
+            for file_path, file_contents in get_log_files().items()
+            if file_path.startswith("start/")}), mode="r") as archive:
+        start_messages = read_start_messages(archive)
+    return sorted(get_selected_paths(
+        start_messages, simulations, DEFAULT_MAIN_LOG_FILE, DEFAULT_START_FOLDER,
+        DEFAULT_MANAGER_NAME, DEFAULT_LOGWRITER_NAME))
+
+
+def extract(archive_file: io.BytesIO, output_folder: pathlib.Path, compress: bool = False) -> CollectionResult:
+    """Extracts the log files from the given archive and returns the collection result."""
+    collection_result = CollectionResult()
+    state = {}  # type: Dict[str, str]
+    output_folder.mkdir(parents=True, exist_ok=True)
+    state_filename = output_folder / "state.json"
+    if state_filename.exists():
+        state = json.loads(state_filename.read_text(encoding="UTF-8"))
+    extract_log_files(archive_file, output_folder, DEFAULT_MAIN_LOG_FILE, compress, state, collection_result)
+    state_filename.write_text(json.dumps(state), encoding="UTF-8")
+    return collection_result
+
+
+def test_get_simulation_files():
+    """Tests that the simulation files include the component logs and the stored files for the simulation."""
+    simulation_files = get_simulation_files(
+        get_start_message("2021-01-01T00:00:00.000Z", "exchange1", ["dummy1"]),
+        "/logs/logfile.log", "start", "DefaultManager", "writer")
+    assert simulation_files == {
+        "logfile_dummy1.log",
+        "logfile_DefaultManager.log",
+        "logfile_writer.log",
+        "start/start_message_exchange1.json",
+        "start/launch_trace_exchange1.json",
+        "start/epoch_statistics_exchange1.json",
+        "start/resource_usage_exchange1.json"
+    }
+
+
+def test_select_log_files():
+    """Tests that all the log files directly in the logs folder are selected."""
+    with tarfile.open(fileobj=get_logs_archive(get_log_files()), mode="r") as archive:
+        assert sorted(select_log_files(archive, DEFAULT_MAIN_LOG_FILE)) == [
+            "logfile_Manager1.log",
+            "logfile_SimulationManager.log",
+            "logfile_dummy1.log",
+            "logfile_dummy2.log",
+            "logfile_log_writer.log",
+            "logfile_other.log"
+        ]
+
+
+def test_get_selected_paths():
+    """Tests that the simulations can be selected either by the simulation id or by the exchange name."""
+    assert get_selected(["exchange1"]) == [
+        "logfile_Manager1.log",
+        "logfile_dummy1.log",
+        "logfile_dummy2.log",
+        "logfile_log_writer.log",
+        "start/epoch_statistics_exchange1.json",
+        "start/launch_trace_exchange1.json",
+        "start/resource_usage_exchange1.json",
+        "start/start_message_exchange1.json"
+    ]
+    assert get_selected(["2021-01-02T00:00:00.000Z"]) == [
+        "logfile_SimulationManager.log",
+        "logfile_log_writer.log",
+        "logfile_other.log",
+        "start/epoch_statistics_exchange2.json",
+        "start/launch_trace_exchange2.json",
+        "start/resource_usage_exchange2.json",
+        "start/start_message_exchange2.json"
+    ]
+    assert not get_selected(["unknown"])
+
+
+def test_get_selected_paths_unsafe():
+    """Tests that the paths built from the Start message contents cannot point outside the output folder."""
+    selected_paths = get_selected_paths(
+        [get_start_message("2021-01-01T00:00:00.000Z", "exchange", ["dummy", "../../escaped"])], ["exchange"],
+        DEFAULT_MAIN_LOG_FILE, DEFAULT_START_FOLDER, DEFAULT_MANAGER_NAME, DEFAULT_LOGWRITER_NAME)
+    assert "logfile_dummy.log" in selected_paths
+    assert not [selected_path for selected_path in selected_paths if "escaped" in selected_path]
+
+
+def test_extract_log_files(tmp_path: pathlib.Path):
+    """Tests that only the changed files are written in the later collections."""
+    files = get_log_files()
+    collection_result = extract(get_logs_archive(files), tmp_path, compress=True)
+    assert len(collection_result.copied_files) == 6
+    with gzip.open(tmp_path / "logfile_dummy1.log.gz") as log_file:
+        assert log_file.read() == b"log of dummy1\n"
+
+    files["logfile_dummy1.log"] += b"more\n"
+    collection_result = extract(get_logs_archive(files), tmp_path, compress=True)
+    assert collection_result.copied_files == ["logfile_dummy1.log"]
+    assert collection_result.unchanged_files == 5
+
+
+def test_extract_log_files_unsafe_paths(tmp_path: pathlib.Path):
+    """Tests that the archive members with absolute paths or parent folder references are not written."""
+    output_folder = tmp_path / "output"
+    files = {
+        "../escaped.log": b"escaped",
+        "/absolute.log": b"absolute",
+        "logs/logfile_dummy1.log": b"log of dummy1\n"
+    }
+    collection_result = extract(get_archive(files), output_folder)
+    assert collection_result.copied_files == ["logfile_dummy1.log"]
+    assert sorted(path.name for path in output_folder.iterdir()) == ["logfile_dummy1.log", "state.json"]
+
+
+def test_collect_simulation_logs(tmp_path: pathlib.Path):
+    """Tests that only the start message folder and the files of the given simulation are downloaded."""
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        await docker_engine.start()
+        docker_client = Docker(url=docker_engine.url)
+        try:
+            docker_engine.volumes[DEFAULT_LOGS_VOLUME] = get_log_files()
+            first_result = await collect_logs(docker_client, tmp_path, simulations=["exchange1"])
+            # the start folder and the eight simulation files of which the epoch statistics and the resource usage
+            # files are missing from the volume
+            archive_count = docker_engine.operation_counts[OPERATION_ARCHIVE]
+
+            docker_engine.volumes[DEFAULT_LOGS_VOLUME]["logfile_dummy2.log"] += b"more\n"
+            second_result = await collect_logs(docker_client, tmp_path, simulations=["exchange1"])
+        finally:
+            await docker_client.close()
+            await docker_engine.stop()
+
+        assert archive_count == 9
+        assert first_result is not None
+        assert sorted(first_result.copied_files) == [
+            "logfile_Manager1.log",
+            "logfile_dummy1.log",
+            "logfile_dummy2.log",
+            "logfile_log_writer.log",
+            "start/launch_trace_exchange1.json",
+            "start/start_message_exchange1.json"
+        ]
+        assert not (tmp_path / "logfile_other.log").exists()
+        assert second_result is not None
+        assert second_result.copied_files == ["logfile_dummy2.log"]
+        assert second_result.unchanged_files == 5
+
+    asyncio.run(run_test())
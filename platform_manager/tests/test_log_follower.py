@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for following the log output of the simulation containers using a fake Docker Engine."""
+
+import asyncio
+import io
+import logging
+from typing import Optional
+
+import pytest
+from aiodocker import Docker
+
+from platform_manager import log_follower
+from platform_manager.docker_runner import LABEL_COMPONENT_TYPE
+from platform_manager.log_follower import follow_simulation, get_line_level, split_lines
+from platform_manager.tests.fake_docker import FakeDockerEngine
+
+
+async def start_containers(docker_engine: FakeDockerEngine, *container_names: str):
+    """Creates and starts containers with the given names in the given fake Docker Engine."""
+    docker_client = Docker(url=docker_engine.url)
+    try:
+        for container_name in container_names:
+            container = await docker_client.containers.create(
+                {"Image": "dummy", "Labels": {LABEL_COMPONENT_TYPE: "Dummy"}}, name=container_name)
+            await container.start()
+    finally:
+        await docker_client.close()
+
+
+async def stop_containers(docker_engine: FakeDockerEngine, delay: float):
+    """Stops all the containers in the given fake Docker Engine after the given delay."""
+    await asyncio.sleep(delay)
+    for container in docker_engine.containers.values():
+        container.running = False
+
+
+def test_get_line_level():
+    """Tests that the lines without a log level get the level of the previous line."""
+    assert get_line_level("2021-01-01 12:00:00 INFO: started", None) == logging.INFO
+    assert get_line_level("2021-01-01 12:00:00 ERROR: failed", logging.INFO) == logging.ERROR
+    assert get_line_level("Traceback (most recent call last):", logging.ERROR) == logging.ERROR
+    assert get_line_level("no level", None) is None
+    assert get_line_level("INFORMATION is not a level", logging.DEBUG) == logging.DEBUG
+
+
+def test_split_lines():
+    """Tests that the output pieces are split into complete lines and a partial line."""
+    assert split_lines("", "first\nsecond\r\nthi") == (["first", "second"], "thi")
+    assert split_lines("thi", "rd") == ([], "third")
+    assert split_lines("third", "\n") == (["third"], "")
+    assert split_lines("", "") == ([], "")
+
+
+def test_follow_simulation():
+    """Tests that the output of the simulation containers is written with the prefixes and the level filter."""
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        await docker_engine.start()
+        try:
+            await start_containers(docker_engine, "Sim01_first", "Sim01_second_component", "Sim02_other")
+            containers = {container.name: container for container in docker_engine.containers.values()}
+            containers["Sim01_first"].output = "INFO: started\nDEBUG: hidden\n  hidden detail\nERROR: failed\n"
+            # the frames split a multibyte character and contain an invalid byte
+            containers["Sim01_second_component"].output_frames = [b"INFO: \xc3", b"\xa4\nINFO: \xff", b"end"]
+            containers["Sim02_other"].output = "INFO: other simulation\n"
+
+            output = io.StringIO()
+            stopper = asyncio.create_task(stop_containers(docker_engine, 0.2))
+            statistics = await follow_simulation(
+                output, 1, min_level=logging.INFO, docker_url=docker_engine.url)
+            await stopper
+        finally:
+            await docker_engine.stop()
+
+        assert statistics is not None
+        assert statistics.written_lines == 4
+        assert statistics.filtered_lines == 2
+        assert sorted(output.getvalue().splitlines()) == [
+            "first            | ERROR: failed",
+            "first            | INFO: started",
+            "second_component | INFO: ä",
+            "second_component | INFO: �end"
+        ]
+
+    asyncio.run(run_test())
+
+
+def test_follow_simulation_unexpected_error(monkeypatch: pytest.MonkeyPatch):
+    """Tests that an unexpected error in one log stream stops the following of the other streams."""
+    def get_failing_line_level(line: str, previous_level: Optional[int]) -> Optional[int]:
+        if "fail" in line:
+            raise RuntimeError("unexpected error")
+        return get_line_level(line, previous_level)
+
+    monkeypatch.setattr(log_follower, "get_line_level", get_failing_line_level)
+
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        await docker_engine.start()
+        try:
+            await start_containers(docker_engine, "Sim01_failing", "Sim01_running")
+            containers = {container.name: container for container in docker_engine.containers.values()}
+            containers["Sim01_running"].output = "INFO: running\n"
+            containers["Sim01_failing"].output_frames = [b"INFO: before\n", b"INFO: fail\n"]
+
+            output = io.StringIO()
+            with pytest.raises(RuntimeError):
+                # the containers are never stopped, so the following would continue without the cancellation
+                await asyncio.wait_for(follow_simulation(output, 1, docker_url=docker_engine.url), timeout=5.0)
+            assert not [
+                task for task in asyncio.all_tasks()
+                if "read_stream" in task.get_coro().__qualname__
+            ]
+        finally:
+            for container in docker_engine.containers.values():
+                container.running = False
+            await docker_engine.stop()
+
+        assert "failing | INFO: before" in output.getvalue().splitlines()
+
+    asyncio.run(run_test())
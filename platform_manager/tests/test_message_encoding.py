@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for compressing and decompressing the message payloads."""
+
+import gzip
+import zlib
+
+import pytest
+
+from platform_manager.message_encoding import (
+    CONTENT_ENCODINGS, CONTENT_ENCODING_DEFLATE, CONTENT_ENCODING_GZIP, decode_message_body, encode_message_body)
+
+MESSAGE_BYTES = b'{"Type": "Start", "ProcessParameters": {}}' * 50
+
+
+@pytest.mark.parametrize("content_encoding", CONTENT_ENCODINGS)
+def test_round_trip(content_encoding: str):
+    """Tests that the encoded payload is smaller and decodes back to the original payload."""
+    message_body = encode_message_body(MESSAGE_BYTES, content_encoding)
+    assert len(message_body) < len(MESSAGE_BYTES)
+    assert decode_message_body(message_body, content_encoding) == MESSAGE_BYTES
+
+
+def test_standard_formats():
+    """Tests that the payloads can be decoded with the standard library functions for each encoding."""
+    assert gzip.decompress(encode_message_body(MESSAGE_BYTES, CONTENT_ENCODING_GZIP)) == MESSAGE_BYTES
+    assert zlib.decompress(encode_message_body(MESSAGE_BYTES, CONTENT_ENCODING_DEFLATE)) == MESSAGE_BYTES
+
+
+@pytest.mark.parametrize("content_encoding", [None, ""])
+def test_no_encoding(content_encoding):
+    """Tests that the payload is not changed without a content encoding."""
+    assert encode_message_body(MESSAGE_BYTES, content_encoding) == MESSAGE_BYTES
+    assert decode_message_body(MESSAGE_BYTES, content_encoding) == MESSAGE_BYTES
+
+
+def test_unsupported_encoding():
+    """Tests that an unsupported content encoding raises ValueError."""
+    with pytest.raises(ValueError):
+        encode_message_body(MESSAGE_BYTES, "br")
+    with pytest.raises(ValueError):
+        decode_message_body(MESSAGE_BYTES, "br")
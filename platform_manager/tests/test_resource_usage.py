@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for sampling the resource usage of the simulation containers."""
+
+import asyncio
+from typing import Any, Dict, List
+
+from platform_manager.resource_usage import ResourceUsageSampler, TOTAL_USAGE_NAME, get_cpu_usage
+
+
+class FakeStatsSource:
+    """
+    Fake container starter that returns the given network counters for a container, one value for each sample.
+    A string value is raised as an unexpected exception.
+    """
+    def __init__(self, network_counters: List[Any]):
+        self.network_counters = list(network_counters)
+
+    def get_docker_client(self, container_name: str) -> "FakeStatsSource":
+        """Returns the fake itself as the Docker client."""
+        return self
+
+    @property
+    def containers(self) -> "FakeStatsSource":
+        """Returns the fake itself as the container collection."""
+        return self
+
+    def container(self, container_name: str) -> "FakeStatsSource":
+        """Returns the fake itself as the container."""
+        return self
+
+    async def stats(self, stream: bool) -> List[Dict[str, Any]]:
+        """Returns the next stats response."""
+        counters = self.network_counters.pop(0)
+        if isinstance(counters, str):
+            raise RuntimeError(counters)
+        return [{
+            "memory_stats": {"usage": 100},
+            "networks": {"eth0": {"rx_bytes": counters[0], "tx_bytes": counters[1]}}
+        }]
+
+
+def get_sampler(stats_source: FakeStatsSource) -> ResourceUsageSampler:
+    """Returns a sampler for a single container using the given stats source."""
+    return ResourceUsageSampler("simulation_id", stats_source, {"Sim00_component": "component"}, 0.01)  # type: ignore
+
+
+def test_network_usage_with_counter_reset():
+    """Tests that the network usage is accumulated from the counter changes and that a reset is handled."""
+    sampler = get_sampler(FakeStatsSource([(100, 10), (250, 30), (50, 5), (80, 15)]))
+
+    async def run_test():
+        for _ in range(4):
+            await sampler.sample()
+
+    asyncio.run(run_test())
+    total_usage = sampler.get_summary()[TOTAL_USAGE_NAME]
+    # 250 bytes before the reset and 80 bytes after it
+    assert total_usage["NetworkRxBytes"] == 330
+    assert total_usage["NetworkTxBytes"] == 45
+    assert total_usage["Samples"] == 4
+    assert total_usage["MemoryPeak"] == 100
+
+
+def test_sampling_continues_after_error():
+    """Tests that the periodic sampling continues after an unexpected exception in one sampling round."""
+    stats_source = FakeStatsSource([(10, 1), "unexpected error"] + [(20, 2)] * 100)
+    sampler = get_sampler(stats_source)
+
+    async def run_test():
+        sampler.start()
+        await asyncio.sleep(0.1)
+        await sampler.stop()
+
+    asyncio.run(run_test())
+    assert sampler.sample_count >= 2
+    assert sampler.get_summary()[TOTAL_USAGE_NAME]["NetworkRxBytes"] == 20
+
+
+def test_cpu_usage():
+    """Tests the CPU usage calculation from the stats response."""
+    stats = {
+        "cpu_stats": {"cpu_usage": {"total_usage": 300}, "system_cpu_usage": 2000, "online_cpus": 4},
+        "precpu_stats": {"cpu_usage": {"total_usage": 100}, "system_cpu_usage": 1000}
+    }
+    assert get_cpu_usage(stats) == 0.8
+    assert get_cpu_usage({}) == 0.0
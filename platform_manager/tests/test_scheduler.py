@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for placing the containers to several Docker Engines."""
+
+import pytest
+
+from platform_manager.component import ComponentResources, CPU_AFFINITY_DEDICATED
+from platform_manager.scheduler import (
+    ContainerDemand, ContainerScheduler, EngineCapacity, format_cpu_set, parse_cpu_set)
+
+GIGABYTE = 1024 ** 3
+
+
+def test_place_first_fit_decreasing():
+    """Tests that the largest containers are placed first to the first engine they fit."""
+    engines = [EngineCapacity(cpus=4, memory=8 * GIGABYTE), EngineCapacity(cpus=4, memory=8 * GIGABYTE)]
+    demands = [
+        ContainerDemand(cpus=1, memory=GIGABYTE),
+        ContainerDemand(cpus=3, memory=GIGABYTE),
+        ContainerDemand(cpus=2, memory=GIGABYTE),
+        ContainerDemand(cpus=1, memory=GIGABYTE)
+    ]
+    # order of placement: 3 -> engine 0, 2 -> engine 1, 1 -> engine 0, 1 -> engine 1
+    assert ContainerScheduler().place(demands, engines) == [0, 0, 1, 1]
+    assert engines[0].used_cpus == 4
+    assert engines[1].used_cpus == 3
+    assert engines[0].used_memory == 2 * GIGABYTE
+
+
+def test_place_core_components_to_primary_engine():
+    """Tests that the core components are placed to the primary engine even if it is full."""
+    engines = [EngineCapacity(cpus=1, memory=GIGABYTE), EngineCapacity(cpus=8, memory=8 * GIGABYTE)]
+    demands = [
+        ContainerDemand(cpus=2, memory=GIGABYTE, core_component=True),
+        ContainerDemand(cpus=1, memory=GIGABYTE)
+    ]
+    assert ContainerScheduler().place(demands, engines) == [0, 1]
+
+
+def test_place_overcommit_to_least_loaded_engine():
+    """Tests that a container that does not fit anywhere is placed to the least loaded engine."""
+    engines = [
+        EngineCapacity(cpus=2, memory=GIGABYTE, used_cpus=1.5),
+        EngineCapacity(cpus=2, memory=GIGABYTE, used_cpus=0.5)
+    ]
+    assert ContainerScheduler().place([ContainerDemand(cpus=4, memory=GIGABYTE // 2)], engines) == [1]
+
+
+def test_place_default_demand():
+    """Tests that the default demand is used for the containers without resource hints."""
+    engines = [EngineCapacity(cpus=1, memory=GIGABYTE), EngineCapacity(cpus=8, memory=8 * GIGABYTE)]
+    scheduler = ContainerScheduler(default_cpus=0.5, default_memory=GIGABYTE // 2)
+    assert scheduler.place([ContainerDemand() for _ in range(3)], engines) == [0, 0, 1]
+
+
+def test_place_without_engines():
+    """Tests that placing without any engines raises an error."""
+    with pytest.raises(ValueError):
+        ContainerScheduler().place([ContainerDemand()], [])
+
+
+def test_cpu_set_parsing():
+    """Tests the conversions between the Docker cpuset strings and the core indexes."""
+    assert parse_cpu_set("0-2,5") == [0, 1, 2, 5]
+    assert parse_cpu_set("3,x,4") == [3, 4]
+    assert format_cpu_set([5, 0, 1]) == "0,1,5"
+
+
+def test_assign_cpu_sets():
+    """Tests that the dedicated containers are pinned to the least used cores and explicit CPU sets are kept."""
+    engines = [EngineCapacity(cpus=4, memory=GIGABYTE, core_usage=[0, 0, 0, 0])]
+    resources = [
+        ComponentResources(cpu_set="0"),
+        ComponentResources(cpus=2, cpu_affinity=CPU_AFFINITY_DEDICATED),
+        ComponentResources(cpu_affinity=CPU_AFFINITY_DEDICATED),
+        ComponentResources()
+    ]
+    assert ContainerScheduler().assign_cpu_sets(resources, [0, 0, 0, 0], engines) == \
+        ["0", "1,2", "3", None]
+    assert engines[0].core_usage == [1, 1, 1, 1]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for publishing the Start message with publisher confirms and with the fallback client."""
+
+import asyncio
+
+import pytest
+
+from platform_manager.start_publisher import StartMessagePublisher
+from platform_manager.tests.fake_rabbitmq import FakeAmqpBroker, FakeRabbitmqClient
+
+RABBITMQ_PARAMETERS = {
+    "RABBITMQ_HOST": "localhost",
+    "RABBITMQ_PORT": 5672,
+    "RABBITMQ_LOGIN": "guest",
+    "RABBITMQ_PASSWORD": "guest",
+    "RABBITMQ_SSL": False,
+    "RABBITMQ_EXCHANGE": "procem.management",
+    "RABBITMQ_EXCHANGE_AUTODELETE": False,
+    "RABBITMQ_EXCHANGE_DURABLE": True
+}
+
+
+def get_publisher(fallback_client: FakeRabbitmqClient, broker: FakeAmqpBroker) -> StartMessagePublisher:
+    """Returns a publisher that connects to the given fake broker."""
+    return StartMessagePublisher(
+        RABBITMQ_PARAMETERS, fallback_client, connection_factory=broker.connect)  # type: ignore
+
+
+def test_publish_confirmed():
+    """Tests that a confirmed message is compressed and not sent with the fallback client."""
+    fallback_client = FakeRabbitmqClient()
+    broker = FakeAmqpBroker()
+    publisher = get_publisher(fallback_client, broker)
+
+    assert asyncio.run(publisher.publish("Start", b"{}" * 100, "gzip")) is not None
+    published_messages = broker.exchanges["procem.management"].published_messages
+    assert len(published_messages) == 1
+    assert published_messages[0][0] == "Start"
+    assert published_messages[0][1].content_encoding == "gzip"
+    assert not fallback_client.sent_messages
+
+
+def test_publish_connection_failure():
+    """Tests that the fallback client sends the uncompressed message if the connection could not be opened."""
+    fallback_client = FakeRabbitmqClient()
+    broker = FakeAmqpBroker(connect_error=ConnectionRefusedError())
+    publisher = get_publisher(fallback_client, broker)
+
+    assert asyncio.run(publisher.publish("Start", b"{}", "gzip")) is None
+    assert broker.connection_count == 1
+    assert fallback_client.sent_messages == [("Start", b"{}")]
+
+
+def test_publish_confirm_timeout():
+    """Tests that a confirmation timeout is raised to the caller and the message is not resent."""
+    fallback_client = FakeRabbitmqClient()
+    broker = FakeAmqpBroker(publish_error=asyncio.TimeoutError())
+    publisher = get_publisher(fallback_client, broker)
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(publisher.publish("Start", b"{}"))
+    assert len(broker.exchanges["procem.management"].published_messages) == 1
+    assert not fallback_client.sent_messages
+
+
+def test_declare_simulation_exchange():
+    """Tests that the simulation specific exchange is declared in the broker given in the parameters."""
+    broker = FakeAmqpBroker()
+    publisher = get_publisher(FakeRabbitmqClient(), broker)
+    simulation_parameters = {**RABBITMQ_PARAMETERS, "RABBITMQ_EXCHANGE": "procem.simulation", "RABBITMQ_PORT": 5673}
+
+    assert asyncio.run(publisher.declare_simulation_exchange(simulation_parameters))  # type: ignore
+    assert list(broker.exchanges) == ["procem.simulation"]
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""Tests for starting a simulation with the platform manager using a fake Docker Engine and a fake message bus."""
+
+import asyncio
+import json
+import pathlib
+import time
+from typing import Optional
+
+import pytest
+
+from platform_manager.docker_runner import ContainerStarter
+from platform_manager.platform_environment import PlatformEnvironment
+from platform_manager.platform_manager import PlatformManager
+from platform_manager.start_publisher import StartMessagePublisher
+from platform_manager.tests.benchmark_start_simulation import (
+    BENCHMARK_COMPONENT_TYPE, BENCHMARK_ENVIRONMENT, write_manifests, write_simulation_configuration)
+from platform_manager.tests.fake_docker import FakeDockerEngine
+from platform_manager.tests.fake_rabbitmq import FakeAmqpBroker, FakeRabbitmqClient
+
+COMPONENT_COUNT = 5
+
+
+@pytest.fixture(name="configuration_file")
+def fixture_configuration_file(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> pathlib.Path:
+    """Sets up the environment and the manifests and returns a simulation configuration file."""
+    manifest_folder = tmp_path / "manifests"
+    manifest_folder.mkdir()
+    write_manifests(manifest_folder)
+    for variable_name, variable_value in BENCHMARK_ENVIRONMENT.items():
+        monkeypatch.setenv(variable_name, variable_value)
+    monkeypatch.setenv("MANIFEST_FOLDER", str(manifest_folder))
+    monkeypatch.setenv("START_MESSAGE_FOLDER", str(tmp_path / "start"))
+
+    configuration_file = tmp_path / "simulation.yml"
+    write_simulation_configuration(configuration_file, COMPONENT_COUNT)
+    return configuration_file
+
+
+async def start_simulation(docker_engine: FakeDockerEngine, rabbitmq_client: FakeRabbitmqClient,
+                           configuration_file: pathlib.Path,
+                           start_publisher: Optional[StartMessagePublisher] = None) -> bool:
+    """Starts the simulation with a new platform manager using the given fakes."""
+    platform_manager = PlatformManager(
+        rabbitmq_client=rabbitmq_client,  # type: ignore
+        container_starter=ContainerStarter(docker_url=docker_engine.url),
+        start_publisher=start_publisher
+    )
+    try:
+        return await platform_manager.start_simulation(str(configuration_file))
+    finally:
+        await platform_manager.stop()
+
+
+def test_start_simulation(configuration_file: pathlib.Path, tmp_path: pathlib.Path):
+    """Tests that all the containers are created and started and that the Start message is sent and stored."""
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        rabbitmq_client = FakeRabbitmqClient()
+        await docker_engine.start()
+        try:
+            assert await start_simulation(docker_engine, rabbitmq_client, configuration_file)
+            containers = list(docker_engine.containers.values())
+        finally:
+            await docker_engine.stop()
+
+        # the domain components, the simulation manager and the log writer
+        assert len(containers) == COMPONENT_COUNT + 2
+        assert all(container.running for container in containers)
+        assert all(container.name.startswith("Sim00_") for container in containers)
+        component_names = {container.name for container in containers}
+        for component_index in range(1, COMPONENT_COUNT + 1):
+            assert "Sim00_component_{:05d}".format(component_index) in component_names
+
+        component_container = next(
+            container for container in containers if container.name == "Sim00_component_00003")
+        assert "REQUIRED_VALUE=3" in component_container.config["Env"]
+
+        assert len(rabbitmq_client.sent_messages) == 1
+        start_message = json.loads(rabbitmq_client.sent_messages[0][1].decode("UTF-8"))
+        assert start_message["Type"] == "Start"
+        assert "SimulationSpecificBroker" not in start_message
+        assert len(start_message["ProcessParameters"][BENCHMARK_COMPONENT_TYPE]) == COMPONENT_COUNT
+        assert len(list((tmp_path / "start").glob("start_message_*.json"))) == 1
+
+    asyncio.run(run_test())
+
+
+def test_start_simulation_missing_image(configuration_file: pathlib.Path):
+    """Tests that no containers are left behind and no Start message is sent if an image is not available."""
+    async def run_test():
+        docker_engine = FakeDockerEngine(images=[
+            "ghcr.io/simcesplatform/simulation-manager:latest",
+            "ghcr.io/simcesplatform/logwriter:latest"
+        ])
+        rabbitmq_client = FakeRabbitmqClient()
+        await docker_engine.start()
+        try:
+            assert not await start_simulation(docker_engine, rabbitmq_client, configuration_file)
+            assert not docker_engine.containers
+        finally:
+            await docker_engine.stop()
+
+        assert not rabbitmq_client.sent_messages
+
+    asyncio.run(run_test())
+
+
+def test_start_simulation_start_message_error(configuration_file: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    """Tests that the created containers are removed if the Start message preparation raises an exception."""
+    def raise_error(*args, **kwargs):
+        # fail only after the containers have been created
+        time.sleep(0.5)
+        raise RuntimeError("start message error")
+
+    monkeypatch.setattr(PlatformEnvironment, "get_start_message", raise_error)
+
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        rabbitmq_client = FakeRabbitmqClient()
+        await docker_engine.start()
+        try:
+            with pytest.raises(RuntimeError):
+                await start_simulation(docker_engine, rabbitmq_client, configuration_file)
+            assert not docker_engine.containers
+        finally:
+            await docker_engine.stop()
+
+        assert not rabbitmq_client.sent_messages
+
+    asyncio.run(run_test())
+
+
+def test_start_simulation_unconfirmed_start_message(configuration_file: pathlib.Path):
+    """Tests that the simulation containers are removed if the Start message publishing is not confirmed."""
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        rabbitmq_client = FakeRabbitmqClient()
+        broker = FakeAmqpBroker(publish_error=asyncio.TimeoutError())
+        management_parameters = PlatformEnvironment().get_management_rabbitmq_parameters()
+        start_publisher = StartMessagePublisher(
+            rabbitmq_parameters=management_parameters,
+            fallback_client=rabbitmq_client,  # type: ignore
+            connection_factory=broker.connect
+        )
+        await docker_engine.start()
+        try:
+            assert not await start_simulation(docker_engine, rabbitmq_client, configuration_file, start_publisher)
+            assert not docker_engine.containers
+        finally:
+            await docker_engine.stop()
+
+        # the message was published once but not resent with the fallback client
+        management_exchange = broker.exchanges[str(management_parameters["RABBITMQ_EXCHANGE"])]
+        assert len(management_exchange.published_messages) == 1
+        assert not rabbitmq_client.sent_messages
+
+    asyncio.run(run_test())
+
+
+def test_start_simulation_broker_pool(configuration_file: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    """Tests that the broker assigned from the broker pool is given to the components and in the Start message."""
+    monkeypatch.setenv("RABBITMQ_BROKER_POOL", "broker1:5673,broker2:5674")
+
+    async def run_test():
+        docker_engine = FakeDockerEngine()
+        rabbitmq_client = FakeRabbitmqClient()
+        await docker_engine.start()
+        try:
+            assert await start_simulation(docker_engine, rabbitmq_client, configuration_file)
+            containers = list(docker_engine.containers.values())
+        finally:
+            await docker_engine.stop()
+
+        assert len(rabbitmq_client.sent_messages) == 1
+        start_message = json.loads(rabbitmq_client.sent_messages[0][1].decode("UTF-8"))
+        broker = start_message["SimulationSpecificBroker"]
+        assert (broker["Host"], broker["Port"]) in [("broker1", 5673), ("broker2", 5674)]
+        for container in containers:
+            assert "RABBITMQ_HOST={}".format(broker["Host"]) in container.config["Env"]
+            assert "RABBITMQ_PORT={}".format(broker["Port"]) in container.config["Env"]
+
+    asyncio.run(run_test())
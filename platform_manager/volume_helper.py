@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains the functionality for accessing the files in a Docker volume through short-lived
+helper containers that have the volume mounted.
+"""
+
+import uuid
+from typing import Any, Dict, List, Optional
+
+from aiodocker import Docker
+from aiodocker.containers import DockerContainer
+from aiodocker.exceptions import DockerError
+
+from tools.tools import FullLogger
+
+LOGGER = FullLogger(__name__)
+
+DEFAULT_HELPER_IMAGE = "ubuntu:18.04"
+HELPER_CONTAINER_PREFIX = "simces_volume_helper_"
+
+
+def get_helper_configuration(volume_name: str, volume_folder: str, helper_image: str,
+                             command: Optional[List[str]] = None, read_only: bool = False) -> Dict[str, Any]:
+    """Returns the container configuration for a helper container that has the given volume mounted."""
+    configuration = {
+        "Image": helper_image,
+        "HostConfig": {
+            "Binds": ["{}:{}:{}".format(volume_name, volume_folder, "ro" if read_only else "rw")]
+        }
+    }  # type: Dict[str, Any]
+    if command is not None:
+        configuration["Cmd"] = command
+    return configuration
+
+
+async def ensure_helper_image(docker_client: Docker, helper_image: str):
+    """Pulls the helper image if it is not available locally."""
+    try:
+        await docker_client.images.inspect(helper_image)
+    except DockerError:
+        LOGGER.info("Pulling the helper image '{}'".format(helper_image))
+        await docker_client.images.pull(from_image=helper_image)
+
+
+async def create_volume_container(docker_client: Docker, volume_name: str, volume_folder: str,
+                                  helper_image: str = DEFAULT_HELPER_IMAGE,
+                                  read_only: bool = False) -> DockerContainer:
+    """
+    Creates a helper container that has the given volume mounted to the given folder. The container is not started
+    since the archive operations work also for stopped containers. The caller is responsible for removing it.
+    """
+    await ensure_helper_image(docker_client, helper_image)
+    return await docker_client.containers.create(
+        config=get_helper_configuration(volume_name, volume_folder, helper_image, read_only=read_only),
+        name=HELPER_CONTAINER_PREFIX + uuid.uuid4().hex[:12]
+    )
+
+
+async def remove_volume_container(container: DockerContainer):
+    """Removes the given helper container."""
+    try:
+        await container.delete(force=True)
+    except DockerError as error:
+        LOGGER.warning("Could not remove the helper container: {}".format(error))
+
+
+async def run_in_volume(docker_client: Docker, volume_name: str, volume_folder: str, shell_command: str,
+                        helper_image: str = DEFAULT_HELPER_IMAGE) -> Optional[List[str]]:
+    """
+    Runs the given shell command in a helper container that has the given volume mounted to the given folder.
+    Returns the lines written to the standard output or None, if the command did not finish successfully.
+    """
+    await ensure_helper_image(docker_client, helper_image)
+    container = await docker_client.containers.create(
+        config=get_helper_configuration(volume_name, volume_folder, helper_image, command=["sh", "-c", shell_command]),
+        name=HELPER_CONTAINER_PREFIX + uuid.uuid4().hex[:12]
+    )
+    try:
+        await container.start()
+        exit_status = await container.wait()
+        output_frames = await container.log(stdout=True)
+        if exit_status.get("StatusCode", 0) != 0:
+            LOGGER.warning("Helper command exited with status {}: {}".format(
+                exit_status.get("StatusCode", None), "".join(await container.log(stderr=True)).strip()))
+            return None
+        # the log frames do not necessarily match the output lines
+        return "".join(output_frames).splitlines()
+
+    finally:
+        await remove_volume_container(container)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+"""
+This module contains a utility for uploading the contents of a local folder to a Docker volume
+as a single tar archive. Files that already have the same contents in the volume are not uploaded.
+
+Usage: python -m platform_manager.volume_upload <folder> <volume_name> <volume_folder>
+"""
+
+import argparse
+import asyncio
+import dataclasses
+import hashlib
+import pathlib
+import shlex
+import sys
+import tarfile
+import tempfile
+import time
+from typing import BinaryIO, Dict, List, Optional
+
+from aiodocker import Docker
+from aiodocker.exceptions import DockerError
+
+from tools.tools import FullLogger
+
+from platform_manager.volume_helper import (
+    DEFAULT_HELPER_IMAGE, create_volume_container, remove_volume_container, run_in_volume)
+
+LOGGER = FullLogger(__name__)
+
+# the size of the blocks used when calculating the hashes for the local files
+HASH_BLOCK_SIZE = 1024 ** 2
+
+
+@dataclasses.dataclass
+class UploadResult:
+    """
+    Data class for holding the outcome of a folder upload.
+    - uploaded_files: the relative paths of the files that were uploaded
+    - unchanged_files: the number of files that already had the same contents in the volume
+    - uploaded_bytes: the total size of the uploaded files in bytes
+    - duration: the time in seconds spent for the upload, including the hash comparison
+    """
+    uploaded_files: List[str] = dataclasses.field(default_factory=list)
+    unchanged_files: int = 0
+    uploaded_bytes: int = 0
+    duration: float = 0.0
+
+
+def get_file_hash(filename: pathlib.Path) -> str:
+    """Returns the SHA-256 hash for the contents of the given file."""
+    file_hash = hashlib.sha256()
+    with open(filename, mode="rb") as source_file:
+        for block in iter(lambda: source_file.read(HASH_BLOCK_SIZE), b""):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def get_local_hashes(folder: pathlib.Path) -> Dict[str, str]:
+    """Returns the SHA-256 hash for each file in the given folder using the relative POSIX paths as keys."""
+    return {
+        filename.relative_to(folder).as_posix(): get_file_hash(filename)
+        for filename in sorted(folder.rglob("*"))
+        if filename.is_file()
+    }
+
+
+def parse_hash_listing(output_lines: List[str]) -> Dict[str, str]:
+    """
+    Returns the file hashes from the output of the sha256sum command using the relative paths as keys.
+    Escaped lines, i.e. lines for filenames containing a newline or a backslash, are ignored
+    which causes the corresponding files to be uploaded again.
+    """
+    volume_hashes = {}
+    for output_line in output_lines:
+        file_hash, separator, filename = output_line.partition("  ")
+        if not separator or file_hash.startswith("\\"):
+            continue
+        if filename.startswith("./"):
+            filename = filename[2:]
+        volume_hashes[filename] = file_hash
+    return volume_hashes
+
+
+def get_hash_command(volume_folder: str) -> str:
+    """Returns the shell command that lists the hashes for all the files in the given folder in the volume."""
+    quoted_folder = shlex.quote(volume_folder)
+    return "mkdir -p {folder} && cd {folder} && find . -type f -exec sha256sum {{}} +".format(folder=quoted_folder)
+
+
+def write_archive(archive_file: BinaryIO, folder: pathlib.Path, filenames: List[str]) -> int:
+    """
+    Writes the given files from the given folder to a tar archive in the given file.
+    The files are owned by root in the archive. Returns the total size of the files in bytes.
+    """
+    def reset_owner(tar_info: tarfile.TarInfo) -> tarfile.TarInfo:
+        tar_info.uid = tar_info.gid = 0
+        tar_info.uname = tar_info.gname = "root"
+        return tar_info
+
+    total_size = 0
+    with tarfile.open(fileobj=archive_file, mode="w") as archive:
+        for filename in filenames:
+            local_filename = folder / filename
+            total_size += local_filename.stat().st_size
+            archive.add(str(local_filename), arcname=filename, recursive=False, filter=reset_owner)
+    return total_size
+
+
+async def upload_folder(docker_client: Docker, folder: pathlib.Path, volume_name: str, volume_folder: str,
+                        helper_image: str = DEFAULT_HELPER_IMAGE) -> Optional[UploadResult]:
+    """
+    Uploads the files in the given local folder to the given folder in the given Docker volume.
+    The volume is created if it does not exist. Files whose contents match the file in the volume are skipped
+    and the other files are sent as a single tar archive. Returns None, if the upload failed.
+    """
+    start_time = time.perf_counter()
+    upload_result = UploadResult()
+    try:
+        local_hashes = await asyncio.get_running_loop().run_in_executor(None, get_local_hashes, folder)
+        await docker_client.volumes.create({"Name": volume_name})
+        hash_listing = await run_in_volume(
+            docker_client, volume_name, volume_folder, get_hash_command(volume_folder), helper_image)
+        volume_hashes = parse_hash_listing(hash_listing) if hash_listing is not None else {}
+
+        changed_files = [
+            filename for filename, file_hash in local_hashes.items()
+            if volume_hashes.get(filename, None) != file_hash
+        ]
+        upload_result.unchanged_files = len(local_hashes) - len(changed_files)
+        if changed_files:
+            container = await create_volume_container(docker_client, volume_name, volume_folder, helper_image)
+            try:
+                # the archive is written to a temporary file so that it is streamed instead of kept in memory
+                with tempfile.TemporaryFile() as archive_file:
+                    upload_result.uploaded_bytes = await asyncio.get_running_loop().run_in_executor(
+                        None, write_archive, archive_file, folder, changed_files)
+                    archive_file.seek(0)
+                    await container.put_archive(volume_folder, archive_file)
+            finally:
+                await remove_volume_container(container)
+            upload_result.uploaded_files = changed_files
+
+    except (DockerError, OSError) as error:
+        LOGGER.error("Received {} when uploading folder '{}' to volume '{}': {}".format(
+            type(error).__name__, folder, volume_name, error))
+        return None
+
+    upload_result.duration = time.perf_counter() - start_time
+    LOGGER.info("Uploaded {} files ({} bytes) to volume '{}' in {:.1f} seconds, {} files were unchanged".format(
+        len(upload_result.uploaded_files), upload_result.uploaded_bytes, volume_name,
+        upload_result.duration, upload_result.unchanged_files))
+    return upload_result
+
+
+async def start_upload(folder: pathlib.Path, volume_name: str, volume_folder: str, helper_image: str) -> bool:
+    """Uploads the folder using the local Docker Engine. Returns True, if the upload was successful."""
+    docker_client = Docker()
+    try:
+        return await upload_folder(docker_client, folder, volume_name, volume_folder, helper_image) is not None
+    finally:
+        await docker_client.close()
+
+
+def main():
+    """Parses the command line arguments and uploads the folder."""
+    parser = argparse.ArgumentParser(description="Uploads the contents of a folder to a Docker volume.")
+    parser.add_argument("folder", type=str, help="the local folder to upload")
+    parser.add_argument("volume_name", type=str, help="the name of the target Docker volume")
+    parser.add_argument("volume_folder", type=str, help="the folder in the volume to which the files are uploaded")
+    parser.add_argument("--helper-image", type=str, default=DEFAULT_HELPER_IMAGE,
+                        help="the Docker image used for the helper containers")
+    arguments = parser.parse_args()
+
+    folder = pathlib.Path(arguments.folder)
+    if not folder.is_dir():
+        LOGGER.error("'{}' is not a directory".format(folder))
+        return 1
+
+    LOGGER.info("Copying the contents of '{}' to Docker volume '{}' to folder '{}'".format(
+        folder, arguments.volume_name, arguments.volume_folder))
+    if not asyncio.run(start_upload(folder, arguments.volume_name, arguments.volume_folder, arguments.helper_image)):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/bin/bash
+# Copyright 2021 Tampere University and VTT Technical Research Centre of Finland
+# This software was developed as a part of the ProCemPlus project: https://www.senecc.fi/projects/procemplus
+# This source code is licensed under the MIT license. See LICENSE in the repository root directory.
+# Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
+
+# Helper for running the Python utilities included in the platform manager image from the other scripts.
+# Usage: source platform_manager_utility.sh
+#        run_platform_manager_utility <utility_module> [<docker_run_option> ...] -- [<utility_argument> ...]
+# The function returns utility_missing_code when the local platform manager image does not contain the utility,
+# e.g. when the image is older than the utility, so that the calling script can fall back to another method.
+
+platform_manager_image="ghcr.io/simcesplatform/platform-manager:latest"
+utility_missing_code=100
+
+# only a missing utility module results in the special exit code, any other import error is shown as it is
+utility_check="import importlib.util, sys; sys.exit(0 if importlib.util.find_spec(sys.argv[1]) else $utility_missing_code)"
+
+run_platform_manager_utility () {
+    local utility_module=$1
+    shift
+
+    local docker_options=()
+    while [[ $# -gt 0 ]] && [[ "$1" != "--" ]]
+    do
+        docker_options+=("$1")
+        shift
+    done
+    if [[ $# -gt 0 ]]
+    then
+        shift
+    fi
+
+    # the utility is run from the root folder of the image, so that the image code is used instead of any
+    # mounted local files and the submodules are found from their expected locations
+    docker run --rm --workdir / "${docker_options[@]}" $platform_manager_image \
+        sh -c 'utility_check=$1; utility_module=$2; shift 2; \
+               python -c "$utility_check" "$utility_module" || exit $?; \
+               exec python -u -m "$utility_module" "$@"' \
+        run_platform_manager_utility "$utility_check" "$utility_module" "$@"
+}
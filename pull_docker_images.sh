@@ -4,7 +4,7 @@
 # This source code is licensed under the MIT license. See LICENSE in the repository root directory.
 # Author(s): Ville Heikkilä <ville.heikkila@tuni.fi>
 
-# Pulls the given Docker images to the local machine.
+# Pulls the given Docker images to the local machine. Images that are already up-to-date are not pulled again.
 
 if [ -z "$1" ]
 then
@@ -20,17 +20,35 @@ then
     return 0 2> /dev/null || exit 0
 fi
 
+source "$(dirname "${BASH_SOURCE[0]}")/platform_manager_utility.sh"
+
+# the image sync utility is run from the platform manager image, so that image is always updated first
+echo "Pulling Docker image: $platform_manager_image"
+docker pull $platform_manager_image
+
+# the image sync utility compares the image digests in the registry to the local images
+# and pulls only the missing or changed images, several images at the same time
 echo "Reading '$input_file' for Docker image names"
-while IFS= read -r docker_image || [ -n "$docker_image" ]
-do
-    first_character=${docker_image:0:1}
-    # check that the current line is not a comment or empty line
-    if [[ "$first_character" == "#" ]] || [[ "$docker_image" == "" ]]
-    then
-        continue
-    fi
-
-    echo "Pulling Docker image: $docker_image"
-    docker pull $docker_image
-
-done < "$input_file"
+run_platform_manager_utility platform_manager.image_sync \
+    --volume /var/run/docker.sock:/var/run/docker.sock \
+    --volume "$(realpath $input_file)":/image_list.txt:ro \
+    -- /image_list.txt
+
+if [ $? -eq $utility_missing_code ]
+then
+    # an older platform manager image, e.g. when the registry could not be reached, pull the images one by one
+    echo "The image sync utility is not available in '$platform_manager_image', pulling all the images instead"
+    while IFS= read -r docker_image || [ -n "$docker_image" ]
+    do
+        first_character=${docker_image:0:1}
+        # check that the current line is not a comment or empty line
+        if [[ "$first_character" == "#" ]] || [[ "$docker_image" == "" ]]
+        then
+            continue
+        fi
+
+        echo "Pulling Docker image: $docker_image"
+        docker pull $docker_image
+
+    done < "$input_file"
+fi
@@ -24,5 +24,12 @@ source copy_file_to_volume.sh $configuration_file simces_simulation_configuratio
 # Change the configuration file setting for Platform Manager.
 sed -i "/SIMULATION_CONFIGURATION_FILE=/c\SIMULATION_CONFIGURATION_FILE=\/configuration\/${configuration_file}" ${platform_manager_env_file}
 
+# Refresh the manifests of the component types used in the simulation before the launch.
+# A failed fetch does not prevent the launch since the earlier fetched manifests are still available.
+echo "Fetching the component manifests for the simulation."
+SIMULATION_CONFIGURATION_FILES="/configuration/${configuration_file}" \
+    $compose_command --file fetch/docker-compose-fetch.yml up || echo "Could not fetch the component manifests."
+$compose_command --file fetch/docker-compose-fetch.yml rm --force
+
 echo "Starting the Platform Manager."
 $compose_command --file docker-compose.yml up